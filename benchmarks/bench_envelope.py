@@ -0,0 +1,71 @@
+"""
+Micro-benchmarks for the per-call CPU cost of building and sending requests
+
+The transport answers every request with a canned response, so the measurement
+covers only the client side: envelope, headers, encoding, and decoding.
+"""
+
+from harness import benchmark
+
+from idoitapi.API import API
+from idoitapi.Transport import Response, Transport
+
+CALLS = 20000
+BATCH_SIZE = 100
+
+
+class CannedTransport(Transport):
+    """
+    Transport answering every request with the same response
+    """
+
+    def __init__(self):
+        self.posts = 0
+
+    def post(self, url, data, headers):
+        self.posts += 1
+        if data.startswith('['):
+            return Response(200, BATCH_RESPONSE)
+        return Response(200, SINGLE_RESPONSE)
+
+
+SINGLE_RESPONSE = b'{"jsonrpc": "2.0", "result": {"success": true}, "id": 1}'
+BATCH_RESPONSE = ('[' + ', '.join(
+    '{{"jsonrpc": "2.0", "result": {{"success": true}}, "id": {}}}'.format(number) for number in range(BATCH_SIZE)
+) + ']').encode('utf-8')
+
+
+def canned_api():
+    api = API(url='http://localhost', key='benchmark', language='en', transport=CannedTransport())
+    api._session_id = 'benchmark-session'
+    return api
+
+
+@benchmark('API.request envelope', group='envelope')
+def request_envelope(context):
+    api = canned_api()
+    params = {'objID': 42, 'category': 'C__CATG__GLOBAL', 'status': 2}
+
+    def run():
+        for _ in range(CALLS):
+            api.request('cmdb.category.read', params)
+        return CALLS
+    return run
+
+
+@benchmark('API.batch_request envelope', group='envelope')
+def batch_request_envelope(context):
+    api = canned_api()
+
+    def run():
+        for _ in range(CALLS // BATCH_SIZE):
+            api.batch_request([
+                {
+                    'method': 'cmdb.category.read',
+                    'params': {'objID': number, 'category': 'C__CATG__GLOBAL', 'status': 2},
+                    'id': number,
+                }
+                for number in range(BATCH_SIZE)
+            ])
+        return CALLS
+    return run
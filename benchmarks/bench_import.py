@@ -0,0 +1,46 @@
+"""
+Benchmarks for the start-up cost of short-lived scripts
+
+Each run starts a fresh interpreter, so the measurement includes the interpreter's
+own start-up; compare against the 'python -c pass' baseline.
+"""
+
+import os
+import subprocess
+import sys
+
+from harness import benchmark
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+
+def run_python(code):
+    def run():
+        for _ in range(RUNS):
+            subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+        return RUNS
+    return run
+
+
+@benchmark('python -c pass', group='import')
+def interpreter_startup(context):
+    return run_python('pass')
+
+
+@benchmark('import idoitapi', group='import')
+def import_package(context):
+    return run_python('import idoitapi')
+
+
+@benchmark('probe: API + CMDBObject', group='import')
+def import_probe(context):
+    return run_python(
+        'from idoitapi import API, CMDBObject\n'
+        "CMDBObject(API(url='http://localhost', key='benchmark'))"
+    )
+
+
+@benchmark('import all request classes', group='import')
+def import_all(context):
+    return run_python('import idoitapi\nfor name in idoitapi.__all__: getattr(idoitapi, name)')
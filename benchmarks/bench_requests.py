@@ -0,0 +1,111 @@
+"""
+Benchmarks for the main request classes
+"""
+
+import os
+
+from harness import benchmark
+from mock_cmdb import first_server, server_ids
+
+from idoitapi.CMDBCategory import CMDBCategory
+from idoitapi.CMDBLocationTree import CMDBLocationTree
+from idoitapi.CMDBObject import CMDBObject
+from idoitapi.CMDBObjects import CMDBObjects
+from idoitapi.File import File
+from idoitapi.Select import Select
+from idoitapi.Subnet import Subnet
+
+BATCH_READ_CATEGORIES = ['C__CATG__GLOBAL', 'C__CATG__MODEL', 'C__CATG__CPU', 'C__CATG__IP']
+
+
+@benchmark('CMDBObjects.read')
+def objects_read(context):
+    cmdb_objects = CMDBObjects(context.api)
+
+    def run():
+        return len(cmdb_objects.read())
+    return run
+
+
+@benchmark('CMDBObjects.read columnar')
+def objects_read_columnar(context):
+    cmdb_objects = CMDBObjects(context.api)
+
+    def run():
+        return len(cmdb_objects.read(columnar=True))
+    return run
+
+
+@benchmark('CMDBCategory.batch_read')
+def category_batch_read(context):
+    cmdb_category = CMDBCategory(context.api)
+    object_ids = server_ids(context.cmdb, context.batch_objects)
+
+    def run():
+        return sum(len(entries) for entries in cmdb_category.batch_read(object_ids, BATCH_READ_CATEGORIES))
+    return run
+
+
+@benchmark('CMDBObject.load')
+def object_load(context):
+    cmdb_object = CMDBObject(context.api)
+    object_id = first_server(context.cmdb)
+
+    def run():
+        obj = cmdb_object.load(object_id)
+        return sum(len(category['entries']) for category_type in ('catg', 'cats', 'custom')
+                   for category in obj.get(category_type, []) if 'entries' in category)
+    return run
+
+
+@benchmark('Select.find')
+def select_find(context):
+    select = Select(context.api)
+    title = context.cmdb.objects[server_ids(context.cmdb)[-1]]['title']
+
+    def run():
+        found = select.find('C__CATG__GLOBAL', 'title', title)
+        assert len(found) == 1
+        return len(context.cmdb.objects)
+    return run
+
+
+@benchmark('Subnet.next')
+def subnet_next(context):
+    subnet_id = context.cmdb.subnet
+
+    def run():
+        subnet = Subnet(context.api)
+        subnet.load(subnet_id)
+        subnet.next()
+        return len(subnet.taken)
+    return run
+
+
+@benchmark('CMDBLocationTree.read_recursively')
+def location_tree_read_recursively(context):
+    location_tree = CMDBLocationTree(context.api)
+
+    def count(nodes):
+        return sum(1 + count(node.get('children', [])) for node in nodes)
+
+    def run():
+        return count(location_tree.read_recursively(context.cmdb.location_root))
+    return run
+
+
+@benchmark('File.batch_add')
+def file_batch_add(context):
+    file_request = File(context.api)
+    object_id = first_server(context.cmdb)
+    files = {}
+    for number in range(context.files):
+        path = os.path.join(context.tmpdir, 'scan{:04d}.pdf'.format(number))
+        with open(path, 'wb') as file_handle:
+            file_handle.write(os.urandom(context.file_size))
+        files[path] = 'Scan {}'.format(number)
+
+    def run():
+        file_request.batch_add(object_id, files)
+        return len(files)
+    return run
@@ -0,0 +1,146 @@
+"""
+Minimal benchmark harness: registration, timing, memory, and baseline comparison
+"""
+
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+Operation = Callable[[], int]
+"""A benchmarked operation; returns the number of items it processed"""
+
+
+class Benchmark(NamedTuple):
+    name: str
+    prepare: Callable[[Any], Operation]
+    group: str
+
+
+class Result(NamedTuple):
+    name: str
+    mean_s: float
+    min_s: float
+    items: int
+    items_per_s: float
+    requests: float
+    peak_kib: float
+
+
+REGISTRY: List[Benchmark] = []
+
+
+def benchmark(name: str, group: str = 'requests') -> Callable[[Callable[[Any], Operation]], Callable[[Any], Operation]]:
+    """
+    Register a benchmark
+
+    The decorated function receives a context and returns the operation to measure.
+
+    :param str name: Benchmark name
+    :param str group: (optional) Benchmark group for selecting benchmarks
+    """
+    def decorator(prepare: Callable[[Any], Operation]) -> Callable[[Any], Operation]:
+        REGISTRY.append(Benchmark(name, prepare, group))
+        return prepare
+    return decorator
+
+
+def measure(bench: Benchmark, context: Any, repeat: int, count_requests: Callable[[], int]) -> Result:
+    """
+    Run a benchmark
+
+    :param Benchmark bench: Benchmark to run
+    :param context: Context passed to the benchmark's prepare function
+    :param int repeat: Number of timed runs
+    :param count_requests: function returning the number of HTTP requests sent so far
+    :return: timings, throughput, HTTP requests and peak memory per run
+    :rtype: Result
+    """
+    operation = bench.prepare(context)
+    operation()
+
+    timings = []
+    items = 0
+    requests_before = count_requests()
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        items = operation()
+        timings.append(time.perf_counter() - start)
+    requests = (count_requests() - requests_before) / repeat
+
+    gc.collect()
+    tracemalloc.start()
+    operation()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean = statistics.mean(timings)
+    return Result(
+        name=bench.name,
+        mean_s=mean,
+        min_s=min(timings),
+        items=items,
+        items_per_s=items / mean if mean > 0 else 0.0,
+        requests=requests,
+        peak_kib=peak / 1024,
+    )
+
+
+def report(results: List[Result]) -> str:
+    """
+    Format results as a table
+
+    :param list results: Benchmark results
+    :return: table
+    :rtype: str
+    """
+    lines = ['{:<40} {:>10} {:>10} {:>8} {:>12} {:>9} {:>11}'.format(
+        'benchmark', 'mean ms', 'min ms', 'items', 'items/s', 'requests', 'peak KiB'
+    )]
+    for result in results:
+        lines.append('{:<40} {:>10.2f} {:>10.2f} {:>8d} {:>12.0f} {:>9.1f} {:>11.0f}'.format(
+            result.name, result.mean_s * 1000, result.min_s * 1000, result.items,
+            result.items_per_s, result.requests, result.peak_kib
+        ))
+    return '\n'.join(lines)
+
+
+def save(results: List[Result], path: str) -> None:
+    """
+    Save results as a baseline
+
+    :param list results: Benchmark results
+    :param str path: Path to JSON file
+    """
+    with open(path, 'w', encoding='utf-8') as file_handle:
+        json.dump({result.name: result._asdict() for result in results}, file_handle, indent=2)
+
+
+def compare(results: List[Result], path: str, tolerance: float) -> List[str]:
+    """
+    Compare results against a saved baseline
+
+    :param list results: Benchmark results
+    :param str path: Path to baseline JSON file
+    :param float tolerance: Allowed relative slowdown / memory growth, e.g. 0.2 for 20%
+    :return: descriptions of regressions
+    :rtype: list[str]
+    """
+    with open(path, encoding='utf-8') as file_handle:
+        baseline: Dict[str, Dict] = json.load(file_handle)
+
+    regressions = []
+    for result in results:
+        before: Optional[Dict] = baseline.get(result.name)
+        if before is None:
+            continue
+        for field in ('mean_s', 'peak_kib', 'requests'):
+            old, new = before[field], getattr(result, field)
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append('{}: {} {:.4g} -> {:.4g} (+{:.0%})'.format(
+                    result.name, field, old, new, new / old - 1
+                ))
+    return regressions
@@ -0,0 +1,379 @@
+"""
+Synthetic i-doit CMDB answering JSON-RPC requests through a MockTransport
+
+Category entries are generated deterministically on first access,
+so large data sets cost memory only for the parts a benchmark touches.
+"""
+
+import base64
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from idoitapi.APIException import InvalidParams
+from idoitapi.Transport import MockTransport
+
+SERVER_TYPE = (5, 'C__OBJTYPE__SERVER', 'Server')
+FILE_TYPE = (30, 'C__OBJTYPE__FILE', 'File')
+NET_TYPE = (27, 'C__OBJTYPE__LAYER3_NET', 'Layer 3-Net')
+ROOM_TYPE = (26, 'C__OBJTYPE__ROOM', 'Room')
+
+SERVER_CATEGORIES = {
+    'catg': [
+        ('C__CATG__GLOBAL', False),
+        ('C__CATG__MODEL', False),
+        ('C__CATG__CPU', True),
+        ('C__CATG__MEMORY', True),
+        ('C__CATG__IP', True),
+        ('C__CATG__NETWORK_PORT', True),
+        ('C__CATG__LOCATION', False),
+        ('C__CATG__ACCOUNTING', False),
+        ('C__CATG__CONTACT', True),
+        ('C__CATG__APPLICATION', True),
+        ('C__CATG__STORAGE_DEVICE', True),
+        ('C__CATG__OPERATING_SYSTEM', False),
+        ('C__CATG__FILE', True),
+        ('C__CATG__IMAGES', True),
+        ('C__CATG__RELATION', True),
+        ('C__CATG__LOGBOOK', True),
+    ],
+    'cats': [],
+    'custom': [
+        ('C__CATG__CUSTOM_FIELDS_MAINTENANCE', False),
+    ],
+}
+
+
+class MockCMDB(object):
+    """
+    In-memory CMDB with servers, a location tree, and a subnet
+    """
+
+    def __init__(self,
+                 objects: int = 1000,
+                 entries_per_category: int = 3,
+                 location_fanout: int = 5,
+                 location_depth: int = 4,
+                 taken_ip_addresses: int = 500,
+                 ) -> None:
+        """
+        :param int objects: number of server objects
+        :param int entries_per_category: number of entries in multi-value categories
+        :param int location_fanout: number of children per location
+        :param int location_depth: depth of the location tree
+        :param int taken_ip_addresses: number of used IP addresses in the subnet
+        """
+        self.entries_per_category = entries_per_category
+        self._lock = threading.Lock()
+        self.objects: Dict[int, Dict] = {}
+        self.entries: Dict[Tuple[int, str], List[Dict]] = {}
+        self.children: Dict[int, List[int]] = {}
+        self._next_id = 1
+        self._next_entry_id = 1
+
+        for number in range(objects):
+            self.add_object(SERVER_TYPE, 'server{:06d}'.format(number))
+
+        self.location_root = self.add_object(ROOM_TYPE, 'Location 0')
+        level = [self.location_root]
+        for depth in range(location_depth):
+            next_level = []
+            for parent in level:
+                for number in range(location_fanout):
+                    child = self.add_object(ROOM_TYPE, 'Location {}.{}.{}'.format(depth + 1, parent, number))
+                    self.children.setdefault(parent, []).append(child)
+                    next_level.append(child)
+            level = next_level
+
+        self.subnet = self.add_object(NET_TYPE, 'Net 10.0.0.0/16')
+        self.entries[(self.subnet, 'C__CATS__NET')] = [{
+            'id': '1',
+            'objID': str(self.subnet),
+            'type': {'id': '1', 'title': 'IPv4', 'const': 'C__CATS_NET_TYPE__IPV4'},
+            'range_from': '10.0.0.1',
+            'range_to': '10.0.255.254',
+        }]
+        self.entries[(self.subnet, 'C__CATS__NET_IP_ADDRESSES')] = [
+            {
+                'id': str(number + 1),
+                'objID': str(self.subnet),
+                'title': '10.0.{}.{}'.format((number + 1) // 256, (number + 1) % 256),
+            }
+            for number in range(taken_ip_addresses)
+        ]
+
+    def add_object(self, object_type: Tuple[int, str, str], title: str, **attributes: Any) -> int:
+        """
+        Add an object
+
+        :param tuple object_type: object type identifier, constant, and title
+        :param str title: object title
+        :return: object identifier
+        :rtype: int
+        """
+        with self._lock:
+            object_id = self._next_id
+            self._next_id += 1
+        obj = {
+            'id': object_id,
+            'title': title,
+            'sysid': 'SYSID_{:010d}'.format(object_id),
+            'type': object_type[0],
+            'type_title': object_type[2],
+            'type_group_title': 'Infrastructure',
+            'status': 2,
+            'cmdb_status': 6,
+            'cmdb_status_title': 'in operation',
+            'created': '2022-01-01 00:00:00',
+            'updated': '2022-01-01 00:00:00',
+            'image': 'https://localhost/images/objecttypes/server.png',
+            'objecttype': object_type[0],
+            'type_const': object_type[1],
+        }
+        obj.update(attributes)
+        self.objects[object_id] = obj
+        return object_id
+
+    def _generate_entries(self, object_id: int, category: str) -> List[Dict]:
+        multi_value = category not in ('C__CATG__GLOBAL', 'C__CATG__MODEL', 'C__CATG__LOCATION',
+                                       'C__CATG__ACCOUNTING', 'C__CATG__OPERATING_SYSTEM',
+                                       'C__CATG__CUSTOM_FIELDS_MAINTENANCE')
+        obj = self.objects[object_id]
+        if category == 'C__CATG__GLOBAL':
+            return [{
+                'id': str(object_id),
+                'objID': str(object_id),
+                'title': obj['title'],
+                'status': {'id': '2', 'title': 'Normal', 'const': '', 'title_lang': 'LC__CMDB__RECORD_STATUS__NORMAL'},
+                'created': obj['created'],
+                'changed': obj['updated'],
+                'purpose': {'id': '1', 'title': 'Production', 'const': 'C__CMDB__PURPOSE__PRODUCTION'},
+                'category': None,
+                'sysid': obj['sysid'],
+                'cmdb_status': {'id': '6', 'title': 'in operation', 'const': 'C__CMDB_STATUS__IN_OPERATION'},
+                'type': {'id': str(obj['type']), 'title': obj['type_title'], 'const': obj['type_const']},
+                'tag': [],
+                'description': '',
+            }]
+
+        count = self.entries_per_category if multi_value else 1
+        entries = []
+        for number in range(count):
+            with self._lock:
+                entry_id = self._next_entry_id
+                self._next_entry_id += 1
+            entries.append({
+                'id': str(entry_id),
+                'objID': str(object_id),
+                'title': '{} {} #{}'.format(category, obj['title'], number),
+                'manufacturer': {'id': '3', 'title': 'Vendor {}'.format(object_id % 7), 'const': ''},
+                'model': {'id': '4', 'title': 'Model {}'.format(object_id % 13), 'const': ''},
+                'serial': 'SN{:08d}{:02d}'.format(object_id, number),
+                'description': '',
+            })
+        return entries
+
+    def get_entries(self, object_id: int, category: str) -> List[Dict]:
+        """
+        Fetch (and generate on first access) the entries of a category
+
+        :param int object_id: object identifier
+        :param str category: category constant
+        :return: category entries
+        :rtype: list[dict]
+        """
+        key = (object_id, category)
+        if key not in self.entries:
+            if object_id not in self.objects:
+                raise InvalidParams(message='Object {} not found'.format(object_id))
+            self.entries[key] = self._generate_entries(object_id, category)
+        return self.entries[key]
+
+    # JSON-RPC handlers
+
+    def objects_read(self, params: Dict) -> List[Dict]:
+        filter_params = params.get('filter', {})
+        result = []
+        ids = filter_params.get('ids')
+        candidates = [self.objects[object_id] for object_id in ids if object_id in self.objects] \
+            if ids is not None else self.objects.values()
+        for obj in candidates:
+            if 'type' in filter_params and filter_params['type'] not in (obj['type'], obj['type_const']):
+                continue
+            if 'title' in filter_params and filter_params['title'] != obj['title']:
+                continue
+            if obj['status'] != 2 and 'status' not in filter_params:
+                continue
+            result.append({key: value for key, value in obj.items() if key not in ('objecttype', 'type_const')})
+
+        offset, limit = 0, None
+        if 'limit' in params:
+            if isinstance(params['limit'], str) and ',' in params['limit']:
+                offset, limit = [int(part) for part in params['limit'].split(',')]
+            else:
+                limit = int(params['limit'])
+        return result[offset:None if limit is None else offset + limit]
+
+    def object_read(self, params: Dict) -> Dict:
+        obj = self.objects.get(int(params['id']))
+        if obj is None:
+            return {}
+        return dict(obj)
+
+    def object_create(self, params: Dict) -> Dict:
+        object_type = params['type']
+        for known in (SERVER_TYPE, FILE_TYPE, NET_TYPE, ROOM_TYPE):
+            if object_type in known[:2]:
+                break
+        else:
+            raise InvalidParams(message='Unknown object type {}'.format(object_type))
+        object_id = self.add_object(known, params['title'])
+        return {'id': object_id, 'message': 'Object was successfully created', 'success': True}
+
+    def object_update(self, params: Dict) -> Dict:
+        self.objects[int(params['id'])]['title'] = params.get('title', self.objects[int(params['id'])]['title'])
+        return {'message': 'Object title was successfully updated', 'success': True}
+
+    def _object_status(self, status: int) -> Any:
+        def handler(params: Dict) -> Dict:
+            object_id = int(params.get('object', params.get('id', 0)))
+            if object_id not in self.objects:
+                raise InvalidParams(message='Object {} not found'.format(object_id))
+            self.objects[object_id]['status'] = status
+            return {'message': 'Object {} has been changed'.format(object_id), 'success': True}
+        return handler
+
+    def object_purge(self, params: Dict) -> Dict:
+        object_id = int(params['object'])
+        if self.objects.pop(object_id, None) is None:
+            raise InvalidParams(message='Object {} not found'.format(object_id))
+        return {'message': 'Object {} has been purged'.format(object_id), 'success': True}
+
+    def object_type_categories_read(self, params: Dict) -> Dict:
+        return {
+            category_type: [
+                {'id': str(number + 1), 'title': const, 'const': const, 'multi_value': '1' if multi else '0'}
+                for number, (const, multi) in enumerate(constants)
+            ]
+            for category_type, constants in SERVER_CATEGORIES.items()
+            if constants
+        }
+
+    def category_read(self, params: Dict) -> List[Dict]:
+        object_id = int(params.get('objID', params.get('object', 0)))
+        return self.get_entries(object_id, params['category'])
+
+    def category_create(self, params: Dict) -> Dict:
+        object_id = int(params.get('objID', params.get('object', 0)))
+        category = params.get('category', params.get('catgID', params.get('catsID')))
+        entries = self.get_entries(object_id, category)
+        with self._lock:
+            entry_id = self._next_entry_id
+            self._next_entry_id += 1
+        entry = {'id': str(entry_id), 'objID': str(object_id)}
+        entry.update(params.get('data', {}))
+        if 'file_content' in entry:
+            # Keep only a digest, the server's storage is not part of the measurement
+            entry['md5_hash'] = hashlib.md5(base64.b64decode(entry.pop('file_content'))).hexdigest()
+        entries.append(entry)
+        return {'id': entry_id, 'message': 'Category entry successfully created.', 'success': True}
+
+    def category_save(self, params: Dict) -> Dict:
+        object_id = int(params['object'])
+        entries = self.get_entries(object_id, params['category'])
+        if 'entry' in params:
+            for entry in entries:
+                if int(entry['id']) == int(params['entry']):
+                    entry.update(params['data'])
+                    return {'entry': int(entry['id']), 'message': 'Category entry successfully saved', 'success': True}
+            raise InvalidParams(message='Entry {} not found'.format(params['entry']))
+        if entries:
+            entries[0].update(params['data'])
+            return {'entry': int(entries[0]['id']), 'message': 'Category entry successfully saved', 'success': True}
+        result = self.category_create({'objID': object_id, 'category': params['category'], 'data': params['data']})
+        return {'entry': result['id'], 'message': 'Category entry successfully saved', 'success': True}
+
+    def category_purge(self, params: Dict) -> Dict:
+        object_id = int(params.get('objID', params.get('object', 0)))
+        entries = self.get_entries(object_id, params['category'])
+        entry_id = params.get('entry', params.get('cateID'))
+        remaining = [entry for entry in entries if entry_id is not None and int(entry['id']) != int(entry_id)]
+        self.entries[(object_id, params['category'])] = remaining
+        return {'message': 'Entry has been purged', 'success': True}
+
+    def category_status(self, params: Dict) -> Dict:
+        return {'message': 'Entry status has been changed', 'success': True}
+
+    def location_tree_read(self, params: Dict) -> List[Dict]:
+        result = []
+        for child in self.children.get(int(params['id']), []):
+            obj = self.objects[child]
+            result.append({
+                'id': child,
+                'title': obj['title'],
+                'sysid': obj['sysid'],
+                'type': obj['type'],
+                'type_title': obj['type_title'],
+                'status': obj['status'],
+                'cmdb_status': obj['cmdb_status'],
+                'cmdb_status_title': obj['cmdb_status_title'],
+                'created': obj['created'],
+                'updated': obj['updated'],
+                'image': obj['image'],
+            })
+        return result
+
+    def transport(self, latency: float = 0.0, latency_per_request: float = 0.0) -> MockTransport:
+        """
+        Build a transport answering requests from this CMDB
+
+        :param float latency: (optional) delay per HTTP request in seconds
+        :param float latency_per_request: (optional) additional delay per (sub-)request in seconds
+        :return: transport
+        :rtype: MockTransport
+        """
+        return MockTransport({
+            'cmdb.objects.read': self.objects_read,
+            'cmdb.object.read': self.object_read,
+            'cmdb.object.create': self.object_create,
+            'cmdb.object.update': self.object_update,
+            'cmdb.object.archive': self._object_status(3),
+            'cmdb.object.delete': self._object_status(4),
+            'cmdb.object.recycle': self._object_status(2),
+            'cmdb.object.purge': self.object_purge,
+            'cmdb.object_type_categories.read': self.object_type_categories_read,
+            'cmdb.category.read': self.category_read,
+            'cmdb.category.create': self.category_create,
+            'cmdb.category.save': self.category_save,
+            'cmdb.category.update': self.category_save,
+            'cmdb.category.archive': self.category_status,
+            'cmdb.category.delete': self.category_status,
+            'cmdb.category.recycle': self.category_status,
+            'cmdb.category.purge': self.category_purge,
+            'cmdb.category.quickpurge': self.category_purge,
+            'cmdb.location_tree.read': self.location_tree_read,
+        }, latency=latency, latency_per_request=latency_per_request)
+
+
+def first_server(cmdb: MockCMDB) -> int:
+    """
+    Identifier of the first server object
+
+    :param MockCMDB cmdb: the CMDB
+    :return: object identifier
+    :rtype: int
+    """
+    return next(object_id for object_id, obj in cmdb.objects.items() if obj['type'] == SERVER_TYPE[0])
+
+
+def server_ids(cmdb: MockCMDB, count: Optional[int] = None) -> List[int]:
+    """
+    Identifiers of server objects
+
+    :param MockCMDB cmdb: the CMDB
+    :param int count: (optional) maximum number of identifiers
+    :return: object identifiers
+    :rtype: list[int]
+    """
+    ids = [object_id for object_id, obj in cmdb.objects.items() if obj['type'] == SERVER_TYPE[0]]
+    return ids if count is None else ids[:count]
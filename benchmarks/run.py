@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Run the benchmark suite against a synthetic CMDB
+
+Examples::
+
+    python benchmarks/run.py
+    python benchmarks/run.py --size large --latency 0.02 --save baseline.json
+    python benchmarks/run.py --compare baseline.json --tolerance 0.2
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import harness  # noqa: E402
+import bench_requests  # noqa: E402,F401
+import bench_envelope  # noqa: E402,F401
+import bench_import  # noqa: E402,F401
+from mock_cmdb import MockCMDB  # noqa: E402
+
+from idoitapi.API import API  # noqa: E402
+from idoitapi.Transport import MockServer  # noqa: E402
+
+SIZES = {
+    'small': dict(objects=500, batch_objects=50, taken_ip_addresses=200, location_depth=3, files=5),
+    'medium': dict(objects=5000, batch_objects=250, taken_ip_addresses=1000, location_depth=4, files=20),
+    'large': dict(objects=50000, batch_objects=1000, taken_ip_addresses=4000, location_depth=5, files=50),
+}
+
+
+class Context(object):
+    """
+    Everything a benchmark needs: the CMDB, an API bound to it, and size parameters
+    """
+
+    def __init__(self, cmdb: MockCMDB, api: API, tmpdir: str, **sizes: Any) -> None:
+        self.cmdb = cmdb
+        self.api = api
+        self.tmpdir = tmpdir
+        self.file_size = 256 * 1024
+        for key, value in sizes.items():
+            setattr(self, key, value)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=sorted(SIZES), default='medium', help='data set size (default: medium)')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated delay per HTTP request in seconds')
+    parser.add_argument('--http', action='store_true', help='serve the CMDB over local HTTP instead of in-process')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark (default: 5)')
+    parser.add_argument('--group', action='append', help='only run benchmarks of this group (repeatable)')
+    parser.add_argument('-k', dest='keyword', help='only run benchmarks whose name contains this string')
+    parser.add_argument('--save', metavar='PATH', help='save results as JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare results with a JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression (default: 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    sizes = dict(SIZES[args.size])
+    cmdb = MockCMDB(
+        objects=sizes['objects'],
+        taken_ip_addresses=sizes['taken_ip_addresses'],
+        location_depth=sizes['location_depth'],
+    )
+    transport = cmdb.transport(latency=args.latency)
+
+    server = None
+    if args.http:
+        server = MockServer(transport)
+        server.start()
+        api = API(url=server.url, key='benchmark')
+    else:
+        api = API(url='http://localhost', key='benchmark', transport=transport)
+
+    benchmarks = [
+        bench for bench in harness.REGISTRY
+        if (args.group is None or bench.group in args.group)
+        and (args.keyword is None or args.keyword in bench.name)
+    ]
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            context = Context(cmdb, api, tmpdir, **sizes)
+            for bench in benchmarks:
+                results.append(harness.measure(bench, context, args.repeat, lambda: transport.posts))
+                print(harness.report(results[-1:]).splitlines()[-1] if len(results) > 1
+                      else harness.report(results[-1:]), flush=True)
+    finally:
+        if server is not None:
+            server.stop()
+
+    if args.save:
+        harness.save(results, args.save)
+
+    if args.compare:
+        regressions = harness.compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION ' + regression)
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
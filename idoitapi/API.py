@@ -1,8 +1,18 @@
+import copy
 import json
-from typing import Dict, Any, List, Optional
-
-import requests
-from idoitapi.APIException import JSONRPC, InvalidParams, InternalError, MethodNotFound, UnknownError
+import threading
+from json.encoder import encode_basestring_ascii
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple, TypeVar, Union
+
+from idoitapi.APIException import JSONRPC, InvalidParams, exception_for, is_session_error
+from idoitapi.AutoBatcher import AutoBatcher
+from idoitapi.BatchBuilder import BatchBuilder
+from idoitapi.EndpointPool import Endpoint, EndpointPool
+from idoitapi.jsonstream import StreamingBody, encode_request, iter_result
+from idoitapi.tracing import get_tracer, span
+from idoitapi.Transport import Transport, HTTPTransport, Response, StreamingResponse
 
 # Values for User-Agent header
 # ToDo: Grab User-Agent name from setup.py
@@ -10,34 +20,86 @@ API_AGENT_NAME = 'idoitapi' + '-python'
 API_AGENT_VERSION = '1.0b7'
 API_AGENT_COMMENT = ''
 
+# Raw response type of a transport method
+_R = TypeVar('_R', Response, StreamingResponse)
+
+# Read-only methods not following the '*.read' naming scheme
+READ_METHODS = (
+    'cmdb.reports',
+    'idoit.version',
+    'idoit.constants',
+    'idoit.search',
+)
+
+
+class _InFlightRequest(object):
+    """
+    A read request in flight, shared by identical requests
+    """
+
+    def __init__(self) -> None:
+        self.future: Future = Future()
+        self.followers = 0
+
 
 class API(object):
     """
     Low-Level object to access the i-doit JSON-RPC API.
+
+    An API object is thread-safe and may be shared by worker threads:
+    request identifiers are generated atomically, logging in and out is serialized
+    and swaps the session identifier atomically, and the default transport uses
+    one HTTP session (connection pool) per thread. Requests themselves run concurrently.
+    Requests sent while another thread logs out may fail with an authentication error.
+
+    Several i-doit web nodes sharing one database (and session storage) can be
+    used as one API by passing a list of URLs. Each HTTP request goes to one of
+    them, chosen by ``balancing``; nodes that cannot be reached are skipped
+    for a while, and requests that could not be delivered are sent to another node.
     """
 
     def __init__(self,
-                 url: str,
+                 url: Union[str, List[str]],
                  key: str,
                  language: Optional[str] = None,
                  username: Optional[str] = None,
-                 password: Optional[str] = None
+                 password: Optional[str] = None,
+                 transport: Optional[Transport] = None,
+                 auto_relogin: bool = True,
+                 balancing: str = EndpointPool.ROUND_ROBIN,
+                 coalesce_reads: bool = False
                  ) -> None:
         """
         If username and password are not given, 'System API' user will be used.
 
-        :param str url: Base URL to i-doit's API
+        :param url: Base URL to i-doit's API, or a list of base URLs of several web nodes
+        :type url: Union[str, List[str]]
         :param str key: API Key
         :param str language: requests to and responses from i-doit will be translated
             to this language ('de' and 'en' supported)
         :param str username: (optional) Username
         :param str password: (optional) Password
+        :param Transport transport: (optional) a :py:mod:`~idoitapi.Transport` object
+            to send requests with, e.g. for recording or replaying requests;
+            default: :py:class:`~idoitapi.Transport.HTTPTransport`
+        :param bool auto_relogin: (optional) log in again and repeat the request
+            when the session has expired; default: ``True``
+        :param str balancing: (optional) how to choose between several URLs:
+            'round_robin' (default) or 'least_outstanding' requests
+        :param bool coalesce_reads: (optional) let identical concurrent read requests
+            share one HTTP request; default: ``False``
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         """
-        if not isinstance(url, str) or url == '':
+        urls = url if isinstance(url, list) else [url, ]
+        if len(urls) == 0:
             raise InvalidParams(message='URL parameter is invalid')
-        if not (url.startswith('http://') or url.startswith('https://')):
-            raise InvalidParams(message='Unsupported protocol in API URL '+url)
+        for base_url in urls:
+            if not isinstance(base_url, str) or base_url == '':
+                raise InvalidParams(message='URL parameter is invalid')
+            if not (base_url.startswith('http://') or base_url.startswith('https://')):
+                raise InvalidParams(message='Unsupported protocol in API URL '+base_url)
+        if balancing not in (EndpointPool.ROUND_ROBIN, EndpointPool.LEAST_OUTSTANDING):
+            raise InvalidParams(message='balancing parameter is invalid')
 
         if not isinstance(key, str) or key == '':
             raise InvalidParams(message='API key parameter is invalid')
@@ -57,18 +119,53 @@ class API(object):
             if language not in ('de', 'en'):
                 raise InvalidParams(message='language parameter is invalid')
 
-        if url.endswith('/src/jsonrpc.php'):
-            self.url = url
-        else:
-            if not url.endswith('/'):
-                url += '/'
-            self.url = url + 'src/jsonrpc.php'
+        self.urls: List[str] = []
+        for base_url in urls:
+            if not base_url.endswith('/src/jsonrpc.php'):
+                if not base_url.endswith('/'):
+                    base_url += '/'
+                base_url += 'src/jsonrpc.php'
+            self.urls.append(base_url)
+        self.url = self.urls[0]
+        self.endpoints = EndpointPool(self.urls, balancing)
+        self._language = language
         self.key = key
         self.username = username
         self.password = password
-        self._language = language
+        self._static_headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': API_AGENT_NAME + '/' + API_AGENT_VERSION + ' ' + API_AGENT_COMMENT
+        }
+        self._session_headers: Tuple[Optional[str], Dict] = (None, self._static_headers)
         self._session_id = None
+        self._session_lock = threading.RLock()
         self._id = 0
+        self._id_lock = threading.Lock()
+        self.transport = transport if transport is not None else HTTPTransport()
+        self.auto_relogin = auto_relogin
+        self.coalesce_reads = coalesce_reads
+        self._in_flight: Dict[Tuple[str, str], _InFlightRequest] = {}
+        self._in_flight_lock = threading.Lock()
+        self._auto_batcher: Optional[AutoBatcher] = None
+        # Auto-batcher of the current thread (see auto_batch())
+        self._local = threading.local()
+
+    @property
+    def key(self) -> str:
+        """
+        API key
+        """
+        return self._key
+
+    @key.setter
+    def key(self, key: str) -> None:
+        self._key = key
+        # Parameters added to every request; _params_prefix is their encoded form
+        # without the closing brace, see _encode_request()
+        self._static_params = {'apikey': key}
+        if self._language is not None:
+            self._static_params['language'] = self._language
+        self._params_prefix = json.dumps(self._static_params)[:-1]
 
     # def __del__(self):
     #     """
@@ -97,21 +194,22 @@ class API(object):
         :param str password: Overrides the current password value
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         """
-        if username is not None:
-            self.username = username
-        if password is not None:
-            self.password = password
-
-        headers = {
-            'X-RPC-Auth-Username': self.username,
-            'X-RPC-Auth-Password': self.password
-        }
-
-        response = self.request(
-            'idoit.login',
-            headers=headers
-        )
-        self._session_id = response['session-id']
+        with self._session_lock:
+            if username is not None:
+                self.username = username
+            if password is not None:
+                self.password = password
+
+            headers = {
+                'X-RPC-Auth-Username': self.username,
+                'X-RPC-Auth-Password': self.password
+            }
+
+            response = self.request(
+                'idoit.login',
+                headers=headers
+            )
+            self._session_id = response['session-id']
 
     def logout(self) -> None:
         """
@@ -119,8 +217,106 @@ class API(object):
 
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         """
-        self.request('idoit.logout')
-        self._session_id = None
+        with self._session_lock:
+            self.request('idoit.logout')
+            self._session_id = None
+
+    def close(self) -> None:
+        """
+        Send queued requests and release the transport's connections
+
+        The session stays logged in; the API can still be used afterwards,
+        opening new connections as needed.
+        """
+        self.disable_auto_batching()
+        self.transport.close()
+
+    def enable_auto_batching(self, window: float = 0.005, max_size: int = 100, max_workers: int = 4) -> AutoBatcher:
+        """
+        Collect single requests into batch requests from now on
+
+        Applies to the requests of all threads, e.g. of a thread pool. A
+        :py:meth:`request` (except logging in and out) issued while requests of
+        other threads are waiting is queued and sent together with the requests
+        issued within ``window`` seconds; otherwise it is sent right away, so a
+        single thread's loop of requests is not slowed down.
+
+        :param float window: (optional) seconds to wait for more requests; default: 0.005
+        :param int max_size: (optional) maximum number of sub-requests per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :return: the auto-batcher, e.g. to submit requests without waiting
+        :rtype: AutoBatcher
+        """
+        self.disable_auto_batching()
+        self._auto_batcher = AutoBatcher(self, window, max_size, max_workers)
+        return self._auto_batcher
+
+    def disable_auto_batching(self) -> None:
+        """
+        Send queued requests and stop collecting single requests into batch requests
+        """
+        auto_batcher = self._auto_batcher
+        self._auto_batcher = None
+        if auto_batcher is not None:
+            auto_batcher.close()
+
+    @contextmanager
+    def auto_batch(self,
+                   window: float = 0.005,
+                   max_size: int = 100,
+                   max_workers: int = 4,
+                   all_threads: bool = False
+                   ) -> Iterator[AutoBatcher]:
+        """
+        Collect single requests into batch requests within a ``with`` block
+
+        Inside the block, requests of the calling thread (with ``all_threads``:
+        of all threads) behave as with :py:meth:`enable_auto_batching`;
+        :py:meth:`AutoBatcher.submit <idoitapi.AutoBatcher.AutoBatcher.submit>` returns
+        a future instead of waiting. All queued requests are sent when the block is left.
+
+        :param float window: (optional) seconds to wait for more requests; default: 0.005
+        :param int max_size: (optional) maximum number of sub-requests per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :param bool all_threads: (optional) also collect the requests of other threads,
+            e.g. of a thread pool; default: only the calling thread's
+        :return: the auto-batcher
+        :rtype: AutoBatcher
+        """
+        auto_batcher = AutoBatcher(self, window, max_size, max_workers)
+        if all_threads:
+            previous = self._auto_batcher
+            self._auto_batcher = auto_batcher
+        else:
+            previous = getattr(self._local, 'auto_batcher', None)
+            self._local.auto_batcher = auto_batcher
+        try:
+            yield auto_batcher
+        finally:
+            if all_threads:
+                self._auto_batcher = previous
+            else:
+                self._local.auto_batcher = previous
+            auto_batcher.close()
+
+    def batch(self, chunk_size: int = 100, max_workers: int = 64) -> BatchBuilder:
+        """
+        Defer method calls of request objects and send their requests in batch requests
+
+        Use it as context manager; method calls of request objects passed to
+        :py:meth:`BatchBuilder.defer <idoitapi.BatchBuilder.BatchBuilder.defer>`
+        return futures, resolved when the ``with`` block is left::
+
+            with api.batch() as batch:
+                future = batch.defer(CMDBObject).update(42, {'title': 'New title'})
+
+        :param int chunk_size: (optional) maximum number of sub-requests per batch request; default: 100
+        :param int max_workers: (optional) maximum number of deferred calls running at the same time;
+            default: 64
+        :return: the batch builder
+        :rtype: BatchBuilder
+        """
+        return BatchBuilder(self, chunk_size, max_workers)
 
     def generate_id(self) -> int:
         """
@@ -129,8 +325,9 @@ class API(object):
         :return: the next request identifier
         :rtype: int
         """
-        self._id += 1
-        return self._id
+        with self._id_lock:
+            self._id += 1
+            return self._id
 
     def count_request(self) -> int:
         """
@@ -145,6 +342,15 @@ class API(object):
         """
         Perform a JSON RPC request.
 
+        If the session has expired, the API logs in again and repeats the request once
+        (see ``auto_relogin``).
+
+        With ``coalesce_reads``, identical read requests issued while such a request
+        is in flight share its result instead of being sent again.
+
+        With auto-batching (see :py:meth:`enable_auto_batching`), the request is sent
+        as part of a batch request if requests of other threads are waiting.
+
         :param str method: JSON RPC API method name
         :param dict params: method parameters
         :param dict headers: additional header lines
@@ -152,113 +358,489 @@ class API(object):
         :rtype: Any
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         """
-        req_headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': API_AGENT_NAME + '/' + API_AGENT_VERSION + ' ' + API_AGENT_COMMENT
-        }
-        if self._session_id is not None:
-            req_headers['X-RPC-Auth-Session'] = self._session_id
+        if self.coalesce_reads and headers is None and self.is_read_method(method):
+            return self._coalesced_request(method, params)
 
-        if isinstance(headers, dict):
-            req_headers.update(headers)
+        return self._request(method, params, headers)
 
-        req_params = {
-            'apikey': self.key
-        }
-        if isinstance(params, dict):
-            req_params.update(params)
-        if self._language is not None and 'language' not in req_params:
-            req_params['language'] = self._language
-
-        payload = {
-            'version': '2.0',
-            'method': method,
-            'params': req_params,
-            'id': self.generate_id(),
-        }
+    @staticmethod
+    def is_read_method(method: str) -> bool:
+        """
+        Does a JSON RPC API method only read data?
+
+        :param str method: JSON RPC API method name
+        :return: ``True`` for read-only methods
+        :rtype: bool
+        """
+        return method.endswith('.read') or method in READ_METHODS
+
+    def _coalesced_request(self, method: str, params: Optional[Dict]) -> Any:
+        """
+        Perform a read request, or wait for an identical one already in flight
+
+        Every caller gets its own copy of the result, so callers may modify it.
+
+        :param str method: JSON RPC API method name
+        :param dict params: method parameters
+        :return: the method's output data
+        :rtype: Any
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        key = (method, json.dumps(params, sort_keys=True) if isinstance(params, dict) else '')
+
+        with self._in_flight_lock:
+            existing = self._in_flight.get(key)
+            if existing is not None:
+                existing.followers += 1
+            else:
+                in_flight = _InFlightRequest()
+                self._in_flight[key] = in_flight
+
+        if existing is not None:
+            return copy.deepcopy(existing.future.result())
+
+        try:
+            result = self._request(method, params)
+        except BaseException as exc:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            in_flight.future.set_exception(exc)
+            raise
+
+        with self._in_flight_lock:
+            del self._in_flight[key]
+            followers = in_flight.followers
+        in_flight.future.set_result(result)
+
+        # The result is shared with the followers, which copy it: keep it unmodified
+        return copy.deepcopy(result) if followers > 0 else result
+
+    def _request(self, method: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> Any:
+        """
+        Perform a JSON RPC request (see :py:meth:`request`)
+
+        :param str method: JSON RPC API method name
+        :param dict params: method parameters
+        :param dict headers: additional header lines
+        :return: the method's output data
+        :rtype: Any
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        auto_batcher = getattr(self._local, 'auto_batcher', None) or self._auto_batcher
+        if auto_batcher is not None and headers is None and method not in ('idoit.login', 'idoit.logout'):
+            return auto_batcher.request(method, params)
+
+        return self._send_request(method, params, headers)
+
+    def _send_request(self, method: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> Any:
+        """
+        Perform a JSON RPC request on its own, bypassing auto-batching
+
+        :param str method: JSON RPC API method name
+        :param dict params: method parameters
+        :param dict headers: additional header lines
+        :return: the method's output data
+        :rtype: Any
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        data = self._encode_request(method, params, self.generate_id())
+
+        session_id = self._session_id
+        response = self._post(data, self._build_headers(session_id, headers), method, 1)
 
-        response = requests.post(
-            self.url,
-            data=json.dumps(payload),
-            headers=req_headers
-        ).json()
+        if 'error' in response and method not in ('idoit.login', 'idoit.logout') \
+                and self._relogin_after(session_id, response['error']):
+            response = self._post(data, self._build_headers(self._session_id, headers), method, 1)
 
         if 'error' in response:
-            error = response['error']
-            error_code = error['code']
-            for exception_class in [InvalidParams, InternalError, MethodNotFound]:
-                if exception_class.code == error_code:
-                    raise exception_class(
-                        data=error['data'],
-                        raw_code=error_code,
-                        message=error['message']
-                    )
-            raise UnknownError(
-                data=error['data'],
-                raw_code=error_code,
-                message=error['message']
-            )
+            raise exception_for(response['error'])
 
         return response['result']
 
-    def batch_request(self, payload: List[Dict], headers: Optional[Dict] = None) -> List[Any]:
+    def iter_request(self, method: str, params: Optional[Dict] = None) -> Iterator[Any]:
+        """
+        Perform a JSON RPC request whose result is a list, decoding one item at a time.
+
+        The response body is received and decoded in chunks, so large results
+        can be converted or written somewhere with bounded memory.
+        Yields nothing if the result is not a list.
+
+        :param str method: JSON RPC API method name
+        :param dict params: method parameters
+        :return: the items of the method's output data
+        :rtype: Iterator[Any]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        data = self._encode_request(method, params, self.generate_id())
+
+        session_id = self._session_id
+        items = iter_result(self._post_stream(data, self._build_headers(session_id), method))
+        try:
+            first = next(items)
+        except StopIteration:
+            return
+        except JSONRPC as exc:
+            error = {'code': exc.raw_code, 'message': exc.message, 'data': exc.data}
+            if not self._relogin_after(session_id, error):
+                raise
+            items = iter_result(self._post_stream(data, self._build_headers(self._session_id), method))
+            try:
+                first = next(items)
+            except StopIteration:
+                return
+
+        yield first
+        yield from items
+
+    def batch_request(self,
+                      payload: List[Dict],
+                      headers: Optional[Dict] = None,
+                      chunk_size: Optional[int] = None,
+                      max_workers: Optional[int] = None
+                      ) -> List[Any]:
         """
         Perform a JSON RPC batch request.
 
+        If the session has expired, the API logs in again and repeats
+        the failed sub-requests once (see ``auto_relogin``).
+        The sub-requests in ``payload`` are not modified.
+
+        With ``chunk_size``, the sub-requests are sent as several smaller batch requests,
+        ``max_workers`` of them at the same time (spread across all URLs).
+
         :param list[dict] payload: list of requests,
             each with 'method' key, and optionally 'params' and 'id'
         :param dict headers: additional header lines
-        :return: list of response data, each with either a 'result' or an 'error' key
-        :rtype: list[dict]
+        :param int chunk_size: (optional) maximum number of sub-requests per batch request
+        :param int max_workers: (optional) number of batch requests sent at the same time;
+            default: number of URLs
+        :return: list of results; a failed sub-request's error data takes the place of its result
+        :rtype: list
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         """
-        req_headers = {
-            'content-type': 'application/json'
-        }
-        if self._session_id is not None:
-            req_headers['X-RPC-Auth-Session'] = self._session_id
+        results = []
 
-        if isinstance(headers, dict):
-            req_headers.update(headers)
+        for response in self.raw_batch_request(payload, headers, chunk_size, max_workers):
+            if 'error' in response:
+                results.append(response['error'])
+            else:
+                results.append(response['result'])
+
+        return results
+
+    def raw_batch_request(self,
+                          payload: List[Dict],
+                          headers: Optional[Dict] = None,
+                          chunk_size: Optional[int] = None,
+                          max_workers: Optional[int] = None
+                          ) -> List[Dict]:
+        """
+        Perform a JSON RPC batch request and return the complete responses.
+
+        Like :py:meth:`batch_request`, but results and errors can be told apart.
+
+        :param list[dict] payload: list of requests,
+            each with 'method' key, and optionally 'params' and 'id'
+        :param dict headers: additional header lines
+        :param int chunk_size: (optional) maximum number of sub-requests per batch request
+        :param int max_workers: (optional) number of batch requests sent at the same time;
+            default: number of URLs
+        :return: list of response data in the order of ``payload``,
+            each with either a 'result' or an 'error' key
+        :rtype: list[dict]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        if chunk_size is not None:
+            if not isinstance(chunk_size, int) or chunk_size <= 0:
+                raise InvalidParams(message='"{}" is not a valid chunk_size parameter'.format(chunk_size))
+            if len(payload) > chunk_size:
+                chunks = [payload[idx:idx + chunk_size] for idx in range(0, len(payload), chunk_size)]
+                workers = max_workers if max_workers is not None else len(self.endpoints)
+                if workers > 1:
+                    with ThreadPoolExecutor(max_workers=workers) as executor:
+                        parts = list(executor.map(lambda chunk: self.raw_batch_request(chunk, headers), chunks))
+                else:
+                    parts = [self.raw_batch_request(chunk, headers) for chunk in chunks]
+                return [response for part in parts for response in part]
 
         data = []
+        static_params = self._static_params
 
         for rq in payload:
             if 'method' not in rq:
                 raise JSONRPC(message='Missing method in one of the sub-requests of this batch request')
 
-            params = {}
-
-            if 'params' in rq:
-                params = rq['params']
-
-            params['apikey'] = self.key
-            if self._language is not None and 'language' not in rq:
-                params['language'] = self._language
-            if 'id' not in rq:
-                rq['id'] = self.generate_id()
+            params = rq.get('params')
 
             data.append({
                 'version': '2.0',
                 'method': rq['method'],
-                'params': params,
-                'id': rq['id']
+                'params': {**static_params, **params} if isinstance(params, dict) else static_params,
+                'id': rq['id'] if 'id' in rq else self.generate_id()
             })
 
-        responses = requests.post(
-            self.url,
-            data=json.dumps(data),
-            headers=req_headers
-        ).json()
+        session_id = self._session_id
+        responses = self._post_batch(data, self._build_headers(session_id, headers))
+
+        expired = [
+            idx for idx, response in enumerate(responses)
+            if 'error' in response and is_session_error(response['error'])
+        ]
+        if len(expired) > 0 and self._relogin_after(session_id, responses[expired[0]]['error']):
+            retried = self._post_batch(
+                [data[idx] for idx in expired],
+                self._build_headers(self._session_id, headers)
+            )
+            for idx, response in zip(expired, retried):
+                responses[idx] = response
 
-        results = []
+        return responses
+
+    def _encode_request(self, method: str, params: Optional[Dict], request_id: int) -> Union[str, StreamingBody]:
+        """
+        Encode a single JSON-RPC request
+
+        The API key and language are spliced in as pre-encoded JSON,
+        so the caller's parameters are neither copied nor modified.
+        Parameters overriding 'apikey' or 'language' take precedence.
+
+        :param str method: JSON RPC API method name
+        :param dict params: method parameters
+        :param int request_id: request identifier
+        :return: JSON encoded request, or a streaming body for requests containing
+            :py:class:`~idoitapi.utils.Base64File` values
+        :rtype: Union[str, StreamingBody]
+        """
+        if not isinstance(params, dict) or len(params) == 0:
+            encoded_params = self._params_prefix + '}'
+        elif 'apikey' in params or 'language' in params:
+            return encode_request({
+                'version': '2.0', 'method': method, 'params': {**self._static_params, **params}, 'id': request_id
+            })
+        else:
+            try:
+                encoded_params = json.dumps(params)
+            except TypeError:
+                return encode_request({
+                    'version': '2.0', 'method': method, 'params': {**self._static_params, **params}, 'id': request_id
+                })
+            return ''.join((
+                '{"version": "2.0", "method": ', encode_basestring_ascii(method),
+                ', "params": ', self._params_prefix, ', ', encoded_params[1:],
+                ', "id": ', str(request_id), '}'
+            ))
+
+        return ''.join((
+            '{"version": "2.0", "method": ', encode_basestring_ascii(method),
+            ', "params": ', encoded_params, ', "id": ', str(request_id), '}'
+        ))
+
+    def _build_headers(self, session_id: Optional[str], headers: Optional[Dict] = None) -> Dict:
+        """
+        Build the header lines for a request
+
+        The header lines for the current session are built once and shared
+        between requests; transports must not modify them.
+
+        :param str session_id: Session identifier, or ``None`` if not logged in
+        :param dict headers: additional header lines
+        :return: header lines
+        :rtype: dict
+        """
+        if session_id is None:
+            req_headers = self._static_headers
+        else:
+            cached_session_id, req_headers = self._session_headers
+            if cached_session_id != session_id:
+                req_headers = dict(self._static_headers)
+                req_headers['X-RPC-Auth-Session'] = session_id
+                self._session_headers = (session_id, req_headers)
+
+        if isinstance(headers, dict) and len(headers) > 0:
+            req_headers = dict(req_headers)
+            req_headers.update(headers)
+
+        return req_headers
+
+    def _relogin_after(self, session_id: Optional[str], error: Dict) -> bool:
+        """
+        Log in again if a request failed because its session has expired
+
+        Only the first thread noticing the expired session logs in again;
+        other threads wait for it and then use the new session.
+
+        :param str session_id: Session identifier the failed request was sent with
+        :param dict error: JSON-RPC error object of the failed request
+        :return: ``True`` if the request should be repeated with the new session
+        :rtype: bool
+        :raises: :py:exc:`~idoitapi.APIException.APIException` if logging in fails
+        """
+        if not self.auto_relogin or session_id is None or not is_session_error(error):
+            return False
+
+        with self._session_lock:
+            if self._session_id == session_id:
+                self._session_id = None
+                self.login()
+
+            return self._session_id is not None
+
+    def _post_batch(self, data: List[Dict], headers: Dict) -> List[Dict]:
+        """
+        Send a batch request and order the responses like the sub-requests
+
+        :param list[dict] data: sub-requests, each with an 'id'
+        :param dict headers: header lines
+        :return: responses, each with either a 'result' or an 'error' key
+        :rtype: list[dict]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on invalid responses
+        """
+        responses = self._post(encode_request(data), headers, 'batch', len(data))
+
+        if not isinstance(responses, list):
+            raise JSONRPC(message='Found invalid result for batch request: {}'.format(responses))
 
         for response in responses:
             if not isinstance(response, dict):
                 raise JSONRPC(message='Found invalid result for request in batch: {}'.format(response))
-            if 'error' in response:
-                results.append(response['error'])
-            else:
-                results.append(response['result'])
 
-        return results
+        by_id = {response.get('id'): response for response in responses}
+        if len(by_id) == len(data) and all(rq['id'] in by_id for rq in data):
+            return [by_id[rq['id']] for rq in data]
+
+        return responses
+
+    def _post(self, data: Union[str, StreamingBody], headers: Dict, method: str, batch_length: int) -> Any:
+        """
+        Send an encoded JSON-RPC request and decode the response
+
+        Each HTTP request is traced as a span with the method name,
+        the number of sub-requests, the amount of bytes sent and received,
+        the endpoint, and the HTTP status code.
+
+        :param data: JSON encoded request
+        :type data: Union[str, StreamingBody]
+        :param dict headers: header lines
+        :param str method: JSON RPC API method name ('batch' for batch requests)
+        :param int batch_length: number of (sub-)requests
+        :return: decoded response
+        :rtype: Any
+        """
+        if get_tracer() is None:
+            return json.loads(self._send(data, headers)[1].content.decode('utf-8-sig'))
+
+        with span('idoitapi.http ' + method, {
+            'rpc.system': 'jsonrpc',
+            'rpc.method': method,
+            'idoitapi.batch_length': batch_length,
+            'http.request.body.size': len(data),
+        }) as current_span:
+            url, response = self._send(data, headers)
+            current_span.set_attribute('url.full', url)
+            current_span.set_attribute('http.response.status_code', response.status_code)
+            current_span.set_attribute('http.response.body.size', len(response.content))
+            return json.loads(response.content.decode('utf-8-sig'))
+
+    def _post_stream(self, data: Union[str, StreamingBody], headers: Dict, method: str) -> Iterator[bytes]:
+        """
+        Send an encoded JSON-RPC request and receive the response body in chunks
+
+        :param data: JSON encoded request
+        :type data: Union[str, StreamingBody]
+        :param dict headers: header lines
+        :param str method: JSON RPC API method name
+        :return: the response body in chunks
+        :rtype: Iterator[bytes]
+        """
+        if get_tracer() is None:
+            return self._send_stream(data, headers)[1].chunks
+
+        with span('idoitapi.http ' + method, {
+            'rpc.system': 'jsonrpc',
+            'rpc.method': method,
+            'idoitapi.batch_length': 1,
+            'http.request.body.size': len(data),
+        }) as current_span:
+            url, response = self._send_stream(data, headers)
+            current_span.set_attribute('url.full', url)
+            current_span.set_attribute('http.response.status_code', response.status_code)
+            return response.chunks
+
+    def _send(self, data: Union[str, StreamingBody], headers: Dict) -> Tuple[str, Response]:
+        """
+        Send an encoded JSON-RPC request to one of the endpoints
+
+        If the request could not be delivered, it is sent to the next endpoint.
+
+        :param data: JSON encoded request
+        :type data: Union[str, StreamingBody]
+        :param dict headers: header lines
+        :return: the endpoint's URL and its raw response
+        :rtype: tuple
+        """
+        if len(self.endpoints) == 1:
+            return self.url, self.transport.post(self.url, data, headers)
+
+        endpoint, response = self._post_to_endpoint(self.transport.post, data, headers)
+        self.endpoints.release(endpoint, response.status_code < 500)
+        return endpoint.url, response
+
+    def _send_stream(self, data: Union[str, StreamingBody], headers: Dict) -> Tuple[str, StreamingResponse]:
+        """
+        Send an encoded JSON-RPC request to one of the endpoints and receive the response body in chunks
+
+        If the request could not be delivered, it is sent to the next endpoint.
+        The endpoint counts as busy until the body has been read or its chunks are closed.
+
+        :param data: JSON encoded request
+        :type data: Union[str, StreamingBody]
+        :param dict headers: header lines
+        :return: the endpoint's URL and its raw response
+        :rtype: tuple
+        """
+        if len(self.endpoints) == 1:
+            return self.url, self.transport.post_stream(self.url, data, headers)
+
+        endpoint, response = self._post_to_endpoint(self.transport.post_stream, data, headers)
+
+        def chunks() -> Iterator[bytes]:
+            success = response.status_code < 500
+            try:
+                yield from response.chunks
+            except Exception:
+                success = False
+                raise
+            finally:
+                self.endpoints.release(endpoint, success)
+
+        return endpoint.url, StreamingResponse(response.status_code, chunks())
+
+    def _post_to_endpoint(self,
+                          post: Callable[[str, Union[str, StreamingBody], Dict], _R],
+                          data: Union[str, StreamingBody],
+                          headers: Dict
+                          ) -> Tuple[Endpoint, _R]:
+        """
+        Send an encoded JSON-RPC request to one of the endpoints, trying the next one if it could not be delivered
+
+        The endpoint is returned still acquired; the caller releases it.
+
+        :param post: transport method sending the request
+        :param data: JSON encoded request
+        :type data: Union[str, StreamingBody]
+        :param dict headers: header lines
+        :return: the endpoint and its raw response
+        :rtype: tuple
+        """
+        failed: List[Endpoint] = []
+
+        while True:
+            endpoint = self.endpoints.acquire(exclude=failed)
+            try:
+                return endpoint, post(endpoint.url, data, headers)
+            except Exception as exc:
+                self.endpoints.release(endpoint, False)
+                failed.append(endpoint)
+                if len(failed) < len(self.endpoints) and self.transport.is_retryable(exc):
+                    continue
+                raise
@@ -1,4 +1,4 @@
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 
 
 class APIException(Exception):
@@ -56,6 +56,69 @@ class MethodNotFound(JSONRPC):
 
 
 class UnknownError(JSONRPC):
-    code = None
+    code: Optional[int] = None
     message = 'Unknown error'
     meaning = 'An unknown error occurred'
+
+
+# Derived from UnknownError, which i-doit's authentication errors used to raise
+class AuthenticationError(UnknownError):
+    code = -32604
+    message = 'Authentication error'
+    meaning = 'Authentication failed or session expired.'
+
+
+def exception_for(error: Dict) -> JSONRPC:
+    """
+    Build the exception matching a JSON-RPC error object
+
+    :param dict error: JSON-RPC error object with 'code', 'message', and (optional) 'data'
+    :return: the exception
+    :rtype: JSONRPC
+    """
+    error_code = error.get('code')
+    for exception_class in (InvalidParams, InternalError, MethodNotFound, AuthenticationError):
+        if exception_class.code == error_code:
+            return exception_class(
+                data=error.get('data'),
+                raw_code=error_code,
+                message=error.get('message')
+            )
+    return UnknownError(
+        data=error.get('data'),
+        raw_code=error_code,
+        message=error.get('message')
+    )
+
+
+# Texts i-doit sends with an authentication error when the session is missing, invalid or expired
+SESSION_ERROR_MESSAGES = (
+    'session expired',
+    'session id is invalid',
+    'session id is invalid. session might have been expired or logged out.',
+    'invalid session',
+    'invalid session id',
+    'session not found',
+    'unable to find session',
+)
+
+
+def is_session_error(error: Dict) -> bool:
+    """
+    Check whether a JSON-RPC error object reports a missing, invalid or expired session
+
+    Only authentication errors (code -32604) whose message or data is one of
+    ``SESSION_ERROR_MESSAGES`` count, so that other errors never cause a request
+    to be sent again.
+
+    :param dict error: JSON-RPC error object
+    :return: ``True`` for session errors
+    :rtype: bool
+    """
+    if error.get('code') != AuthenticationError.code:
+        return False
+    data = error.get('data')
+    if isinstance(data, dict):
+        data = data.get('error', data.get('message'))
+    texts = (error.get('message'), data)
+    return any(isinstance(text, str) and text.strip().lower() in SESSION_ERROR_MESSAGES for text in texts)
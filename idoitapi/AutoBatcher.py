@@ -0,0 +1,168 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+from idoitapi.APIException import JSONRPC, exception_for
+
+
+class AutoBatcher(object):
+    """
+    Collects single requests into batch requests
+
+    Requests submitted within ``window`` seconds of each other are sent as one
+    batch request of up to ``max_size`` sub-requests. Each request gets a future,
+    resolved with its result or with its typed exception.
+
+    :py:meth:`request` waits for its result, so it is only queued while requests
+    of other threads are waiting; otherwise it is sent right away. A loop in a
+    single thread thus keeps its speed; to share batch requests, it should use
+    :py:meth:`submit` and collect the results afterwards.
+
+    Usually created by :py:meth:`~idoitapi.API.API.auto_batch` or
+    :py:meth:`~idoitapi.API.API.enable_auto_batching`.
+    """
+
+    def __init__(self, api, window: float = 0.005, max_size: int = 100, max_workers: int = 4) -> None:
+        """
+        :param API api: API object used to send the batch requests
+        :param float window: (optional) seconds to wait for more requests
+            before sending a batch request; default: 0.005
+        :param int max_size: (optional) maximum number of sub-requests per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        """
+        if window < 0:
+            raise ValueError('window must not be negative')
+        if max_size <= 0:
+            raise ValueError('max_size must be positive')
+        self._api = api
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[Tuple[str, Optional[Dict], Future]] = []
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        # Callers of request() waiting for their result
+        self._waiting = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self) -> 'AutoBatcher':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def submit(self, method: str, params: Optional[Dict] = None) -> Future:
+        """
+        Queue a request for the next batch request
+
+        :param str method: JSON RPC API method name
+        :param dict params: method parameters
+        :return: future resolved with the method's output data
+        :rtype: concurrent.futures.Future
+        :raises: :py:exc:`~idoitapi.APIException.APIException` if closed
+        """
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise JSONRPC(message='Auto-batching has already been stopped')
+            self._pending.append((method, params, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='idoitapi-auto-batcher', daemon=True)
+                self._thread.start()
+            if len(self._pending) == 1 or len(self._pending) >= self.max_size:
+                self._condition.notify()
+        return future
+
+    def request(self, method: str, params: Optional[Dict] = None) -> Any:
+        """
+        Perform a request and wait for its result
+
+        The request is queued for the next batch request if requests of other
+        threads are waiting; otherwise it is sent right away.
+
+        :param str method: JSON RPC API method name
+        :param dict params: method parameters
+        :return: the method's output data
+        :rtype: Any
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        with self._condition:
+            alone = self._waiting == 0 and len(self._pending) == 0
+            self._waiting += 1
+        try:
+            if alone:
+                return self._api._send_request(method, params)
+            return self.submit(method, params).result()
+        finally:
+            with self._condition:
+                self._waiting -= 1
+
+    def flush(self) -> None:
+        """
+        Send all queued requests now and wait until they are answered
+        """
+        with self._condition:
+            futures = [future for _, _, future in self._pending]
+            if len(futures) > 0:
+                self._flush_requested = True
+                self._condition.notify()
+        wait(futures)
+
+    def close(self) -> None:
+        """
+        Send all queued requests, wait for them, and stop
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self._executor.shutdown(wait=True)
+
+    def _run(self) -> None:
+        """
+        Collect queued requests into batches until closed
+        """
+        while True:
+            with self._condition:
+                while len(self._pending) == 0 and not self._closed:
+                    self._condition.wait()
+                if len(self._pending) == 0:
+                    return
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_size and not self._closed and not self._flush_requested:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_size]
+                del self._pending[:self.max_size]
+                if len(self._pending) == 0:
+                    self._flush_requested = False
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch: List[Tuple[str, Optional[Dict], Future]]) -> None:
+        """
+        Send queued requests as one batch request and resolve their futures
+
+        :param list batch: queued requests
+        """
+        try:
+            responses = self._api.raw_batch_request([
+                {'method': method, 'params': params} for method, params, _ in batch
+            ])
+        except BaseException as exc:
+            for _, _, future in batch:
+                future.set_exception(exc)
+            return
+
+        for (_, _, future), response in zip(batch, responses):
+            if 'error' in response:
+                future.set_exception(exception_for(response['error']))
+            else:
+                future.set_result(response.get('result'))
@@ -0,0 +1,323 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from idoitapi.APIException import exception_for
+
+
+class _Waiter(object):
+    """
+    Sub-requests of one deferred call, waiting for the next batch request
+    """
+
+    def __init__(self, index: int, payload: List[Dict]) -> None:
+        self.index = index
+        self.payload = payload
+        self.responses: List[Dict] = []
+        self.exception: Optional[BaseException] = None
+        self.event = threading.Event()
+
+
+class _LazyFuture(Future):
+    """
+    Future of a deferred call; asking for its result sends the batch
+    """
+
+    def __init__(self, builder: 'BatchBuilder') -> None:
+        super(_LazyFuture, self).__init__()
+        self._builder = builder
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        if not self.done() and not self._builder.is_executing():
+            self._builder.execute()
+        return super(_LazyFuture, self).result(timeout)
+
+    def exception(self, timeout: Optional[float] = None) -> Optional[BaseException]:
+        if not self.done() and not self._builder.is_executing():
+            self._builder.execute()
+        return super(_LazyFuture, self).exception(timeout)
+
+
+class _DeferredAPI(object):
+    """
+    Stands in for the API in deferred calls: requests wait for the next batch request
+    """
+
+    def __init__(self, api, builder: 'BatchBuilder') -> None:
+        self._deferred_api = api
+        self._builder = builder
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._deferred_api, name)
+
+    def request(self, method: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> Any:
+        if headers is not None or method in ('idoit.login', 'idoit.logout'):
+            return self._deferred_api.request(method, params, headers)
+
+        response = self.raw_batch_request([{'method': method, 'params': params}])[0]
+        if 'error' in response:
+            raise exception_for(response['error'])
+        return response['result']
+
+    def batch_request(self,
+                      payload: List[Dict],
+                      headers: Optional[Dict] = None,
+                      chunk_size: Optional[int] = None,
+                      max_workers: Optional[int] = None
+                      ) -> List[Any]:
+        return [
+            response['error'] if 'error' in response else response['result']
+            for response in self.raw_batch_request(payload, headers, chunk_size, max_workers)
+        ]
+
+    def raw_batch_request(self,
+                          payload: List[Dict],
+                          headers: Optional[Dict] = None,
+                          chunk_size: Optional[int] = None,
+                          max_workers: Optional[int] = None
+                          ) -> List[Dict]:
+        if headers is not None or not self._builder.in_deferred_call():
+            return self._deferred_api.raw_batch_request(payload, headers, chunk_size, max_workers)
+        if len(payload) == 0:
+            return []
+        return self._builder.wait_for_batch(payload)
+
+
+class _DeferredRequest(object):
+    """
+    Request object whose method calls are deferred
+    """
+
+    def __init__(self, request, builder: 'BatchBuilder') -> None:
+        self._request = request
+        self._builder = builder
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._request, name)
+        if not callable(attribute):
+            return attribute
+
+        def deferred(*args: Any, **kwargs: Any) -> Future:
+            return self._builder.call(attribute, *args, **kwargs)
+        deferred.__name__ = name
+        deferred.__doc__ = attribute.__doc__
+        return deferred
+
+
+class BatchBuilder(object):
+    """
+    Defers method calls of request objects and sends their requests in batch requests
+
+    Usually created by :py:meth:`~idoitapi.API.API.batch`::
+
+        with api.batch() as batch:
+            updated = batch.defer(CMDBObject).update(42, {'title': 'New title'})
+            saved = batch.defer(CMDBCategory).save(42, 'C__CATG__MODEL', {'serial': '123'})
+        saved.result()
+
+    Every deferred call returns a future. When the ``with`` block is left
+    (or a result is asked for), all deferred calls run at the same time.
+    Their requests are collected and sent as one batch request
+    (split into chunks of ``chunk_size`` sub-requests); calls needing several
+    requests one after another take several such rounds.
+    Each future is resolved with the method's return value or its typed exception.
+    """
+
+    def __init__(self, api, chunk_size: int = 100, max_workers: int = 64) -> None:
+        """
+        :param API api: API object used to send the batch requests
+        :param int chunk_size: (optional) maximum number of sub-requests per batch request; default: 100
+        :param int max_workers: (optional) maximum number of deferred calls running at the same time;
+            default: 64
+        """
+        self._api = api
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.rounds = 0
+        """Number of rounds of batch requests sent so far"""
+        self._proxy = _DeferredAPI(api, self)
+        self._calls: List[tuple] = []
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._executing = threading.Event()
+        self._local = threading.local()
+        self._waiters: List[_Waiter] = []
+        self._unfinished = 0
+
+    def __enter__(self) -> 'BatchBuilder':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.execute()
+        else:
+            with self._lock:
+                calls, self._calls = self._calls, []
+            for _, _, _, future in calls:
+                future.cancel()
+
+    def defer(self, request) -> Any:
+        """
+        Defer the method calls of a request object
+
+        :param request: a :py:mod:`~idoitapi.Request` class, e.g. ``CMDBObject``,
+            or a request object
+        :return: stand-in for the request object whose methods return futures
+        """
+        if isinstance(request, type):
+            request = request(self._proxy)
+        else:
+            request = _clone(request, self._proxy)
+        return _DeferredRequest(request, self)
+
+    def request(self, method: str, params: Optional[Dict] = None) -> Future:
+        """
+        Defer a single request
+
+        :param str method: JSON RPC API method name
+        :param dict params: method parameters
+        :return: future resolved with the method's output data
+        :rtype: concurrent.futures.Future
+        """
+        return self.call(self._proxy.request, method, params)
+
+    def call(self, function: Callable, *args: Any, **kwargs: Any) -> Future:
+        """
+        Defer a call of a function sending requests through this builder's API stand-in
+
+        :param function: function to call
+        :return: future resolved with the function's return value
+        :rtype: concurrent.futures.Future
+        """
+        future = _LazyFuture(self)
+        with self._lock:
+            self._calls.append((function, args, kwargs, future))
+        return future
+
+    def is_executing(self) -> bool:
+        """
+        Are deferred calls running right now?
+
+        :rtype: bool
+        """
+        return self._executing.is_set()
+
+    def in_deferred_call(self) -> bool:
+        """
+        Is the current thread running a deferred call?
+
+        :rtype: bool
+        """
+        return getattr(self._local, 'index', None) is not None
+
+    def execute(self) -> None:
+        """
+        Run all deferred calls and send their requests
+        """
+        with self._lock:
+            calls, self._calls = self._calls, []
+            if len(calls) == 0:
+                return
+            self._executing.set()
+
+        try:
+            self._unfinished = len(calls)
+            workers = min(len(calls), self.max_workers)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for index, call in enumerate(calls):
+                    executor.submit(self._run, index, *call)
+                self._send_rounds(workers)
+        finally:
+            self._executing.clear()
+
+    def wait_for_batch(self, payload: List[Dict]) -> List[Dict]:
+        """
+        Queue the sub-requests of the current deferred call and wait for their responses
+
+        :param list[dict] payload: list of requests,
+            each with 'method' key, and optionally 'params'
+        :return: list of response data, each with either a 'result' or an 'error' key
+        :rtype: list[dict]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        waiter = _Waiter(self._local.index, payload)
+        with self._condition:
+            self._waiters.append(waiter)
+            self._condition.notify_all()
+        waiter.event.wait()
+        if waiter.exception is not None:
+            raise waiter.exception
+        return waiter.responses
+
+    def _run(self, index: int, function: Callable, args: tuple, kwargs: Dict, future: Future) -> None:
+        """
+        Run a deferred call in a worker thread
+        """
+        try:
+            if future.set_running_or_notify_cancel():
+                self._local.index = index
+                try:
+                    future.set_result(function(*args, **kwargs))
+                except BaseException as exc:
+                    future.set_exception(exc)
+                finally:
+                    self._local.index = None
+        finally:
+            with self._condition:
+                self._unfinished -= 1
+                self._condition.notify_all()
+
+    def _send_rounds(self, workers: int) -> None:
+        """
+        Send a batch request whenever all running deferred calls wait for one
+        """
+        while True:
+            with self._condition:
+                while True:
+                    if self._unfinished == 0:
+                        return
+                    if len(self._waiters) > 0 and len(self._waiters) >= min(self._unfinished, workers):
+                        break
+                    self._condition.wait()
+                # Keep the order of the deferred calls
+                waiters = sorted(self._waiters, key=lambda queued: queued.index)
+                self._waiters = []
+
+            self._send(waiters)
+
+    def _send(self, waiters: List[_Waiter]) -> None:
+        """
+        Send the queued sub-requests as one (chunked) batch request and wake up their calls
+        """
+        self.rounds += 1
+        payload = [
+            {'method': rq['method'], 'params': rq.get('params')}
+            for waiter in waiters for rq in waiter.payload
+        ]
+        try:
+            responses = self._api.raw_batch_request(payload, chunk_size=self.chunk_size)
+        except BaseException as exc:
+            for waiter in waiters:
+                waiter.exception = exc
+                waiter.event.set()
+            return
+
+        offset = 0
+        for waiter in waiters:
+            waiter.responses = responses[offset:offset + len(waiter.payload)]
+            offset += len(waiter.payload)
+            waiter.event.set()
+
+
+def _clone(request, api) -> Any:
+    """
+    Copy a request object, sending its requests through another API
+
+    :param request: request object
+    :param api: API (stand-in) for the copy
+    :return: the copy
+    """
+    clone = request.__class__.__new__(request.__class__)
+    clone.__dict__.update(request.__dict__)
+    clone._api = api
+    return clone
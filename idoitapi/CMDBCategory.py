@@ -1,7 +1,79 @@
-from typing import List, Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, List, Dict, Iterator, NamedTuple, Optional, Sequence, Tuple, Union
 
 from idoitapi.Request import Request
-from idoitapi.APIException import JSONRPC
+from idoitapi.tracing import traced
+from idoitapi.APIException import APIException, JSONRPC, InvalidParams, exception_for
+
+
+class CategoryChange(NamedTuple):
+    """
+    Category entry changed (or to be changed) by :py:meth:`CMDBCategory.sync`
+    """
+    object_id: int
+    category: str
+    entry_id: Optional[int]
+    """Entry identifier, or ``None`` for an entry still to be created (dry run)"""
+    changes: Dict[str, Tuple[Any, Any]]
+    """Changed attributes: pairs of current and new value"""
+    created: bool
+    """Was the entry created (or would it be, in a dry run)?"""
+
+
+class EntryOutcome(NamedTuple):
+    """
+    Outcome of one category entry in a batch operation like :py:meth:`CMDBCategory.batch_save`
+    """
+    object_id: int
+    category: str
+    entry_id: Optional[int]
+    """Entry identifier; for saved entries the one returned by i-doit"""
+    error: Optional[APIException]
+    """Exception of the failed sub-request, or ``None`` on success"""
+
+    @property
+    def ok(self) -> bool:
+        """
+        Was the operation successful?
+        """
+        return self.error is None
+
+
+def _same_value(current: Any, desired: Any) -> bool:
+    """
+    Whether an attribute read from i-doit already has the desired value
+
+    Read values are often richer than the values to save, e.g. dialog
+    attributes are read as dicts with 'id', 'title' and 'const', and
+    numbers as strings; the desired value matches any of them.
+
+    :param current: value as read
+    :param desired: value to save
+    :rtype: bool
+    """
+    if current == desired:
+        return True
+    if desired is None:
+        return current in ('', [], {})
+    if isinstance(current, dict):
+        if isinstance(desired, dict):
+            return all(_same_value(current.get(key), value) for key, value in desired.items())
+        return any(
+            current.get(key) is not None and str(current[key]) == str(desired)
+            for key in ('id', 'title', 'const', 'ref_id', 'value')
+        )
+    if isinstance(current, list):
+        desired_values = desired if isinstance(desired, list) else [desired]
+        return len(current) == len(desired_values) and all(
+            any(_same_value(value, wanted) for value in current) for wanted in desired_values
+        )
+    if isinstance(desired, list):
+        return False
+    if current is None:
+        return desired == ''
+    if isinstance(desired, bool):
+        return str(current) == str(int(desired))
+    return str(current) == str(desired)
 
 
 class CMDBCategory(Request):
@@ -302,6 +374,193 @@ class CMDBCategory(Request):
 
         return entry_ids
 
+    def batch_save(self,
+                   entries: List[Tuple[int, str, Optional[int], Dict]],
+                   chunk_size: int = 100,
+                   max_workers: int = 4,
+                   progress: Optional[Callable[[int, int], None]] = None
+                   ) -> List[EntryOutcome]:
+        """
+        Create new or update existing category entries for many objects
+
+        :param list[tuple] entries: object identifier, category constant,
+            entry identifier (``None`` for new entries and single-value categories), and attributes
+        :param int chunk_size: (optional) maximum number of entries per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :param progress: (optional) function called with the number of entries done and the total
+        :return: outcome of each entry, in order
+        :rtype: list[EntryOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
+        """
+        requests = []
+        for object_id, category, entry_id, attributes in entries:
+            params = {
+                'object': object_id,
+                'category': category,
+                'data': attributes,
+            }
+            if entry_id is not None:
+                params['entry'] = entry_id
+            requests.append({
+                'method': 'cmdb.category.save',
+                'params': params
+            })
+
+        outcomes = []
+        for (object_id, category, entry_id, _), (result, error) in zip(
+                entries, self.send_chunked(requests, chunk_size, max_workers, progress)
+        ):
+            if error is None:
+                if isinstance(result, dict) and isinstance(result.get('entry'), int):
+                    entry_id = result['entry']
+                else:
+                    error = JSONRPC(message='Bad result')
+            outcomes.append(EntryOutcome(object_id, category, entry_id, error))
+        return outcomes
+
+    def batch_archive(self, entries: Sequence[Tuple], chunk_size: int = 100, max_workers: int = 4,
+                      progress: Optional[Callable[[int, int], None]] = None) -> List[EntryOutcome]:
+        """
+        Archive entries in multi-value categories for many objects
+
+        :param entries: tuples of object identifier, category constant and entry identifier
+            (further items, e.g. attributes, are ignored)
+        :param int chunk_size: (optional) maximum number of entries per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :param progress: (optional) function called with the number of entries done and the total
+        :return: outcome of each entry, in order
+        :rtype: list[EntryOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
+        """
+        return self._batch_entries('cmdb.category.archive', ('object', 'category', 'entry'),
+                                   entries, chunk_size, max_workers, progress)
+
+    def batch_delete(self, entries: Sequence[Tuple], chunk_size: int = 100, max_workers: int = 4,
+                     progress: Optional[Callable[[int, int], None]] = None) -> List[EntryOutcome]:
+        """
+        Mark entries in multi-value categories for many objects as deleted
+
+        :param entries: tuples of object identifier, category constant and entry identifier
+            (further items, e.g. attributes, are ignored)
+        :param int chunk_size: (optional) maximum number of entries per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :param progress: (optional) function called with the number of entries done and the total
+        :return: outcome of each entry, in order
+        :rtype: list[EntryOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
+        """
+        return self._batch_entries('cmdb.category.delete', ('object', 'category', 'entry'),
+                                   entries, chunk_size, max_workers, progress)
+
+    def batch_purge(self, entries: Sequence[Tuple], chunk_size: int = 100, max_workers: int = 4,
+                    progress: Optional[Callable[[int, int], None]] = None) -> List[EntryOutcome]:
+        """
+        Purge entries in single- or multi-value categories for many objects
+
+        :param entries: tuples of object identifier, category constant and entry identifier
+            (``None`` for single-value categories; further items, e.g. attributes, are ignored)
+        :param int chunk_size: (optional) maximum number of entries per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :param progress: (optional) function called with the number of entries done and the total
+        :return: outcome of each entry, in order
+        :rtype: list[EntryOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
+        """
+        return self._batch_entries('cmdb.category.purge', ('object', 'category', 'entry'),
+                                   entries, chunk_size, max_workers, progress)
+
+    def batch_recycle(self, entries: Sequence[Tuple], chunk_size: int = 100, max_workers: int = 4,
+                      progress: Optional[Callable[[int, int], None]] = None) -> List[EntryOutcome]:
+        """
+        Restore entries in multi-value categories for many objects to "normal" state
+
+        :param entries: tuples of object identifier, category constant and entry identifier
+            (further items, e.g. attributes, are ignored)
+        :param int chunk_size: (optional) maximum number of entries per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :param progress: (optional) function called with the number of entries done and the total
+        :return: outcome of each entry, in order
+        :rtype: list[EntryOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
+        """
+        return self._batch_entries('cmdb.category.recycle', ('objID', 'category', 'entry'),
+                                   entries, chunk_size, max_workers, progress)
+
+    def batch_quick_purge(self, entries: Sequence[Tuple], chunk_size: int = 100, max_workers: int = 4,
+                          progress: Optional[Callable[[int, int], None]] = None) -> List[EntryOutcome]:
+        """
+        Purge entries in multi-value categories for many objects
+
+        :param entries: tuples of object identifier, category constant and entry identifier
+            (further items, e.g. attributes, are ignored)
+        :param int chunk_size: (optional) maximum number of entries per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :param progress: (optional) function called with the number of entries done and the total
+        :return: outcome of each entry, in order
+        :rtype: list[EntryOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
+        """
+        # noinspection SpellCheckingInspection
+        return self._batch_entries('cmdb.category.quickpurge', ('objID', 'category', 'cateID'),
+                                   entries, chunk_size, max_workers, progress)
+
+    @traced
+    def batch_clear(self, object_ids: List[int], categories: List[str], chunk_size: int = 100,
+                    max_workers: int = 4) -> List[EntryOutcome]:
+        """
+        Archive category entries for many objects
+
+        Entries are read with :py:meth:`iter_batch_read` and archived with :py:meth:`batch_archive`.
+
+        :param list[int] object_ids: List of object identifiers as integers
+        :param list[str] categories: List of category constants as strings
+        :param int chunk_size: (optional) maximum number of sub-requests per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :return: outcome of each archived entry
+        :rtype: list[EntryOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` if reading the entries fails
+        """
+        entries = []
+        for object_id, category, current in self.iter_batch_read(
+                object_ids, categories, chunk_size=chunk_size, max_workers=max_workers
+        ):
+            for entry in current:
+                entries.append((object_id, category, int(entry['id'])))
+        return self.batch_archive(entries, chunk_size, max_workers)
+
+    def _batch_entries(self,
+                       method: str,
+                       keys: Tuple[str, str, str],
+                       entries: Sequence[Tuple],
+                       chunk_size: int,
+                       max_workers: int,
+                       progress: Optional[Callable[[int, int], None]]
+                       ) -> List[EntryOutcome]:
+        """
+        Apply a method to many entries
+
+        :param str method: method name
+        :param tuple keys: parameter names of object identifier, category constant and entry identifier
+        :return: outcome of each entry, in order
+        """
+        requests = []
+        for entry in entries:
+            params = {
+                keys[0]: entry[0],
+                keys[1]: entry[1],
+            }
+            if entry[2] is not None:
+                params[keys[2]] = entry[2]
+            requests.append({
+                'method': method,
+                'params': params
+            })
+
+        return [
+            EntryOutcome(entry[0], entry[1], entry[2], error)
+            for entry, (_, error) in zip(entries, self.send_chunked(requests, chunk_size, max_workers, progress))
+        ]
+
     def batch_read(self, object_ids: List[int], categories: List[str], status: int = 2) -> List[List]:
         """
         Read one or more category entries for one or more objects
@@ -318,6 +577,122 @@ class CMDBCategory(Request):
         :return: list of result sets (for both single- and multi-valued categories)
         :rtype: list
         """
+        requests = [request for _, _, request in self._read_requests(object_ids, categories, status)]
+
+        results = self._api.batch_request(requests)
+
+        expected_amount_of_results = len(object_ids) * len(categories)
+        actual_amount_of_results = len(results)
+
+        if expected_amount_of_results != actual_amount_of_results:
+            raise JSONRPC(
+                message='Requested entries for {} object(s) and {} category/categories but got {} result(s)'.format(
+                    len(object_ids),
+                    len(categories),
+                    actual_amount_of_results
+                )
+            )
+
+        return results
+
+    def batch_read_indexed(self,
+                           object_ids: List[int],
+                           categories: List[str],
+                           status: int = 2,
+                           chunk_size: int = 100,
+                           max_workers: int = 4
+                           ) -> Dict[int, Dict[str, List[Dict]]]:
+        """
+        Read one or more category entries for one or more objects, indexed by object and category
+
+        Like :py:meth:`iter_batch_read`, but collects all entries.
+
+        :param List[int] object_ids: List of object identifiers as integers
+        :param list[str] categories: List of category constants as strings
+        :param int status: Filter entries by status (see :py:meth:`batch_read`); default: 2 = normal
+        :param int chunk_size: (optional) maximum number of reads per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :return: entries by object identifier and category constant, in the order given
+        :rtype: dict[int, dict[str, list[dict]]]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        result: Dict[int, Dict[str, List[Dict]]] = {
+            object_id: {category: [] for category in categories} for object_id in object_ids
+        }
+        for object_id, category, entries in self.iter_batch_read(
+                object_ids, categories, status, chunk_size, max_workers
+        ):
+            result[object_id][category] = entries
+        return result
+
+    def iter_batch_read(self,
+                        object_ids: List[int],
+                        categories: List[str],
+                        status: int = 2,
+                        chunk_size: int = 100,
+                        max_workers: int = 4
+                        ) -> Iterator[Tuple[int, str, List[Dict]]]:
+        """
+        Read one or more category entries for one or more objects,
+        yielding the entries of each object and category as soon as they are received
+
+        The reads are sent as batch requests of at most ``chunk_size`` reads,
+        ``max_workers`` of them at the same time; further batch requests are
+        only sent while the results are consumed.
+
+        :param List[int] object_ids: List of object identifiers as integers
+        :param list[str] categories: List of category constants as strings
+        :param int status: Filter entries by status (see :py:meth:`batch_read`); default: 2 = normal
+        :param int chunk_size: (optional) maximum number of reads per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 4
+        :return: object identifier, category constant, and entries; in order of completion
+        :rtype: Iterator[tuple[int, str, list[dict]]]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise InvalidParams(message='"{}" is not a valid chunk_size parameter'.format(chunk_size))
+        reads = self._read_requests(object_ids, categories, status)
+        chunks = [reads[offset:offset + chunk_size] for offset in range(0, len(reads), chunk_size)]
+
+        def send(chunk: List[Tuple[int, str, Dict]]) -> List[Dict]:
+            return self._api.raw_batch_request([request for _, _, request in chunk])
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        sent: Dict[Future, List[Tuple[int, str, Dict]]] = {}
+        try:
+            next_chunk = 0
+            while next_chunk < len(chunks) or len(sent) > 0:
+                while next_chunk < len(chunks) and len(sent) < max_workers:
+                    sent[executor.submit(send, chunks[next_chunk])] = chunks[next_chunk]
+                    next_chunk += 1
+
+                done, _ = wait(sent, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = sent.pop(future)
+                    responses = future.result()
+                    if len(responses) != len(chunk):
+                        raise JSONRPC(
+                            message='Requested {} category read(s) but got {} result(s)'.format(
+                                len(chunk), len(responses)
+                            )
+                        )
+                    for (object_id, category, _), response in zip(chunk, responses):
+                        if 'error' in response:
+                            raise exception_for(response['error'])
+                        yield object_id, category, response['result']
+        finally:
+            for future in sent:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _read_requests(object_ids: List[int], categories: List[str], status: int) -> List[Tuple[int, str, Dict]]:
+        """
+        Build the reads of category entries for objects × categories
+
+        :return: object identifier, category constant and request, in order of objects, then categories
+        :raises: :py:exc:`~idoitapi.APIException.JSONRPC` on invalid identifiers or constants
+        """
         if len(object_ids) == 0:
             raise JSONRPC(message='Needed at least one object identifier')
         if len(categories) == 0:
@@ -331,30 +706,16 @@ class CMDBCategory(Request):
             for category in categories:
                 if not isinstance(category, str) or category == '':
                     raise JSONRPC(message='Each category constant must be a non-empty string')
-                requests.append({
+                requests.append((object_id, category, {
                     'method': 'cmdb.category.read',
                     'params': {
                         'objID': object_id,
                         'category': category,
                         'status': status
                     }
-                })
-
-        results = self._api.batch_request(requests)
+                }))
 
-        expected_amount_of_results = len(object_ids) * len(categories)
-        actual_amount_of_results = len(results)
-
-        if expected_amount_of_results != actual_amount_of_results:
-            raise JSONRPC(
-                message='Requested entries for {} object(s) and {} category/categories but got {} result(s)'.format(
-                    len(object_ids),
-                    len(categories),
-                    actual_amount_of_results
-                )
-            )
-
-        return results
+        return requests
 
     def batch_update(self, object_ids: List[int], category: str, attributes: Dict) -> None:
         """
@@ -381,6 +742,127 @@ class CMDBCategory(Request):
 
         self.require_success_for_all(result)
 
+    @traced
+    def sync(self,
+             objects: Dict[int, Dict[str, Union[Dict, List[Dict]]]],
+             chunk_size: int = 100,
+             dry_run: bool = False
+             ) -> List[CategoryChange]:
+        """
+        Bring category entries to the desired state, saving only what differs.
+
+        The current entries are read in batch requests, compared attribute by
+        attribute with the desired ones, and only changed attributes of changed
+        entries are sent (by batch requests of ``cmdb.category.save``), so
+        unchanged entries do not cause writes or logbook entries.
+
+        Desired entries are matched to current ones by their 'id' attribute;
+        without 'id', a single desired entry (dict) is matched to the first
+        current entry (single-value categories), and entries in a list are
+        created unless a current entry has the same values.
+
+        :param dict objects: desired entries by object identifier and category constant;
+            one entry (dict of attributes) or several entries (list of dicts)
+        :param int chunk_size: (optional) maximum number of sub-requests per batch request; default: 100
+        :param bool dry_run: (optional) only report what would be changed
+        :return: changed (or to be changed) entries
+        :rtype: list[CategoryChange]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        pairs = [
+            (object_id, category, entries)
+            for object_id, categories in objects.items()
+            for category, entries in categories.items()
+        ]
+        if len(pairs) == 0:
+            return []
+
+        current = self._api.batch_request(
+            [
+                {
+                    'method': 'cmdb.category.read',
+                    'params': {
+                        'objID': object_id,
+                        'category': category,
+                        'status': 2
+                    }
+                } for object_id, category, _ in pairs
+            ],
+            chunk_size=chunk_size
+        )
+
+        report = []
+        requests = []
+        for (object_id, category, desired_entries), current_entries in zip(pairs, current):
+            if not isinstance(current_entries, list):
+                raise JSONRPC(
+                    message='Unable to read category {} of object {}: {}'.format(
+                        category, object_id, current_entries.get('message', current_entries)
+                        if isinstance(current_entries, dict) else current_entries
+                    )
+                )
+            by_id = {str(entry['id']): entry for entry in current_entries if isinstance(entry, dict) and 'id' in entry}
+            single = isinstance(desired_entries, dict)
+            for desired in ([desired_entries] if single else desired_entries):
+                if not isinstance(desired, dict):
+                    raise InvalidParams(message='Each entry of category {} must be a dict'.format(category))
+                attributes = {key: value for key, value in desired.items() if key != 'id'}
+                if 'id' in desired:
+                    entry = by_id.get(str(desired['id']))
+                    if entry is None:
+                        raise InvalidParams(
+                            message='Object {} has no entry {} in category {}'.format(
+                                object_id, desired['id'], category
+                            )
+                        )
+                elif single and len(current_entries) > 0:
+                    entry = current_entries[0]
+                elif any(
+                        all(_same_value(entry.get(key), value) for key, value in attributes.items())
+                        for entry in current_entries if isinstance(entry, dict)
+                ):
+                    # Already there
+                    continue
+                else:
+                    entry = None
+
+                if entry is None:
+                    changes = {key: (None, value) for key, value in attributes.items()}
+                else:
+                    changes = {
+                        key: (entry.get(key), value)
+                        for key, value in attributes.items() if not _same_value(entry.get(key), value)
+                    }
+                    if len(changes) == 0:
+                        continue
+
+                params = {
+                    'object': object_id,
+                    'category': category,
+                    'data': {key: change[1] for key, change in changes.items()},
+                }
+                if entry is not None:
+                    params['entry'] = int(entry['id'])
+                requests.append({
+                    'method': 'cmdb.category.save',
+                    'params': params
+                })
+                report.append(CategoryChange(
+                    object_id, category, int(entry['id']) if entry is not None else None, changes, entry is None
+                ))
+
+        if dry_run or len(requests) == 0:
+            return report
+
+        results = self._api.batch_request(requests, chunk_size=chunk_size)
+        self.require_success_for_all(results)
+
+        return [
+            change._replace(entry_id=int(result['entry'])) if change.entry_id is None and 'entry' in result else change
+            for change, result in zip(report, results)
+        ]
+
+    @traced
     def clear(self, object_id: int, categories: List[str]) -> int:
         """
         Archive category entries for a specific object
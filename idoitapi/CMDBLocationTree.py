@@ -1,6 +1,7 @@
 from typing import Any, Optional
 
 from idoitapi.Request import Request
+from idoitapi.tracing import traced
 from idoitapi.APIException import JSONRPC
 
 
@@ -32,6 +33,7 @@ class CMDBLocationTree(Request):
             params
         )
 
+    @traced
     def read_recursively(self, object_id: int, status: Optional[int] = None, level: int = -1) -> Any:
         """
         Reads recursively objects located under an object
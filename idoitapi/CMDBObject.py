@@ -1,10 +1,11 @@
 from typing import Union, Dict, Any, List, Optional
 
 from idoitapi.Request import Request
-from idoitapi.APIException import JSONRPC
+from idoitapi.tracing import traced
+from idoitapi.APIException import JSONRPC, InvalidParams
 from idoitapi.CMDBObjectTypeCategories import CMDBObjectTypeCategories
 from idoitapi.CMDBObjects import CMDBObjects
-from idoitapi.CMDBCategory import CMDBCategory
+from idoitapi.CMDBCategory import CMDBCategory, CategoryChange
 from idoitapi.CMDBCategoryInfo import CMDBCategoryInfo
 
 
@@ -200,6 +201,23 @@ class CMDBObject(Request):
         if 'success' not in result or not result['success']:
             raise JSONRPC(message="Unable to update object {}".format(object_id))
 
+    @traced
+    def sync(self, object_id: int, categories: Dict[str, Union[Dict, List[Dict]]], dry_run: bool = False
+             ) -> List[CategoryChange]:
+        """
+        Bring an object's category entries to the desired state, saving only what differs
+        (see :py:meth:`~idoitapi.CMDBCategory.CMDBCategory.sync`).
+
+        :param int object_id: Object identifier
+        :param dict categories: desired entries by category constant;
+            one entry (dict of attributes) or several entries (list of dicts)
+        :param bool dry_run: (optional) only report what would be changed
+        :return: changed (or to be changed) entries
+        :rtype: list[CategoryChange]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        return CMDBCategory(self._api).sync({object_id: categories}, dry_run=dry_run)
+
     def archive(self, object_id: int) -> None:
         """
         Archive object
@@ -290,6 +308,7 @@ class CMDBObject(Request):
             }
         )
 
+    @traced
     def load(self, object_id: int) -> Dict:
         """
         Load all data about object
@@ -369,6 +388,7 @@ class CMDBObject(Request):
 
         return objects[0]
 
+    @traced
     def upsert(self, object_type: Union[int, str], title: str, attributes: Optional[Dict] = None) -> int:
         """
         Create new object or fetch existing one based on its title and type
@@ -395,3 +415,61 @@ class CMDBObject(Request):
             return result[0]['id']
         else:
             raise JSONRPC(message="Found {} objects".format(len(result)))
+
+    @traced
+    def upsert_many(self,
+                    object_type: Union[int, str],
+                    titles_or_specs: List[Union[str, Dict]],
+                    chunk_size: int = 100,
+                    max_workers: int = 1
+                    ) -> Dict[str, int]:
+        """
+        Create new objects or fetch existing ones based on their titles and type
+
+        Existing objects are looked up by reading all objects of the type once
+        (see :py:meth:`~idoitapi.CMDBObjects.CMDBObjects.index_by_title`);
+        only missing ones are created, by batch requests of ``chunk_size`` objects.
+
+        :param object_type: Object type identifier or constant
+        :type object_type: Union[int, str]
+        :param list titles_or_specs: Object titles, or dicts with 'title' and
+            additional common attributes ('category', 'purpose', 'cmdb_status', 'description')
+            for objects to create
+        :param int chunk_size: (optional) maximum number of objects created per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 1
+        :return: Object identifiers by title
+        :rtype: dict[str, int]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error,
+            e.g. if several objects have one of the titles
+        """
+        specs: Dict[str, Dict] = {}
+        for spec in titles_or_specs:
+            if isinstance(spec, str):
+                spec = {'title': spec}
+            elif not isinstance(spec, dict) or not isinstance(spec.get('title'), str):
+                raise InvalidParams(message='Each object needs a title')
+            specs.setdefault(spec['title'], spec)
+
+        if len(specs) == 0:
+            return {}
+
+        cmdb_objects = CMDBObjects(self._api)
+        index = cmdb_objects.index_by_title(object_type)
+
+        object_ids = {}
+        missing = []
+        for title, spec in specs.items():
+            found = index.get(title, [])
+            if len(found) == 1:
+                object_ids[title] = found[0]
+            elif len(found) == 0:
+                missing.append(dict(spec, type=object_type))
+            else:
+                raise JSONRPC(message='Found {} objects with title "{}"'.format(len(found), title))
+
+        if len(missing) > 0:
+            created = cmdb_objects.create(missing, chunk_size=chunk_size, max_workers=max_workers)
+            for spec, object_id in zip(missing, created):
+                object_ids[spec['title']] = object_id
+
+        return {title: object_ids[title] for title in specs}
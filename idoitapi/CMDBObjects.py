@@ -1,7 +1,28 @@
-from typing import List, Union, Dict, Any, Literal, Optional
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Union, Dict, Any, Literal, NamedTuple, Optional, Callable, Tuple, overload
 
 from idoitapi.Request import Request
-from idoitapi.APIException import JSONRPC, InvalidParams
+from idoitapi.APIException import APIException, JSONRPC, InvalidParams, exception_for
+from idoitapi.Columnar import ColumnarResult
+from idoitapi.TitleIndex import TitleIndex
+
+
+class ObjectOutcome(NamedTuple):
+    """
+    Outcome of one object in a batch operation like :py:meth:`CMDBObjects.purge`
+    """
+    object_id: int
+    error: Optional[APIException]
+    """Exception of the failed sub-request, or ``None`` on success"""
+
+    @property
+    def ok(self) -> bool:
+        """
+        Was the operation successful?
+        """
+        return self.error is None
 
 
 class CMDBObjects(Request):
@@ -12,33 +33,219 @@ class CMDBObjects(Request):
     SORT_ASCENDING = 'ASC'
     SORT_DESCENDING = 'DESC'
 
-    def create(self, objects: List[Dict]) -> List[int]:
+    def __init__(self, api=None, api_params: Optional[Dict] = None, title_index: Optional[TitleIndex] = None) -> None:
+        """
+        :param api: (optional) a :py:mod:`~idoitapi.API` object
+        :param dict api_params: (optional) parameters to pass to the API
+        :param TitleIndex title_index: (optional) index of object identifiers by title for :py:meth:`get_ids`,
+            e.g. shared by several CMDBObjects objects; default: created on first use
+        """
+        super(CMDBObjects, self).__init__(api, api_params)
+        self._title_index = title_index
+
+    def create(self,
+               objects: List[Dict],
+               chunk_size: Optional[int] = None,
+               max_workers: int = 1,
+               progress: Optional[Callable[[int, int], None]] = None,
+               checkpoint: Optional[str] = None
+               ) -> List[int]:
         """
         Create one or more objects
 
+        With ``chunk_size``, objects are created by several batch requests,
+        ``max_workers`` of them at the same time. After each batch request,
+        ``progress`` is called with the number of objects created so far and the total.
+
+        With ``checkpoint``, the identifiers of created objects are appended
+        to this file (JSON Lines), and objects already listed there are not
+        created again, so an interrupted import can be repeated with the same
+        list of objects to continue where it stopped.
+
         :param list[dict] objects: List of objects
             Mandatory attributes ('type', 'title') and optional attributes
             ('category', 'purpose', 'cmdb_status', 'description')
+        :param int chunk_size: (optional) maximum number of objects per batch request;
+            default: all in one
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 1
+        :param progress: (optional) function called with the number of created objects and the total
+        :param str checkpoint: (optional) path to checkpoint file
         :return: Object identifiers
         :rtype: list[int]
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         """
         if not isinstance(objects, list):
             raise InvalidParams(message='objects parameter is invalid')
+        if chunk_size is not None and (not isinstance(chunk_size, int) or chunk_size <= 0):
+            raise InvalidParams(message='"{}" is not a valid chunk_size parameter'.format(chunk_size))
         if len(objects) == 0:
             return []
 
-        requests = []
+        object_ids: List[Optional[int]] = [None] * len(objects)
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self._read_checkpoint(checkpoint, objects, object_ids)
+
+        pending = [index for index, object_id in enumerate(object_ids) if object_id is None]
+        if chunk_size is None:
+            chunk_size = max(len(pending), 1)
+        chunks = [pending[offset:offset + chunk_size] for offset in range(0, len(pending), chunk_size)]
+        created = len(objects) - len(pending)
+
+        def send(chunk: List[int]) -> Tuple[List[int], List[Dict]]:
+            return chunk, self._api.raw_batch_request([
+                {
+                    'method': 'cmdb.object.create',
+                    'params': objects[index]
+                } for index in chunk
+            ])
+
+        error: Optional[APIException] = None
+        checkpoint_file = None
+        if checkpoint is not None:
+            complete = self._ends_with_newline(checkpoint)
+            checkpoint_file = open(checkpoint, 'a', encoding='utf-8')
+            if not complete:
+                # Do not append to the incomplete line of an interrupted import
+                checkpoint_file.write('\n')
+
+        def record(chunk: List[int], responses: List[Dict]) -> None:
+            nonlocal created, error
+            for index, response in zip(chunk, responses):
+                if 'error' in response:
+                    error = error or exception_for(response['error'])
+                    continue
+                object_id = int(response['result']['id'])
+                object_ids[index] = object_id
+                created += 1
+                if checkpoint_file is not None:
+                    checkpoint_file.write(json.dumps({
+                        'index': index,
+                        'id': object_id,
+                        'title': objects[index].get('title'),
+                    }) + '\n')
+            if checkpoint_file is not None:
+                checkpoint_file.flush()
+            if progress is not None:
+                progress(created, len(objects))
+
+        try:
+            if max_workers > 1 and len(chunks) > 1:
+                executor = ThreadPoolExecutor(max_workers=max_workers)
+                futures = [executor.submit(send, chunk) for chunk in chunks]
+                try:
+                    for future in as_completed(futures):
+                        # Cancelled after an error, see below
+                        if future.cancelled():
+                            continue
+                        try:
+                            record(*future.result())
+                        except APIException as exception:
+                            error = error or exception
+                        if error is not None:
+                            # Stop sending; batch requests already on their way are still recorded
+                            for pending_future in futures:
+                                pending_future.cancel()
+                finally:
+                    for future in futures:
+                        future.cancel()
+                    executor.shutdown(wait=True)
+            else:
+                for chunk in chunks:
+                    try:
+                        record(*send(chunk))
+                    except APIException as exception:
+                        error = error or exception
+                    if error is not None:
+                        break
+        finally:
+            if checkpoint_file is not None:
+                checkpoint_file.close()
+
+        if error is not None:
+            raise error
+
+        return [object_id for object_id in object_ids if object_id is not None]
+
+    @staticmethod
+    def _ends_with_newline(checkpoint: str) -> bool:
+        """
+        Does a checkpoint file end with a complete line (or not exist or is empty)?
 
-        for obj in objects:
-            requests.append({
-                'method': 'cmdb.object.create',
-                'params': obj
-            })
+        :param str checkpoint: path to checkpoint file
+        :return: ``False`` if the last line is incomplete
+        :rtype: bool
+        """
+        try:
+            with open(checkpoint, 'rb') as file_handle:
+                file_handle.seek(0, os.SEEK_END)
+                if file_handle.tell() == 0:
+                    return True
+                file_handle.seek(-1, os.SEEK_END)
+                return file_handle.read(1) == b'\n'
+        except FileNotFoundError:
+            return True
+
+    @staticmethod
+    def _read_checkpoint(checkpoint: str, objects: List[Dict], object_ids: List[Optional[int]]) -> None:
+        """
+        Fill in the identifiers of objects created before
 
-        result = self._api.batch_request(requests)
+        :param str checkpoint: path to checkpoint file
+        :param list[dict] objects: List of objects
+        :param list object_ids: identifiers by position in ``objects``
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` if the checkpoint is for other objects
+        """
+        with open(checkpoint, encoding='utf-8') as file_handle:
+            for line in file_handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete if the import was killed while writing it
+                    continue
+                index = entry.get('index')
+                if not isinstance(index, int) or index < 0 or index >= len(objects) \
+                        or entry.get('title') != objects[index].get('title'):
+                    raise InvalidParams(
+                        message='Checkpoint "{}" does not match the objects to create'.format(checkpoint)
+                    )
+                object_ids[index] = int(entry['id'])
+
+    @overload
+    def read(self,
+             filter_params: Optional[Dict] = ...,
+             limit: Optional[int] = ...,
+             offset: Optional[int] = ...,
+             order_by: Optional[str] = ...,
+             sort: Optional[str] = ...,
+             categories: Optional[Union[List[str], Literal[True]]] = ...,
+             columnar: Literal[False] = ...
+             ) -> List[Dict]:
+        ...
 
-        return [obj['id'] for obj in result]
+    @overload
+    def read(self,
+             filter_params: Optional[Dict] = ...,
+             limit: Optional[int] = ...,
+             offset: Optional[int] = ...,
+             order_by: Optional[str] = ...,
+             sort: Optional[str] = ...,
+             categories: Optional[Union[List[str], Literal[True]]] = ...,
+             *,
+             columnar: Literal[True]
+             ) -> ColumnarResult:
+        ...
+
+    @overload
+    def read(self,
+             filter_params: Optional[Dict] = ...,
+             limit: Optional[int] = ...,
+             offset: Optional[int] = ...,
+             order_by: Optional[str] = ...,
+             sort: Optional[str] = ...,
+             categories: Optional[Union[List[str], Literal[True]]] = ...,
+             columnar: bool = ...
+             ) -> Union[List[Dict], ColumnarResult]:
+        ...
 
     def read(self,
              filter_params: Optional[Dict] = None,
@@ -46,8 +253,9 @@ class CMDBObjects(Request):
              offset: Optional[int] = None,
              order_by: Optional[str] = None,
              sort: Optional[str] = None,
-             categories: Optional[Union[List[str], Literal[True]]] = None
-             ) -> List[Dict]:
+             categories: Optional[Union[List[str], Literal[True]]] = None,
+             columnar: bool = False
+             ) -> Union[List[Dict], ColumnarResult]:
         """
         Fetch objects.
 
@@ -69,7 +277,10 @@ class CMDBObjects(Request):
             add a list of category constants as strings or
             ``True`` for all assigned categories
         :type categories: union[list[str], True]
-        :return: list[dict]
+        :param bool columnar: (optional) return the objects as
+            :py:class:`~idoitapi.Columnar.ColumnarResult` (one list per attribute),
+            decoded one object at a time to save memory
+        :return: list[dict], or ColumnarResult if ``columnar`` is set
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         """
         params: Dict[str, Any] = {}
@@ -99,6 +310,9 @@ class CMDBObjects(Request):
                 raise InvalidParams(message='"{}" is not a valid sort_direction parameter'.format(sort))
             params['sort'] = sort
 
+        if columnar:
+            return ColumnarResult.from_rows(self._api.iter_request('cmdb.objects.read', params))
+
         return self._api.request(
             'cmdb.objects.read',
             params
@@ -259,6 +473,109 @@ class CMDBObjects(Request):
         else:
             raise JSONRPC(message="Found {} objects".format(len(result)))
 
+    def get_ids(self,
+                titles: List[str],
+                object_type: Optional[Union[int, str]] = None,
+                index: Optional[TitleIndex] = None,
+                chunk_size: int = 100
+                ) -> Dict[str, int]:
+        """
+        Fetch the identifiers of many objects by title and (optional) type
+
+        Titles are looked up in a :py:class:`~idoitapi.TitleIndex.TitleIndex`
+        first; the others are read by batch requests of ``chunk_size`` reads
+        and added to the index. Call the index's ``refresh()`` from time to time
+        to drop titles of objects renamed or purged since.
+
+        :param list[str] titles: Object titles
+        :param object_type: (optional) Object type identifier or constant
+        :type object_type: Union[int, str]
+        :param TitleIndex index: (optional) index to use; default: the one of this object
+        :param int chunk_size: (optional) maximum number of reads per batch request; default: 100
+        :return: Object identifiers by title; titles not found are left out
+        :rtype: dict[str, int]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error,
+            e.g. if several objects have one of the titles
+        """
+        if index is None:
+            if self._title_index is None:
+                self._title_index = TitleIndex(self._api)
+            index = self._title_index
+
+        object_ids = {}
+        missing: Dict[str, None] = {}
+        for title in titles:
+            if title in object_ids or title in missing:
+                continue
+            object_id = index.get(title, object_type)
+            if object_id is not None:
+                object_ids[title] = object_id
+            else:
+                missing[title] = None
+
+        if len(missing) == 0:
+            return object_ids
+
+        requests = []
+        for title in missing:
+            filter_params: Dict[str, Any] = {
+                'title': title
+            }
+            if object_type is not None:
+                filter_params['type'] = object_type
+            requests.append({
+                'method': 'cmdb.objects.read',
+                'params': {
+                    'filter': filter_params
+                }
+            })
+
+        results = self._api.raw_batch_request(requests, chunk_size=chunk_size)
+
+        for title, response in zip(missing, results):
+            if 'error' in response:
+                raise exception_for(response['error'])
+            found = response['result']
+            if len(found) == 1:
+                object_ids[title] = int(found[0]['id'])
+                index.put(title, object_ids[title], object_type)
+            elif len(found) > 1:
+                raise JSONRPC(message='Found {} objects with title "{}"'.format(len(found), title))
+
+        return object_ids
+
+    def index_by_title(self, object_type: Union[int, str], page_size: int = 10000) -> Dict[str, List[int]]:
+        """
+        Map the titles of all objects of a type to their identifiers.
+
+        Objects are read page by page, one object at a time,
+        so only titles and identifiers are kept in memory.
+
+        :param object_type: Object type identifier or constant
+        :type object_type: Union[int, str]
+        :param int page_size: (optional) objects per request; default: 10000
+        :return: object identifiers by title (several for ambiguous titles)
+        :rtype: dict[str, list[int]]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        index: Dict[str, List[int]] = {}
+        offset = 0
+        while True:
+            page = self.read(
+                {'type': object_type},
+                limit=page_size,
+                offset=offset,
+                order_by='id',
+                sort=self.SORT_ASCENDING,
+                columnar=True
+            )
+            if len(page) > 0:
+                for object_id, title in zip(page['id'], page['title']):
+                    index.setdefault(title, []).append(int(object_id))
+            if len(page) < page_size:
+                return index
+            offset += page_size
+
     def update(self, objects: List[Dict]) -> None:
         """
         Update one or more existing objects
@@ -281,98 +598,127 @@ class CMDBObjects(Request):
 
         self._api.batch_request(requests)
 
-    def archive(self, object_ids: List[int]) -> None:
+    def archive(self,
+                object_ids: List[int],
+                chunk_size: int = 100,
+                max_workers: int = 1,
+                progress: Optional[Callable[[int, int], None]] = None
+                ) -> List[ObjectOutcome]:
         """
         Archive one or more objects
 
+        Objects are archived by batch requests of at most ``chunk_size`` objects,
+        ``max_workers`` of them at the same time; a failure does not stop the others.
+
         :param object_ids: List of object identifiers as integers
         :type object_ids: List[int]
+        :param int chunk_size: (optional) maximum number of objects per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 1
+        :param progress: (optional) function called with the number of objects done and the total
+        :return: outcome for each object, in order
+        :rtype: list[ObjectOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
         """
-        if not isinstance(object_ids, list):
-            raise InvalidParams(message='objects parameter is invalid')
-        if len(object_ids) == 0:
-            return
-
-        requests = []
-
-        for obj in object_ids:
-            requests.append({
-                'method': 'cmdb.object.archive',
-                'params': {
-                    'object': obj
-                }
-            })
-
-        self._api.batch_request(requests)
-
-    def delete(self, object_ids: List[int]) -> None:
+        return self._change_status('cmdb.object.archive', object_ids, chunk_size, max_workers, progress)
+
+    def delete(self,
+               object_ids: List[int],
+               chunk_size: int = 100,
+               max_workers: int = 1,
+               progress: Optional[Callable[[int, int], None]] = None
+               ) -> List[ObjectOutcome]:
         """
         Delete one or more objects
 
+        Objects are deleted by batch requests of at most ``chunk_size`` objects,
+        ``max_workers`` of them at the same time; a failure does not stop the others.
+
         :param object_ids: List of object identifiers as integers
         :type object_ids: List[int]
+        :param int chunk_size: (optional) maximum number of objects per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 1
+        :param progress: (optional) function called with the number of objects done and the total
+        :return: outcome for each object, in order
+        :rtype: list[ObjectOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
         """
-        if not isinstance(object_ids, list):
-            raise InvalidParams(message='objects parameter is invalid')
-        if len(object_ids) == 0:
-            return
-
-        requests = []
-
-        for obj in object_ids:
-            requests.append({
-                'method': 'cmdb.object.delete',
-                'params': {
-                    'object': obj
-                }
-            })
-
-        self._api.batch_request(requests)
-
-    def purge(self, object_ids: List[int]) -> None:
+        return self._change_status('cmdb.object.delete', object_ids, chunk_size, max_workers, progress)
+
+    def purge(self,
+              object_ids: List[int],
+              chunk_size: int = 100,
+              max_workers: int = 1,
+              progress: Optional[Callable[[int, int], None]] = None
+              ) -> List[ObjectOutcome]:
         """
         Purge one or more objects
 
+        Objects are purged by batch requests of at most ``chunk_size`` objects,
+        ``max_workers`` of them at the same time; a failure does not stop the others.
+
         :param object_ids: List of object identifiers as integers
         :type object_ids: List[int]
+        :param int chunk_size: (optional) maximum number of objects per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 1
+        :param progress: (optional) function called with the number of objects done and the total
+        :return: outcome for each object, in order
+        :rtype: list[ObjectOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
         """
-        if not isinstance(object_ids, list):
-            raise InvalidParams(message='objects parameter is invalid')
-        if len(object_ids) == 0:
-            return
-
-        requests = []
-
-        for obj in object_ids:
-            requests.append({
-                'method': 'cmdb.object.purge',
-                'params': {
-                    'object': obj
-                }
-            })
-
-        self._api.batch_request(requests)
-
-    def recycle(self, object_ids: List[int]) -> None:
+        return self._change_status('cmdb.object.purge', object_ids, chunk_size, max_workers, progress)
+
+    def recycle(self,
+                object_ids: List[int],
+                chunk_size: int = 100,
+                max_workers: int = 1,
+                progress: Optional[Callable[[int, int], None]] = None
+                ) -> List[ObjectOutcome]:
         """
         Restore objects to "normal" status.
 
+        Objects are restored by batch requests of at most ``chunk_size`` objects,
+        ``max_workers`` of them at the same time; a failure does not stop the others.
+
         :param object_ids: List of object identifiers as integers
         :type object_ids: List[int]
+        :param int chunk_size: (optional) maximum number of objects per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 1
+        :param progress: (optional) function called with the number of objects done and the total
+        :return: outcome for each object, in order
+        :rtype: list[ObjectOutcome]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
+        """
+        return self._change_status('cmdb.object.recycle', object_ids, chunk_size, max_workers, progress)
+
+    def _change_status(self,
+                       method: str,
+                       object_ids: List[int],
+                       chunk_size: int,
+                       max_workers: int,
+                       progress: Optional[Callable[[int, int], None]]
+                       ) -> List[ObjectOutcome]:
+        """
+        Apply a method to many objects
+
+        :param str method: method name
+        :return: outcome for each object, in order
         """
         if not isinstance(object_ids, list):
             raise InvalidParams(message='objects parameter is invalid')
         if len(object_ids) == 0:
-            return
+            return []
 
         requests = []
 
         for object_id in object_ids:
             requests.append({
-                'method': 'cmdb.object.recycle',
+                'method': method,
                 'params': {
                     'object': object_id
                 }
             })
 
-        self._api.batch_request(requests)
+        return [
+            ObjectOutcome(object_id, error)
+            for object_id, (_, error) in zip(object_ids, self.send_chunked(requests, chunk_size, max_workers, progress))
+        ]
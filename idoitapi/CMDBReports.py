@@ -1,6 +1,31 @@
-from typing import List
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Literal, NamedTuple, Optional, Tuple, Union, overload
 
 from idoitapi.Request import Request
+from idoitapi.APIException import JSONRPC
+from idoitapi.Columnar import ColumnarResult
+from idoitapi.export import format_for, write_rows
+
+
+class ReportResult(NamedTuple):
+    """
+    Outcome of reading one report with :py:meth:`CMDBReports.iter_batch_read`
+    """
+    report_id: int
+    rows: List
+    """Result of the report; empty on failure"""
+    error: Optional[Exception]
+    """Exception raised by the request, or ``None`` on success"""
+    seconds: float
+    """Time spent reading the report"""
+
+    @property
+    def ok(self) -> bool:
+        """
+        Was the report read successfully?
+        """
+        return self.error is None
 
 
 class CMDBReports(Request):
@@ -20,15 +45,33 @@ class CMDBReports(Request):
             'cmdb.reports'
         )
 
-    def read(self, report_id: int) -> List:
+    @overload
+    def read(self, report_id: int, columnar: Literal[False] = ...) -> List:
+        ...
+
+    @overload
+    def read(self, report_id: int, columnar: Literal[True]) -> ColumnarResult:
+        ...
+
+    @overload
+    def read(self, report_id: int, columnar: bool) -> Union[List, ColumnarResult]:
+        ...
+
+    def read(self, report_id: int, columnar: bool = False) -> Union[List, ColumnarResult]:
         """
         Fetches the result of a report
 
         :param int report_id: Report identifier
-        :return: list
-        :rtype: list
+        :param bool columnar: (optional) return the rows as
+            :py:class:`~idoitapi.Columnar.ColumnarResult` (one list per column),
+            decoded one row at a time to save memory
+        :return: list, or ColumnarResult if ``columnar`` is set
+        :rtype: union[list, ColumnarResult]
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         """
+        if columnar:
+            return ColumnarResult.from_rows(self._api.iter_request('cmdb.reports', {'id': report_id}))
+
         result = self._api.request(
             'cmdb.reports',
             {
@@ -41,31 +84,149 @@ class CMDBReports(Request):
 
         return result
 
-    def batch_read(self, report_ids: List[int]) -> List[List]:
+    def batch_read(self,
+                   report_ids: List[int],
+                   max_workers: int = 4,
+                   timeout: Optional[float] = None
+                   ) -> List[List]:
         """
         Fetches the result of one or more reports
 
+        Each report is read with its own request, ``max_workers`` at the same time,
+        so a slow report does not delay the others.
+        Use :py:meth:`iter_batch_read` to learn why a report failed.
+
         :param list[int] report_ids: List of report identifiers as integers
-        :return: list of lists
+        :param int max_workers: (optional) number of reports read at the same time; default: 4
+        :param float timeout: (optional) seconds to wait for all reports
+        :return: list of lists, in the order of ``report_ids``; empty for failed reports
         :rtype: list[list]
         """
-        requests = []
+        results: List[List] = [[] for _ in report_ids]
+
+        for index, result in self._iter_batch_read(report_ids, max_workers, timeout):
+            results[index] = result.rows
 
-        for report_id in report_ids:
-            requests.append({
-                'method': 'cmdb.reports',
-                'params': {
-                    'id': report_id,
-                }
-            })
+        return results
 
-        batch_results = self._api.batch_request(requests)
-        results = []
+    def iter_batch_read(self,
+                        report_ids: List[int],
+                        max_workers: int = 4,
+                        timeout: Optional[float] = None
+                        ) -> Iterator[ReportResult]:
+        """
+        Fetches the result of one or more reports, yielding each as soon as it is complete
 
-        for result in batch_results:
-            if isinstance(result, list):
-                results.append(result)
-            else:
-                results.append([])
+        Each report is read with its own request, ``max_workers`` at the same time.
+        Reports not read within ``timeout`` seconds of the call are reported as failed,
+        including reports still queued behind slow ones, which are not started anymore.
+        Requests in progress are abandoned but keep a worker busy until the transport gives up.
 
-        return results
+        :param list[int] report_ids: List of report identifiers as integers
+        :param int max_workers: (optional) number of reports read at the same time; default: 4
+        :param float timeout: (optional) seconds to wait for all reports
+        :return: outcome of each report, in order of completion
+        :rtype: Iterator[ReportResult]
+        """
+        for _, result in self._iter_batch_read(report_ids, max_workers, timeout):
+            yield result
+
+    def _iter_batch_read(self,
+                         report_ids: List[int],
+                         max_workers: int,
+                         timeout: Optional[float]
+                         ) -> Iterator[Tuple[int, ReportResult]]:
+        """
+        Read reports concurrently, yielding their index and outcome in order of completion
+        """
+        started: Dict[int, float] = {}
+
+        def read(index: int) -> ReportResult:
+            started[index] = time.monotonic()
+            try:
+                rows = self.read(report_ids[index])
+            except Exception as exc:
+                return ReportResult(report_ids[index], [], exc, time.monotonic() - started[index])
+            return ReportResult(report_ids[index], rows, None, time.monotonic() - started[index])
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        indexes: Dict[Future, int] = {}
+        try:
+            for index in range(len(report_ids)):
+                indexes[executor.submit(read, index)] = index
+            pending = set(indexes)
+
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            while len(pending) > 0:
+                wait_timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, pending = wait(pending, timeout=wait_timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield indexes[future], future.result()
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+
+            now = time.monotonic()
+            for future in pending:
+                index = indexes[future]
+                if future.done() and not future.cancelled():
+                    yield index, future.result()
+                    continue
+                future.cancel()
+                yield index, ReportResult(
+                    report_ids[index],
+                    [],
+                    JSONRPC(message='Report {} was not read within {} seconds'.format(report_ids[index], timeout)),
+                    now - started.get(index, now)
+                )
+        finally:
+            for future in indexes:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def export(self, report_id: int, path: str, file_format: Optional[str] = None) -> int:
+        """
+        Write the result of a report to a file while it is received
+
+        Rows are decoded and written one at a time, so memory use does not
+        grow with the size of the report.
+
+        :param int report_id: Report identifier
+        :param str path: output file
+        :param str file_format: (optional) 'csv', 'jsonl' or 'parquet' (requires pyarrow);
+            default: derived from the file extension
+        :return: number of rows written
+        :rtype: int
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        file_format = format_for(path, file_format)
+        return write_rows(self._api.iter_request('cmdb.reports', {'id': report_id}), path, file_format)
+
+    def batch_export(self,
+                     exports: Dict[int, str],
+                     file_format: Optional[str] = None,
+                     max_workers: int = 4
+                     ) -> Dict[int, int]:
+        """
+        Write the results of one or more reports to files, several at the same time
+
+        :param dict exports: output files by report identifier
+        :param str file_format: (optional) 'csv', 'jsonl' or 'parquet' (requires pyarrow);
+            default: derived from each file extension
+        :param int max_workers: (optional) number of reports exported at the same time; default: 4
+        :return: number of rows written by report identifier
+        :rtype: dict[int, int]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+            (after all other exports are finished)
+        """
+        for path in exports.values():
+            format_for(path, file_format)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                report_id: executor.submit(self.export, report_id, path, file_format)
+                for report_id, path in exports.items()
+            }
+
+        return {report_id: future.result() for report_id, future in futures.items()}
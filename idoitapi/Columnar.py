@@ -0,0 +1,110 @@
+from typing import Any, Dict, Iterable, Iterator, List
+
+# Columns with more distinct values than this are not deduplicated
+MAX_SHARED_VALUES = 1024
+
+
+class ColumnarResult(object):
+    """
+    Tabular result stored as one list of values per column
+
+    Rows are added one at a time and not kept as dicts, which saves most of
+    the memory of a list of dicts. Repeated string values of low-cardinality
+    columns (e.g. object types or status) share one string object.
+    Missing values are ``None``.
+
+    Convert it with :py:meth:`to_pandas` or :py:meth:`to_arrow`
+    (requires pandas or pyarrow), or iterate over :py:meth:`rows`.
+    """
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, List[Any]] = {}
+        """Values by column name, in the order the columns appeared"""
+        self._length = 0
+        self._shared: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> 'ColumnarResult':
+        """
+        Build a columnar result from rows
+
+        :param rows: rows as dicts, e.g. from :py:meth:`~idoitapi.API.API.iter_request`
+        :return: the columnar result
+        :rtype: ColumnarResult
+        """
+        result = cls()
+        for row in rows:
+            result.append(row)
+        return result
+
+    def append(self, row: Dict[str, Any]) -> None:
+        """
+        Add a row
+
+        :param dict row: values by column name
+        """
+        columns = self.columns
+        shared = self._shared
+        length = self._length
+        for key, value in row.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * length
+                shared[key] = {}
+            if isinstance(value, str):
+                values = shared.get(key)
+                if values is not None:
+                    value = values.setdefault(value, value)
+                    if len(values) > MAX_SHARED_VALUES:
+                        del shared[key]
+            column.append(value)
+        self._length = length + 1
+        if len(row) != len(columns):
+            for column in columns.values():
+                if len(column) == length:
+                    column.append(None)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, name: str) -> List[Any]:
+        return self.columns[name]
+
+    def column_names(self) -> List[str]:
+        """
+        Names of all columns
+
+        :rtype: list[str]
+        """
+        return list(self.columns)
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the rows as dicts
+
+        :return: rows
+        """
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield dict(zip(names, values))
+
+    def to_pandas(self) -> Any:
+        """
+        Convert to a pandas DataFrame (requires pandas)
+
+        :rtype: pandas.DataFrame
+        """
+        import pandas
+        return pandas.DataFrame(self.columns, columns=list(self.columns))
+
+    def to_arrow(self) -> Any:
+        """
+        Convert to a pyarrow Table (requires pyarrow)
+
+        :rtype: pyarrow.Table
+        """
+        import pyarrow
+        return pyarrow.table(self.columns)
+
+    def __repr__(self) -> str:
+        return 'ColumnarResult({} rows, columns={!r})'.format(self._length, list(self.columns))
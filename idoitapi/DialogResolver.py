@@ -0,0 +1,157 @@
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from idoitapi.APIException import JSONRPC
+from idoitapi.CMDBDialog import CMDBDialog
+
+# A drop-down menu: category constant and attribute
+Dialog = Tuple[str, str]
+
+
+class DialogResolver(object):
+    """
+    Cache of drop-down menu (dialog and dialog+) entry identifiers by title
+
+    Menus are read when first needed, several of them in one batch request,
+    and missing values are created in one batch request. Thread-safe: a value
+    requested by several threads at the same time is created only once.
+    """
+
+    def __init__(self, api) -> None:
+        """
+        :param API api: API object
+        """
+        self._dialog = CMDBDialog(api)
+        self._entries: Dict[Dialog, Dict[str, int]] = {}
+        # Guards _entries and _dialog_locks; never held while waiting for a menu's lock
+        self._lock = threading.Lock()
+        # Held while a menu is read or entries are added to it, so titles are created only once
+        self._dialog_locks: Dict[Dialog, threading.Lock] = {}
+
+    @contextmanager
+    def _locked(self, dialogs: Iterable[Dialog]) -> Iterator[None]:
+        """
+        Hold the locks of drop-down menus, always acquired in the same order
+        """
+        with self._lock:
+            locks = [self._dialog_locks.setdefault(dialog, threading.Lock()) for dialog in sorted(set(dialogs))]
+        with ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            yield
+
+    def load(self, dialogs: Iterable[Dialog], reload: bool = False) -> None:
+        """
+        Read the entries of drop-down menus not read before
+
+        :param dialogs: pairs of category constant and attribute
+        :param bool reload: (optional) also read menus read before
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        dialogs = list(dict.fromkeys(dialogs))
+        with self._locked(dialogs):
+            self._load(dialogs, reload)
+
+    def _load(self, dialogs: List[Dialog], reload: bool = False) -> Dict[Dialog, Dict[str, int]]:
+        """
+        Read drop-down menus not read before; the caller holds their locks
+
+        :return: entry identifiers by title, by menu
+        """
+        with self._lock:
+            menus = {dialog: self._entries.get(dialog) for dialog in dialogs}
+        wanted = [dialog for dialog, titles in menus.items() if reload or titles is None]
+        if len(wanted) == 0:
+            return {dialog: titles for dialog, titles in menus.items() if titles is not None}
+
+        attributes: Dict[str, List[str]] = {}
+        for category, attribute in wanted:
+            attributes.setdefault(category, []).append(attribute)
+        # batch_read() returns the menus in the order of ``attributes``
+        ordered = [(category, attribute) for category, names in attributes.items() for attribute in names]
+
+        results = self._dialog.batch_read(attributes)
+        if len(results) != len(ordered):
+            raise JSONRPC(message='Requested {} drop-down menu(s) but got {} result(s)'.format(
+                len(ordered), len(results)))
+
+        loaded: Dict[Dialog, Dict[str, int]] = {}
+        for dialog, values in zip(ordered, results):
+            if not isinstance(values, list):
+                raise JSONRPC(message='Unable to read drop-down menu {} of category {}'.format(dialog[1], dialog[0]))
+            titles: Dict[str, int] = {}
+            for value in values:
+                if isinstance(value, dict) and value.get('title') is not None:
+                    titles.setdefault(str(value['title']), int(value['id']))
+            loaded[dialog] = titles
+
+        with self._lock:
+            self._entries.update(loaded)
+        result = {dialog: titles for dialog, titles in menus.items() if titles is not None}
+        result.update(loaded)
+        return result
+
+    def resolve(self, category: str, attribute: str, title: str, create: bool = True) -> Optional[int]:
+        """
+        Fetch the identifier of a drop-down menu entry by its title
+
+        :param str category: Category constant
+        :param str attribute: Attribute
+        :param str title: Title of the entry
+        :param bool create: (optional) create the entry if it is missing; default: yes
+        :return: Entry identifier, or ``None`` if missing and not created
+        :rtype: int
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        return self.resolve_many({(category, attribute): [title]}, create)[(category, attribute)].get(title)
+
+    def resolve_many(self, titles: Dict[Dialog, Iterable[str]], create: bool = True) -> Dict[Dialog, Dict[str, int]]:
+        """
+        Fetch the identifiers of many drop-down menu entries by their titles
+
+        Menus not read before are read in one batch request; with ``create``,
+        all missing entries are created in another one.
+
+        :param dict titles: titles by pair of category constant and attribute
+        :param bool create: (optional) create missing entries; default: yes
+        :return: entry identifiers by title, by pair of category constant and attribute;
+            missing titles are left out if not created
+        :rtype: dict
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        titles = {dialog: list(dict.fromkeys(str(title) for title in values)) for dialog, values in titles.items()}
+
+        with self._locked(titles):
+            # Kept even if clear() drops them meanwhile
+            menus = self._load(list(titles))
+
+            if create:
+                values: Dict[str, Dict[str, List[str]]] = {}
+                for (category, attribute), wanted in titles.items():
+                    new_titles = [title for title in wanted if title not in menus[(category, attribute)]]
+                    if len(new_titles) > 0:
+                        values.setdefault(category, {})[attribute] = new_titles
+                if len(values) > 0:
+                    # batch_create() returns the identifiers in the order of ``values``
+                    created = self._dialog.batch_create(values)
+                    new_entries = [
+                        ((category, attribute), title)
+                        for category, by_attribute in values.items()
+                        for attribute, new_titles in by_attribute.items()
+                        for title in new_titles
+                    ]
+                    for (dialog, title), entry_id in zip(new_entries, created):
+                        menus[dialog].setdefault(title, entry_id)
+
+            return {
+                dialog: {title: menus[dialog][title] for title in wanted if title in menus[dialog]}
+                for dialog, wanted in titles.items()
+            }
+
+    def clear(self) -> None:
+        """
+        Forget all entries, so menus are read again when needed
+        """
+        with self._lock:
+            self._entries.clear()
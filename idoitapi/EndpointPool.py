@@ -0,0 +1,125 @@
+import itertools
+import threading
+import time
+from typing import List, Optional
+
+
+class Endpoint(object):
+    """
+    An i-doit JSON-RPC endpoint and its health
+    """
+
+    def __init__(self, url: str) -> None:
+        """
+        :param str url: URL of the JSON-RPC endpoint
+        """
+        self.url = url
+        self.outstanding = 0
+        """Number of requests currently sent to this endpoint"""
+        self.failures = 0
+        """Number of consecutive failed requests"""
+        self.down_until = 0.0
+        """Monotonic time until which this endpoint is considered unhealthy"""
+
+    def is_healthy(self, now: float) -> bool:
+        """
+        Is the endpoint available for requests?
+
+        :param float now: current monotonic time
+        :return: ``True`` if healthy
+        :rtype: bool
+        """
+        return self.down_until <= now
+
+    def __repr__(self) -> str:
+        return 'Endpoint({!r}, outstanding={}, failures={})'.format(self.url, self.outstanding, self.failures)
+
+
+class EndpointPool(object):
+    """
+    Selects one of several endpoints for each request
+
+    Endpoints failing ``failure_threshold`` times in a row are skipped for
+    ``cooldown`` seconds. If all endpoints are unhealthy, the one recovering
+    first is used anyway.
+    """
+
+    ROUND_ROBIN = 'round_robin'
+    LEAST_OUTSTANDING = 'least_outstanding'
+
+    def __init__(self,
+                 urls: List[str],
+                 strategy: str = ROUND_ROBIN,
+                 failure_threshold: int = 1,
+                 cooldown: float = 30.0
+                 ) -> None:
+        """
+        :param list[str] urls: URLs of the JSON-RPC endpoints
+        :param str strategy: (optional) 'round_robin' (default) or 'least_outstanding'
+        :param int failure_threshold: (optional) consecutive failures before an endpoint
+            is considered unhealthy; default: 1
+        :param float cooldown: (optional) seconds to skip an unhealthy endpoint; default: 30
+        """
+        if strategy not in (self.ROUND_ROBIN, self.LEAST_OUTSTANDING):
+            raise ValueError('Unknown load balancing strategy "{}"'.format(strategy))
+        if len(urls) == 0:
+            raise ValueError('Needed at least one endpoint')
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def acquire(self, exclude: Optional[List[Endpoint]] = None) -> Endpoint:
+        """
+        Select an endpoint for a request
+
+        Call :py:meth:`release` when the request is done.
+
+        :param list exclude: (optional) endpoints to avoid, e.g. because they just failed
+        :return: the endpoint
+        :rtype: Endpoint
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [
+                endpoint for endpoint in self.endpoints
+                if endpoint.is_healthy(now) and (exclude is None or endpoint not in exclude)
+            ]
+            if len(candidates) == 0:
+                candidates = [endpoint for endpoint in self.endpoints if exclude is None or endpoint not in exclude]
+                if len(candidates) == 0:
+                    candidates = self.endpoints
+                candidates = [min(candidates, key=lambda candidate: candidate.down_until)]
+
+            offset = next(self._counter)
+            if self.strategy == self.LEAST_OUTSTANDING:
+                # Rotate before taking the minimum, so ties are spread evenly
+                rotated = candidates[offset % len(candidates):] + candidates[:offset % len(candidates)]
+                endpoint = min(rotated, key=lambda candidate: candidate.outstanding)
+            else:
+                endpoint = candidates[offset % len(candidates)]
+
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, success: bool) -> None:
+        """
+        Report the end of a request
+
+        :param Endpoint endpoint: the endpoint returned by :py:meth:`acquire`
+        :param bool success: ``False`` if the endpoint failed to answer
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if success:
+                endpoint.failures = 0
+                endpoint.down_until = 0.0
+            else:
+                endpoint.failures += 1
+                if endpoint.failures >= self.failure_threshold:
+                    endpoint.down_until = time.monotonic() + self.cooldown
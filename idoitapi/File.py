@@ -1,12 +1,128 @@
+import hashlib
 import os
-from typing import Dict, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
 from idoitapi.Request import Request
+from idoitapi.tracing import traced
 from idoitapi.APIException import JSONRPC
 from idoitapi.CMDBObject import CMDBObject
 from idoitapi.CMDBObjects import CMDBObjects
 from idoitapi.CMDBCategory import CMDBCategory
-from idoitapi.utils import base64_encode
+from idoitapi.utils import Base64File
+
+# Maximum size of the encoded file contents sent in one batch request
+MAX_BATCH_SIZE = 32 * 1024 * 1024
+
+# Object identifiers per batch request when building a FileIndex
+INDEX_CHUNK_SIZE = 100
+
+
+def md5_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the MD5 hash of a file contents, reading one chunk at a time
+
+    :param str file_path: Path to file
+    :param int chunk_size: (optional) bytes to read at a time
+    :return: hexadecimal MD5 hash
+    :rtype: str
+    :raises: :py:exc:`OSError` if file not found or unreadable
+    """
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as file_handle:
+        for chunk in iter(lambda: file_handle.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _object_id_of(value: Any) -> Optional[int]:
+    """
+    Object identifier of an object reference as returned by category reads
+
+    :param value: identifier, or dict with 'id'
+    :return: object identifier, or ``None``
+    """
+    if isinstance(value, dict):
+        value = value.get('id')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class FileIndex(object):
+    """
+    File objects by MD5 hash of their contents
+
+    Built from the versions (C__CATS__FILE_VERSIONS) of all file objects,
+    and rebuilt when older than ``ttl`` seconds. Thread-safe.
+    """
+
+    def __init__(self, api, ttl: Optional[float] = 300.0) -> None:
+        """
+        :param API api: API object
+        :param float ttl: (optional) seconds until the index is rebuilt; ``None``: never
+        """
+        self._api = api
+        self.ttl = ttl
+        self._hashes: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """
+        Rebuild the index from i-doit
+
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        object_ids = [
+            int(obj['id']) for obj in CMDBObjects(self._api).read({'type': 'C__OBJTYPE__FILE'})
+        ]
+        hashes: Dict[str, int] = {}
+        cmdb_category = CMDBCategory(self._api)
+        for offset in range(0, len(object_ids), INDEX_CHUNK_SIZE):
+            chunk = object_ids[offset:offset + INDEX_CHUNK_SIZE]
+            for file_object_id, versions in zip(chunk, cmdb_category.batch_read(chunk, ['C__CATS__FILE_VERSIONS'])):
+                if not isinstance(versions, list):
+                    continue
+                for version in versions:
+                    if isinstance(version, dict) and version.get('md5_hash'):
+                        hashes.setdefault(version['md5_hash'], file_object_id)
+        with self._lock:
+            self._hashes = hashes
+            self._loaded_at = time.monotonic()
+
+    def lookup(self, md5_hash: str) -> Optional[int]:
+        """
+        Find the file object with these contents
+
+        :param str md5_hash: hexadecimal MD5 hash of the contents
+        :return: file object identifier, or ``None``
+        :rtype: int
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        with self._lock:
+            stale = self._loaded_at is None or (self.ttl is not None and time.monotonic() - self._loaded_at > self.ttl)
+        if stale:
+            self.refresh()
+        with self._lock:
+            return self._hashes.get(md5_hash)
+
+    def add(self, md5_hash: str, file_object_id: int) -> None:
+        """
+        Record a file object uploaded since the index was built
+
+        :param str md5_hash: hexadecimal MD5 hash of the contents
+        :param int file_object_id: file object identifier
+        """
+        with self._lock:
+            self._hashes.setdefault(md5_hash, file_object_id)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._hashes)
 
 
 class File(Request):
@@ -14,6 +130,17 @@ class File(Request):
     Requests for assigned files
     """
 
+    def __init__(self, api=None, api_params: Optional[Dict] = None, index: Optional[FileIndex] = None) -> None:
+        """
+        :param api: (optional) a :py:mod:`~idoitapi.API` object
+        :param dict api_params: (optional) parameters to pass to the API
+        :param FileIndex index: (optional) index of existing file objects for :py:meth:`upload`,
+            e.g. shared by several File objects; default: built on first use
+        """
+        super(File, self).__init__(api, api_params)
+        self._index = index
+
+    @traced
     def add(self, object_id: int, file_path: str, description: Optional[str] = None) -> None:
         """
         Add a new file to a specific object.
@@ -25,6 +152,8 @@ class File(Request):
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         :raises: :py:exc:`OSError` if file not found or unreadable
         """
+        file_content = Base64File(file_path)
+
         file_object_id = CMDBObject(self._api).create(
             'C__OBJTYPE__FILE',
             description if description is not None else ''
@@ -36,7 +165,7 @@ class File(Request):
             file_object_id,
             'C__CATS__FILE_VERSIONS',
             {
-                'file_content': base64_encode(file_path),
+                'file_content': file_content,
                 'file_physical': os.path.basename(file_path),
                 'file_title': description,
                 'version_description': description
@@ -51,16 +180,25 @@ class File(Request):
             },
         )
 
-    def batch_add(self, object_id: int, files: Dict) -> None:
+    @traced
+    def batch_add(self, object_id: int, files: Dict, max_batch_size: int = MAX_BATCH_SIZE) -> None:
         """
         Add multiple new files to a specific object.
         New file objects will be created and assigned to the specific object.
 
+        File contents are encoded while they are sent, and split into
+        several batch requests of at most ``max_batch_size`` encoded bytes
+        (a larger file is sent alone).
+
         :param int object_id:  Object identifier
         :param dict files: Dict (key: path to file; value: description)
+        :param int max_batch_size: (optional) maximum size of the encoded file contents per batch request;
+            default: 32 MiB
         :raises: :py:exc:`~idoitapi.APIException.APIException` on error
         :raises: :py:exc:`OSError` if any file not found or unreadable
         """
+        contents = {file_path: Base64File(file_path) for file_path in files}
+
         objects = []
 
         for description in files.values():
@@ -78,18 +216,26 @@ class File(Request):
                 )
             )
 
-        requests = []
+        requests: List[Dict] = []
+        batch_size = 0
 
         counter = 0
 
         for file_path, description in files.items():
+            file_content = contents[file_path]
+
+            if len(requests) > 0 and batch_size + file_content.encoded_size > max_batch_size:
+                self._api.batch_request(requests)
+                requests = []
+                batch_size = 0
+
             requests.append({
                 'method': 'cmdb.category.create',
                 'params': {
                     'objID': file_object_ids[counter],
                     'catsID': 'C__CATS__FILE_VERSIONS',
                     'data': {
-                        'file_content': base64_encode(file_path),
+                        'file_content': file_content,
                         'file_physical': os.path.basename(file_path),
                         'file_title': description,
                         'version_description': description
@@ -108,6 +254,105 @@ class File(Request):
                 }
             })
 
+            batch_size += file_content.encoded_size
             counter += 1
 
-        self._api.batch_request(requests)
+        if len(requests) > 0:
+            self._api.batch_request(requests)
+
+    @traced
+    def upload(self, object_id: int, files: Dict, max_workers: int = 4) -> Dict[str, int]:
+        """
+        Assign files to a specific object, uploading only contents not yet in i-doit.
+
+        Files are identified by the MD5 hash of their contents. A file already stored
+        in a file object (see :py:class:`FileIndex`) is just assigned to the object,
+        unless it is assigned already. Other files get new file objects, and their
+        contents are uploaded ``max_workers`` at a time, each encoded while it is sent.
+
+        :param int object_id: Object identifier
+        :param dict files: Dict (key: path to file; value: description)
+        :param int max_workers: (optional) number of files hashed and uploaded at the same time; default: 4
+        :return: file object identifiers by path
+        :rtype: dict[str, int]
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        :raises: :py:exc:`OSError` if any file not found or unreadable
+        """
+        if self._index is None:
+            self._index = FileIndex(self._api)
+        index = self._index
+
+        paths = list(files)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            hashes = dict(zip(paths, executor.map(md5_file, paths)))
+
+        file_object_ids: Dict[str, int] = {}
+        new_paths: Dict[str, str] = {}
+        for file_path in paths:
+            existing = index.lookup(hashes[file_path])
+            if existing is not None:
+                file_object_ids[file_path] = existing
+            elif hashes[file_path] not in new_paths:
+                new_paths[hashes[file_path]] = file_path
+
+        if len(new_paths) > 0:
+            contents = {file_path: Base64File(file_path) for file_path in new_paths.values()}
+            created = CMDBObjects(self._api).create([
+                {'type': 'C__OBJTYPE__FILE', 'title': files[file_path]} for file_path in new_paths.values()
+            ])
+            if len(created) != len(new_paths):
+                raise JSONRPC(
+                    message='Wanted to create {} file object(s) but got {} object identifiers'.format(
+                        len(new_paths), len(created)
+                    )
+                )
+
+            cmdb_category = CMDBCategory(self._api)
+
+            def upload_version(file_path: str, file_object_id: int) -> None:
+                cmdb_category.create(
+                    file_object_id,
+                    'C__CATS__FILE_VERSIONS',
+                    {
+                        'file_content': contents[file_path],
+                        'file_physical': os.path.basename(file_path),
+                        'file_title': files[file_path],
+                        'version_description': files[file_path]
+                    }
+                )
+                index.add(hashes[file_path], file_object_id)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(upload_version, new_paths.values(), created))
+
+            for md5_hash, file_object_id in zip(new_paths, created):
+                file_object_ids[new_paths[md5_hash]] = file_object_id
+
+        for file_path in paths:
+            if file_path not in file_object_ids:
+                file_object_ids[file_path] = file_object_ids[new_paths[hashes[file_path]]]
+
+        assigned = {
+            _object_id_of(entry.get('file'))
+            for entry in CMDBCategory(self._api).read(object_id, 'C__CATG__FILE')
+            if isinstance(entry, dict)
+        }
+        links = []
+        for file_object_id in file_object_ids.values():
+            if file_object_id not in assigned:
+                assigned.add(file_object_id)
+                links.append({
+                    'method': 'cmdb.category.create',
+                    'params': {
+                        'objID': object_id,
+                        'catgID': 'C__CATG__FILE',
+                        'data': {
+                            'file': file_object_id,
+                        }
+                    }
+                })
+
+        if len(links) > 0:
+            self.require_success_for_all(self._api.batch_request(links))
+
+        return file_object_ids
@@ -1,8 +1,132 @@
-from typing import Dict, Optional
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 from idoitapi.Request import Request
+from idoitapi.tracing import traced
 from idoitapi.CMDBCategory import CMDBCategory
-from idoitapi.utils import base64_encode
+from idoitapi.utils import Base64File
+from idoitapi.File import MAX_BATCH_SIZE, md5_file
+
+# File extensions considered images by Image.sync()
+IMAGE_EXTENSIONS = ('.bmp', '.gif', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp')
+
+
+class ImageSyncResult(NamedTuple):
+    """
+    Outcome of :py:meth:`Image.sync`, as lists of captions (file names)
+    """
+    created: List[str]
+    updated: List[str]
+    unchanged: List[str]
+    removed: List[str]
+
+
+class _GalleryEntry(NamedTuple):
+    """
+    Gallery entry as needed by :py:meth:`Image.sync`
+    """
+    entry_id: int
+    description: str
+    """Description without the manifest"""
+    manifest: Optional[str]
+    """Manifest line written by :py:meth:`Image.sync`, or ``None``"""
+    content_hash: Optional[str]
+    """MD5 hash of the contents, only for entries without manifest"""
+
+
+# Last line of the description of a gallery entry uploaded by Image.sync()
+_MANIFEST_PATTERN = re.compile(r'\[idoitapi md5:[0-9a-f]{32} max_size:\w+\]')
+
+
+def _manifest(md5_hash: str, max_size: Optional[int]) -> str:
+    """
+    Manifest line of a gallery entry uploaded by :py:meth:`Image.sync`
+
+    :param str md5_hash: hexadecimal MD5 hash of the local image file
+    :param int max_size: maximum width and height the image was scaled down to
+    :return: manifest line
+    """
+    return '[idoitapi md5:{} max_size:{}]'.format(md5_hash, max_size)
+
+
+def _split_description(description: Any) -> Tuple[str, Optional[str]]:
+    """
+    Separate the manifest line from the rest of a gallery entry's description
+
+    :param description: description as read from i-doit
+    :return: description without the manifest, and the manifest (or ``None``)
+    """
+    if not isinstance(description, str):
+        return '', None
+    text, _, last_line = description.rstrip().rpartition('\n')
+    if _MANIFEST_PATTERN.fullmatch(last_line.strip()):
+        return text.rstrip(), last_line.strip()
+    return description, None
+
+
+def _size_bounded(items: Iterable[Tuple[int, Dict]], max_batch_size: int) -> Iterator[List[Dict]]:
+    """
+    Group requests into batches of at most ``max_batch_size`` bytes (a larger request is sent alone)
+
+    :param items: pairs of size and request
+    :param int max_batch_size: maximum size per batch
+    :return: batches of requests
+    """
+    batch: List[Dict] = []
+    batch_size = 0
+    for size, request in items:
+        if len(batch) > 0 and batch_size + size > max_batch_size:
+            yield batch
+            batch = []
+            batch_size = 0
+        batch.append(request)
+        batch_size += size
+    if len(batch) > 0:
+        yield batch
+
+
+def _content_hash(content: Optional[str]) -> Optional[str]:
+    """
+    MD5 hash of base64 encoded image contents as read from i-doit
+
+    :param str content: base64 encoded contents
+    :return: hexadecimal MD5 hash, or ``None`` if there are no valid contents
+    """
+    if not isinstance(content, str) or content == '':
+        return None
+    try:
+        return hashlib.md5(base64.b64decode(content)).hexdigest()
+    except (binascii.Error, ValueError):
+        return None
+
+
+def downsize(file_path: str, target_path: str, max_size: int) -> bool:
+    """
+    Scale an image down so neither side exceeds ``max_size`` pixels
+
+    Requires Pillow (``pip install idoitapi[images]``).
+
+    :param str file_path: Path to image file
+    :param str target_path: Path to write the downsized image to, in the same format
+    :param int max_size: maximum width and height in pixels
+    :return: ``True`` if the image was written, ``False`` if it is small enough already
+    :rtype: bool
+    :raises: :py:exc:`OSError` if file not found or not an image
+    """
+    import PIL.Image
+
+    with PIL.Image.open(file_path) as picture:
+        if max(picture.size) <= max_size:
+            return False
+        image_format = picture.format
+        picture.thumbnail((max_size, max_size))
+        picture.save(target_path, format=image_format)
+    return True
 
 
 class Image(Request):
@@ -10,6 +134,7 @@ class Image(Request):
     Requests for image galleries
     """
 
+    @traced
     def add(self, object_id: int, file_path: str, caption: Optional[str] = None) -> None:
         """
         Add a new file to the image gallery.
@@ -25,26 +150,149 @@ class Image(Request):
             'C__CATG__IMAGES',
             {
                 'name': caption,
-                'content': base64_encode(file_path)
+                'content': Base64File(file_path)
             }
         )
 
-    def batch_add(self, object_id: int, images: Dict) -> None:
+    @traced
+    def batch_add(self, object_id: int, images: Dict, max_batch_size: int = MAX_BATCH_SIZE) -> None:
         """
         Add new files to the image gallery.
 
+        Images are encoded while they are sent, and split into several
+        batch requests of at most ``max_batch_size`` encoded bytes
+        (a larger image is sent alone).
+
         :param int object_id: Object identifier
         :param dict images: Dict (key: path to image file; value: caption)
+        :param int max_batch_size: (optional) maximum size of the encoded images per batch request;
+            default: 32 MiB
         :raises: :py:exc:`OSError` if any file not found or unreadable
         """
         object_ids = [object_id, ]
         category_const = 'C__CATG__IMAGES'
-        attributes = []
+        cmdb_category = CMDBCategory(self._api)
+        contents = [(Base64File(file_path), caption) for file_path, caption in images.items()]
 
-        for file_path, caption in images.items():
-            attributes.append({
-                'name': caption,
-                'content': base64_encode(file_path)
-            })
+        for attributes in _size_bounded(
+                ((content.encoded_size, {'name': caption, 'content': content}) for content, caption in contents),
+                max_batch_size
+        ):
+            cmdb_category.batch_create(object_ids, category_const, attributes)
+
+    @traced
+    def sync(self,
+             object_id: int,
+             directory: str,
+             max_size: Optional[int] = None,
+             remove: bool = False,
+             max_batch_size: int = MAX_BATCH_SIZE
+             ) -> ImageSyncResult:
+        """
+        Make the image gallery match the images in a local directory.
+
+        Images are identified by their caption, which is the file name. Only
+        new images and images whose contents differ from the gallery entry are
+        uploaded, in batch requests of at most ``max_batch_size`` encoded bytes.
+
+        The MD5 hash of each uploaded file (and ``max_size``) is appended to the
+        entry's description as a last line, so later runs compare hashes instead
+        of decoding the contents, and do not scale unchanged images down again.
+        Entries without this line are compared by their contents. Unchanged
+        entries are not written. Note that i-doit sends the contents with every
+        category read.
+
+        :param int object_id: Object identifier
+        :param str directory: Path to directory with image files (see ``IMAGE_EXTENSIONS``)
+        :param int max_size: (optional) scale images down so neither side exceeds this many pixels
+            before uploading them (requires Pillow)
+        :param bool remove: (optional) also purge gallery entries without image file; default: keep them
+        :param int max_batch_size: (optional) maximum size of the encoded images per batch request;
+            default: 32 MiB
+        :return: captions of the created, updated, unchanged and removed gallery entries
+        :rtype: ImageSyncResult
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        :raises: :py:exc:`OSError` if any file not readable
+        """
+        category_const = 'C__CATG__IMAGES'
+        file_names = sorted(
+            name for name in os.listdir(directory)
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS and os.path.isfile(os.path.join(directory, name))
+        )
+
+        entries: Dict[str, _GalleryEntry] = {}
+        for entry in self._api.iter_request('cmdb.category.read', {
+            'objID': object_id,
+            'category': category_const,
+            'status': 2
+        }):
+            if isinstance(entry, dict) and entry.get('name') is not None and entry['name'] not in entries:
+                description, manifest = _split_description(entry.get('description'))
+                entries[entry['name']] = _GalleryEntry(
+                    int(entry['id']),
+                    description,
+                    manifest,
+                    _content_hash(entry.get('content')) if manifest is None else None
+                )
+
+        result = ImageSyncResult([], [], [], [])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            items: List[Tuple[int, Dict]] = []
+            for file_name in file_names:
+                file_path = os.path.join(directory, file_name)
+                if os.path.getsize(file_path) == 0:
+                    continue
+                manifest = _manifest(md5_file(file_path), max_size)
+                params: Dict[str, Any] = {
+                    'object': object_id,
+                    'category': category_const,
+                }
+
+                gallery_entry = entries.get(file_name)
+                if gallery_entry is not None:
+                    if gallery_entry.manifest == manifest:
+                        result.unchanged.append(file_name)
+                        continue
+                    params['entry'] = gallery_entry.entry_id
+
+                if max_size is not None:
+                    target_path = os.path.join(tmpdir, file_name)
+                    if downsize(file_path, target_path, max_size):
+                        file_path = target_path
+
+                if gallery_entry is not None and gallery_entry.content_hash == md5_file(file_path):
+                    # Uploaded by other means: leave it alone, and compare its contents again next time
+                    result.unchanged.append(file_name)
+                    continue
+
+                description = manifest
+                if gallery_entry is not None and gallery_entry.description != '':
+                    description = gallery_entry.description + '\n' + manifest
+                content = Base64File(file_path)
+                params['data'] = {'name': file_name, 'description': description, 'content': content}
+                items.append((content.encoded_size, {'method': 'cmdb.category.save', 'params': params}))
+                if gallery_entry is not None:
+                    result.updated.append(file_name)
+                else:
+                    result.created.append(file_name)
+
+            for requests in _size_bounded(items, max_batch_size):
+                self.require_success_for_all(self._api.batch_request(requests))
+
+        if remove:
+            requests = []
+            for name, entry in entries.items():
+                if name not in file_names:
+                    requests.append({
+                        'method': 'cmdb.category.purge',
+                        'params': {
+                            'object': object_id,
+                            'category': category_const,
+                            'entry': entry.entry_id,
+                        }
+                    })
+                    result.removed.append(name)
+            if len(requests) > 0:
+                self.require_success_for_all(self._api.batch_request(requests))
 
-        CMDBCategory(self._api).batch_create(object_ids, category_const, attributes)
+        return result
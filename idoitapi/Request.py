@@ -1,7 +1,8 @@
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, List, Dict, Optional, Tuple
 
 from idoitapi.API import API
-from idoitapi.APIException import JSONRPC
+from idoitapi.APIException import APIException, JSONRPC, InvalidParams, exception_for
 
 
 class Request(object):
@@ -63,3 +64,76 @@ class Request(object):
         """
         for result in results:
             Request.require_success_without_identifier(result)
+
+    def send_chunked(self,
+                     requests: List[Dict],
+                     chunk_size: int = 100,
+                     max_workers: int = 1,
+                     progress: Optional[Callable[[int, int], None]] = None
+                     ) -> List[Tuple[Any, Optional[APIException]]]:
+        """
+        Send sub-requests as batch requests of at most ``chunk_size`` sub-requests,
+        ``max_workers`` of them at the same time, and report the outcome of each sub-request
+
+        A sub-request fails if it returns an error or a result with a false 'success';
+        if a whole batch request fails, each of its sub-requests fails with that error.
+        ``progress`` is called with the number of sub-requests done and the total
+        after each batch request.
+
+        :param list[dict] requests: sub-requests, each with 'method' and 'params' keys
+        :param int chunk_size: (optional) maximum number of sub-requests per batch request; default: 100
+        :param int max_workers: (optional) number of batch requests sent at the same time; default: 1
+        :param progress: (optional) function called with the number of sub-requests done and the total
+        :return: result and exception (``None`` on success) of each sub-request, in the order of ``requests``
+        :rtype: list[tuple]
+        :raises: :py:exc:`~idoitapi.APIException.InvalidParams` on invalid parameters
+        """
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise InvalidParams(message='"{}" is not a valid chunk_size parameter'.format(chunk_size))
+
+        outcomes: List[Tuple[Any, Optional[APIException]]] = [(None, None)] * len(requests)
+        offsets = range(0, len(requests), chunk_size)
+        done = 0
+
+        def send(offset: int) -> Tuple[int, List[Tuple[Any, Optional[APIException]]]]:
+            chunk = requests[offset:offset + chunk_size]
+            try:
+                responses = self._api.raw_batch_request(chunk)
+            except APIException as exception:
+                return offset, [(None, exception)] * len(chunk)
+            if len(responses) != len(chunk):
+                error = JSONRPC(
+                    message='Sent {} sub-request(s) but got {} result(s)'.format(len(chunk), len(responses))
+                )
+                return offset, [(None, error)] * len(chunk)
+            chunk_outcomes: List[Tuple[Any, Optional[APIException]]] = []
+            for response in responses:
+                if 'error' in response:
+                    chunk_outcomes.append((None, exception_for(response['error'])))
+                    continue
+                result = response['result']
+                try:
+                    if isinstance(result, dict) and 'success' in result:
+                        self.require_success_without_identifier(result)
+                except APIException as exception:
+                    chunk_outcomes.append((result, exception))
+                else:
+                    chunk_outcomes.append((result, None))
+            return offset, chunk_outcomes
+
+        def record(offset: int, chunk_outcomes: List[Tuple[Any, Optional[APIException]]]) -> None:
+            nonlocal done
+            outcomes[offset:offset + len(chunk_outcomes)] = chunk_outcomes
+            done += len(chunk_outcomes)
+            if progress is not None:
+                progress(done, len(requests))
+
+        if max_workers > 1 and len(offsets) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for future in as_completed([executor.submit(send, offset) for offset in offsets]):
+                    record(*future.result())
+        else:
+            for offset in offsets:
+                record(*send(offset))
+
+        return outcomes
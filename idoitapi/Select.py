@@ -1,6 +1,7 @@
 from typing import Union, List
 
 from idoitapi.Request import Request
+from idoitapi.tracing import traced
 from idoitapi.APIException import JSONRPC
 from idoitapi.CMDBObjects import CMDBObjects
 from idoitapi.CMDBCategory import CMDBCategory
@@ -11,6 +12,7 @@ class Select(Request):
     Selector for objects
     """
 
+    @traced
     def find(self, category: str, attribute: str, value: Union[int, str, float]) -> List[int]:
         """
         Find objects by attribute
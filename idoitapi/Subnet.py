@@ -1,6 +1,7 @@
 from typing import Union, List, Optional
 
 from idoitapi.Request import Request
+from idoitapi.tracing import traced
 from idoitapi.CMDBCategory import CMDBCategory
 from idoitapi.APIException import JSONRPC
 from idoitapi.utils import ip2long, long2ip
@@ -26,6 +27,7 @@ class Subnet(Request):
         self.last: Optional[int] = None
         """Last IP address in subnet as long integer"""
 
+    @traced
     def load(self, object_id: int) -> None:
         """
         Fetches some information about subnet object
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from idoitapi.CMDBLogbook import CMDBLogbook
+
+# Key of an index entry: object type (None: any type) and title
+_Key = Tuple[Optional[Union[int, str]], str]
+
+
+class TitleIndex(object):
+    """
+    Bounded cache of object identifiers by title (and type)
+
+    Holds at most ``max_size`` titles, dropping the least recently used ones.
+    Entries of objects changed in i-doit since the last refresh (e.g. renamed
+    or purged) are dropped by :py:meth:`refresh`, which reads the logbook.
+    Thread-safe.
+    """
+
+    def __init__(self, api, max_size: int = 100000) -> None:
+        """
+        :param API api: API object
+        :param int max_size: (optional) maximum number of titles; default: 100000
+        """
+        self._api = api
+        self.max_size = max_size
+        self._entries: 'OrderedDict[_Key, int]' = OrderedDict()
+        self._keys_by_id: Dict[int, List[_Key]] = {}
+        self._refreshed_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        self._lock = threading.Lock()
+
+    def get(self, title: str, object_type: Optional[Union[int, str]] = None) -> Optional[int]:
+        """
+        Look up an object identifier
+
+        :param str title: Object title
+        :param object_type: (optional) Object type identifier or constant
+        :return: Object identifier, or ``None`` if not in the index
+        :rtype: int
+        """
+        key = (object_type, title)
+        with self._lock:
+            object_id = self._entries.get(key)
+            if object_id is not None:
+                self._entries.move_to_end(key)
+            return object_id
+
+    def put(self, title: str, object_id: int, object_type: Optional[Union[int, str]] = None) -> None:
+        """
+        Add an object identifier
+
+        :param str title: Object title
+        :param int object_id: Object identifier
+        :param object_type: (optional) Object type identifier or constant
+        """
+        key = (object_type, title)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = object_id
+            self._keys_by_id.setdefault(object_id, []).append(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, object_ids: Iterable[int]) -> None:
+        """
+        Drop the titles of objects
+
+        :param object_ids: Object identifiers
+        """
+        with self._lock:
+            for object_id in object_ids:
+                for key in list(self._keys_by_id.get(object_id, [])):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        """
+        Drop all titles
+        """
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_id.clear()
+
+    def refresh(self, since: Optional[str] = None, limit: int = 10000) -> int:
+        """
+        Drop the titles of objects changed since the last refresh
+
+        ``since`` is compared with the server's clock; pass it explicitly if
+        the clocks differ.
+
+        :param str since: (optional) drop objects changed since this date
+            (anything PHP's ``strtotime()`` understands);
+            default: since the last refresh, or since the index was created
+        :param int limit: (optional) maximum number of logbook entries to read;
+            if reached, the whole index is cleared
+        :return: number of objects whose titles were dropped
+        :rtype: int
+        :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+        """
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        if since is None:
+            since = self._refreshed_at
+
+        entries = CMDBLogbook(self._api).read(since=since, limit=limit)
+        if len(entries) >= limit:
+            self.clear()
+            self._refreshed_at = now
+            return 0
+
+        object_ids = set()
+        for entry in entries:
+            try:
+                object_ids.add(int(entry['object_id']))
+            except (KeyError, TypeError, ValueError):
+                continue
+        with self._lock:
+            dropped = len(object_ids & set(self._keys_by_id))
+        self.discard(object_ids)
+        self._refreshed_at = now
+        return dropped
+
+    def _remove(self, key: _Key) -> None:
+        object_id = self._entries.pop(key)
+        keys = self._keys_by_id[object_id]
+        keys.remove(key)
+        if len(keys) == 0:
+            del self._keys_by_id[object_id]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,503 @@
+"""
+Transports carry encoded JSON-RPC requests to i-doit and bring back the responses.
+
+:py:class:`HTTPTransport` talks to a real i-doit instance and is used by default.
+:py:class:`RecordingTransport` captures request/response pairs to disk,
+:py:class:`ReplayTransport` serves them again, and :py:class:`MockTransport`
+answers requests with handler functions. Both local transports can also be served
+over HTTP by :py:class:`MockServer`, so performance changes can be measured offline.
+"""
+
+import json
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple, Union, TYPE_CHECKING
+
+from idoitapi.APIException import JSONRPC, InternalError, MethodNotFound
+from idoitapi.jsonstream import CHUNK_SIZE, StreamingBody, iter_chunks
+
+if TYPE_CHECKING:  # pragma: no cover
+    import requests
+
+
+class Response(NamedTuple):
+    """
+    Raw HTTP response
+    """
+    status_code: int
+    content: bytes
+
+
+class StreamingResponse(NamedTuple):
+    """
+    Raw HTTP response whose body is received in chunks
+    """
+    status_code: int
+    chunks: Iterator[bytes]
+
+
+class Transport(object):
+    """
+    Base class for transports
+    """
+
+    def post(self, url: str, data: Union[str, StreamingBody], headers: Dict) -> Response:
+        """
+        Send an encoded JSON-RPC request
+
+        Requests uploading files come as :py:class:`~idoitapi.jsonstream.StreamingBody`,
+        which should be sent in chunks while it is iterated.
+
+        :param str url: URL of i-doit's JSON-RPC endpoint
+        :param data: JSON encoded request
+        :type data: Union[str, StreamingBody]
+        :param dict headers: header lines
+        :return: the raw response
+        :rtype: Response
+        """
+        raise NotImplementedError
+
+    def post_stream(self, url: str, data: Union[str, StreamingBody], headers: Dict) -> StreamingResponse:
+        """
+        Send an encoded JSON-RPC request and receive the response body in chunks
+
+        Transports able to receive the body while it arrives override this;
+        by default, the complete response is split into chunks.
+
+        :param str url: URL of i-doit's JSON-RPC endpoint
+        :param data: JSON encoded request
+        :type data: Union[str, StreamingBody]
+        :param dict headers: header lines
+        :return: the raw response
+        :rtype: StreamingResponse
+        """
+        response = self.post(url, data, headers)
+        return StreamingResponse(response.status_code, iter_chunks(response.content))
+
+    def is_retryable(self, exc: Exception) -> bool:
+        """
+        Was a request certainly not delivered, so it may be sent again (to another endpoint)?
+
+        :param Exception exc: exception raised by :py:meth:`post`
+        :return: ``True`` if the request may be sent again
+        :rtype: bool
+        """
+        return False
+
+    def close(self) -> None:
+        """
+        Release resources held by the transport
+        """
+        pass
+
+
+class HTTPTransport(Transport):
+    """
+    Transport sending requests over HTTP(S) with the ``requests`` package
+
+    Each thread gets its own HTTP session (and thus its own connection pool),
+    because ``requests.Session`` objects must not be shared between threads.
+    A thread's session is closed when the thread ends, e.g. a worker of a
+    short-lived thread pool, or when the transport is closed.
+    ``requests`` is imported when the first session is needed, to keep importing this package fast.
+    """
+
+    def __init__(self, timeout: Optional[float] = None) -> None:
+        """
+        :param float timeout: (optional) timeout for HTTP requests in seconds
+        """
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sessions: Set['requests.Session'] = set()
+        self._lock = threading.Lock()
+
+    def _get_session(self) -> 'requests.Session':
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            import requests
+            holder = _SessionHolder(requests.Session())
+            with self._lock:
+                self._sessions.add(holder.session)
+            # The thread-local holder is released when the thread ends
+            weakref.finalize(holder, _close_session, holder.session, self._sessions, self._lock)
+            self._local.holder = holder
+        return holder.session
+
+    @property
+    def session_count(self) -> int:
+        """
+        Number of open HTTP sessions
+        """
+        with self._lock:
+            return len(self._sessions)
+
+    def post(self, url: str, data: Union[str, StreamingBody], headers: Dict) -> Response:
+        # requests sends a StreamingBody in chunks, with its length as Content-Length
+        response = self._get_session().post(url, data=data, headers=headers, timeout=self.timeout)
+        return Response(response.status_code, response.content)
+
+    def post_stream(self, url: str, data: Union[str, StreamingBody], headers: Dict) -> StreamingResponse:
+        response = self._get_session().post(url, data=data, headers=headers, timeout=self.timeout, stream=True)
+
+        def chunks() -> Iterator[bytes]:
+            try:
+                yield from response.iter_content(CHUNK_SIZE)
+            finally:
+                response.close()
+
+        return StreamingResponse(response.status_code, chunks())
+
+    def is_retryable(self, exc: Exception) -> bool:
+        import requests
+        # A read timeout means the request may have been processed
+        return isinstance(exc, requests.ConnectionError) and not isinstance(exc, requests.ReadTimeout)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+
+
+class _SessionHolder(object):
+    """
+    Thread-local reference to a thread's HTTP session
+    """
+
+    def __init__(self, session: 'requests.Session') -> None:
+        self.session = session
+
+
+def _close_session(session: 'requests.Session', sessions: Set['requests.Session'], lock: threading.Lock) -> None:
+    """
+    Close a thread's HTTP session after the thread ended
+
+    :param session: the session
+    :param set sessions: open sessions of the transport
+    :param lock: lock guarding ``sessions``
+    """
+    with lock:
+        sessions.discard(session)
+    session.close()
+
+
+def _canonical_key(request: Dict) -> Tuple[str, str]:
+    """
+    Key identifying a JSON-RPC (sub-)request regardless of its id and API key
+
+    :param dict request: decoded JSON-RPC request
+    :return: method name and canonically encoded parameters
+    :rtype: tuple
+    """
+    params = dict(request.get('params') or {})
+    params.pop('apikey', None)
+    return request.get('method', ''), json.dumps(params, sort_keys=True)
+
+
+class RecordingTransport(Transport):
+    """
+    Transport passing requests on to another transport and recording
+    each request/response pair as one line of JSON to a file
+    """
+
+    def __init__(self, path: str, transport: Optional[Transport] = None) -> None:
+        """
+        :param str path: Path to the recording file; pairs are appended
+        :param Transport transport: (optional) transport to record, default: :py:class:`HTTPTransport`
+        """
+        self.path = path
+        self.transport = transport if transport is not None else HTTPTransport()
+        self._lock = threading.Lock()
+
+    def is_retryable(self, exc: Exception) -> bool:
+        return self.transport.is_retryable(exc)
+
+    def post(self, url: str, data: Union[str, StreamingBody], headers: Dict) -> Response:
+        response = self.transport.post(url, data, headers)
+
+        try:
+            requests_sent = json.loads(data.read_all() if isinstance(data, StreamingBody) else data)
+            responses = json.loads(response.content)
+        except ValueError:
+            return response
+
+        if isinstance(requests_sent, dict):
+            pairs = [(requests_sent, responses)]
+        else:
+            by_id = {}
+            if isinstance(responses, list):
+                by_id = {rsp.get('id'): rsp for rsp in responses if isinstance(rsp, dict)}
+            pairs = [(rq, by_id.get(rq.get('id'))) for rq in requests_sent]
+
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as file_handle:
+                for rq, rsp in pairs:
+                    if rsp is None:
+                        continue
+                    params = dict(rq.get('params') or {})
+                    params.pop('apikey', None)
+                    file_handle.write(json.dumps({
+                        'method': rq.get('method'),
+                        'params': params,
+                        'response': {key: value for key, value in rsp.items() if key != 'id'},
+                    }) + '\n')
+
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class LocalTransport(Transport):
+    """
+    Base class for transports answering requests in-process
+
+    Each request is delayed by ``latency`` seconds
+    (plus ``latency_per_request`` seconds for each sub-request of a batch)
+    to simulate a remote server.
+    """
+
+    def __init__(self, latency: float = 0.0, latency_per_request: float = 0.0) -> None:
+        """
+        :param float latency: (optional) delay per HTTP request in seconds
+        :param float latency_per_request: (optional) additional delay per (sub-)request in seconds
+        """
+        self.latency = latency
+        self.latency_per_request = latency_per_request
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+        """Number of (sub-)requests answered so far by method name"""
+        self.posts = 0
+        """Number of HTTP requests answered so far"""
+
+    def handle(self, request: Dict) -> Any:
+        """
+        Answer a single JSON-RPC request
+
+        :param dict request: decoded JSON-RPC request
+        :return: the method's output data
+        :raises: :py:exc:`~idoitapi.APIException.JSONRPC` to answer with an error
+        """
+        raise NotImplementedError
+
+    def respond(self, request: Dict) -> Dict:
+        """
+        Build the JSON-RPC response for a single request
+
+        :param dict request: decoded JSON-RPC request
+        :return: response with either a 'result' or an 'error' key
+        :rtype: dict
+        """
+        with self._lock:
+            self.calls[request.get('method', '')] += 1
+        try:
+            response = {'jsonrpc': '2.0', 'result': self.handle(request)}
+        except JSONRPC as exc:
+            response = {
+                'jsonrpc': '2.0',
+                'error': {
+                    'code': exc.code if exc.code is not None else exc.raw_code,
+                    'message': exc.message,
+                    'data': exc.data,
+                },
+            }
+        response['id'] = request.get('id')
+        return response
+
+    def dispatch(self, data: Union[str, bytes, StreamingBody]) -> bytes:
+        """
+        Answer an encoded single or batch request
+
+        :param data: JSON encoded request
+        :return: JSON encoded response
+        :rtype: bytes
+        """
+        payload = json.loads(data.read_all() if isinstance(data, StreamingBody) else data)
+
+        with self._lock:
+            self.posts += 1
+
+        if isinstance(payload, list):
+            delay = self.latency + self.latency_per_request * len(payload)
+            result: Any = [self.respond(rq) for rq in payload]
+        else:
+            delay = self.latency + self.latency_per_request
+            result = self.respond(payload)
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return json.dumps(result).encode('utf-8')
+
+    def post(self, url: str, data: Union[str, StreamingBody], headers: Dict) -> Response:
+        return Response(200, self.dispatch(data))
+
+
+class ReplayTransport(LocalTransport):
+    """
+    Transport answering requests from a file written by :py:class:`RecordingTransport`
+
+    Requests are matched by method name and parameters (ignoring ids and the API key).
+    If the same request was recorded several times, the responses are served in
+    recorded order, repeating the last one.
+    """
+
+    def __init__(self, path: str, latency: float = 0.0, latency_per_request: float = 0.0) -> None:
+        """
+        :param str path: Path to the recording file
+        :param float latency: (optional) delay per HTTP request in seconds
+        :param float latency_per_request: (optional) additional delay per (sub-)request in seconds
+        """
+        super(ReplayTransport, self).__init__(latency, latency_per_request)
+        self._recordings: Dict[Tuple[str, str], List[Dict]] = {}
+        self._served: Dict[Tuple[str, str], int] = {}
+
+        with open(path, encoding='utf-8') as file_handle:
+            for line in file_handle:
+                if line.strip() == '':
+                    continue
+                recording = json.loads(line)
+                key = _canonical_key(recording)
+                self._recordings.setdefault(key, []).append(recording['response'])
+
+    def handle(self, request: Dict) -> Any:
+        key = _canonical_key(request)
+
+        if key not in self._recordings:
+            raise MethodNotFound(
+                message='No recorded response for {} {}'.format(key[0], key[1])
+            )
+
+        with self._lock:
+            responses = self._recordings[key]
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+
+        response = responses[min(index, len(responses) - 1)]
+
+        if 'error' in response:
+            error = response['error']
+            raise JSONRPC(data=error.get('data'), raw_code=error.get('code'), message=error.get('message'))
+
+        return response.get('result')
+
+
+class MockTransport(LocalTransport):
+    """
+    Transport answering requests with handler functions
+
+    A handler receives the request parameters (without the API key) and returns
+    the method's output data, or raises :py:exc:`~idoitapi.APIException.JSONRPC`.
+    """
+
+    def __init__(self,
+                 handlers: Optional[Dict[str, Callable[[Dict], Any]]] = None,
+                 latency: float = 0.0,
+                 latency_per_request: float = 0.0
+                 ) -> None:
+        """
+        :param dict handlers: (optional) handler functions by JSON-RPC method name
+        :param float latency: (optional) delay per HTTP request in seconds
+        :param float latency_per_request: (optional) additional delay per (sub-)request in seconds
+        """
+        super(MockTransport, self).__init__(latency, latency_per_request)
+        self.handlers: Dict[str, Callable[[Dict], Any]] = dict(handlers or {})
+
+    def add_handler(self, method: str, handler: Callable[[Dict], Any]) -> None:
+        """
+        Register a handler function
+
+        :param str method: JSON-RPC method name
+        :param handler: function receiving the request parameters and returning the output data
+        """
+        self.handlers[method] = handler
+
+    def handle(self, request: Dict) -> Any:
+        method = request.get('method', '')
+
+        if method not in self.handlers:
+            raise MethodNotFound(message='No handler for {}'.format(method))
+
+        params = dict(request.get('params') or {})
+        params.pop('apikey', None)
+
+        try:
+            return self.handlers[method](params)
+        except JSONRPC:
+            raise
+        except Exception as exc:
+            raise InternalError(message=str(exc))
+
+
+class MockServer(object):
+    """
+    Local HTTP server answering JSON-RPC requests with a :py:class:`LocalTransport`
+
+    Use it as a context manager, and point an :py:class:`~idoitapi.API.API` at its ``url``.
+    """
+
+    def __init__(self, transport: LocalTransport, host: str = '127.0.0.1', port: int = 0) -> None:
+        """
+        :param LocalTransport transport: Transport answering the requests
+        :param str host: (optional) address to listen on, default: 127.0.0.1
+        :param int port: (optional) port to listen on, default: any free port
+        """
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from socketserver import ThreadingMixIn
+
+        class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.transport = transport
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get('Content-Length', 0))
+                body = transport.dispatch(self.rfile.read(length))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """
+        URL of the JSON-RPC endpoint
+        """
+        host, port = self._server.socket.getsockname()[:2]
+        return 'http://{}:{}/src/jsonrpc.php'.format(host, port)
+
+    def start(self) -> None:
+        """
+        Start serving in a background thread
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop serving
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'MockServer':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
@@ -1,16 +1,54 @@
-from .API import API
-from .CMDBCategory import CMDBCategory
-from .CMDBCategoryInfo import CMDBCategoryInfo
-from .CMDBDialog import CMDBDialog
-from .CMDBImpact import CMDBImpact
-from .CMDBLocationTree import CMDBLocationTree
-from .CMDBLogbook import CMDBLogbook
-from .CMDBObject import CMDBObject
-from .CMDBObjects import CMDBObjects
-from .CMDBObjectsByRelation import CMDBObjectsByRelation
-from .CMDBObjectTypeCategories import CMDBObjectTypeCategories
-from .CMDBObjectTypeGroups import CMDBObjectTypeGroups
-from .CMDBObjectTypes import CMDBObjectTypes
-from .CMDBReports import CMDBReports
-from .CMDBWorkstationComponents import CMDBWorkstationComponents
-from .Idoit import Idoit
+"""
+Python client for the i-doit JSON-RPC API
+
+The classes below are imported on first access, so that importing the package
+(e.g. in short-lived scripts needing only ``API`` and ``CMDBObject``) stays fast.
+"""
+
+import importlib
+import sys
+import types
+
+__all__ = [
+    'API',
+    'CMDBCategory',
+    'CMDBCategoryInfo',
+    'CMDBDialog',
+    'CMDBImpact',
+    'CMDBLocationTree',
+    'CMDBLogbook',
+    'CMDBObject',
+    'CMDBObjects',
+    'CMDBObjectsByRelation',
+    'CMDBObjectTypeCategories',
+    'CMDBObjectTypeGroups',
+    'CMDBObjectTypes',
+    'CMDBReports',
+    'CMDBWorkstationComponents',
+    'Idoit',
+]
+
+
+class _LazyModule(types.ModuleType):
+    """
+    Package exporting the classes in ``__all__``, each from the submodule of the same name
+    """
+
+    def __getattr__(self, name: str) -> type:
+        if name not in __all__:
+            raise AttributeError('module {!r} has no attribute {!r}'.format(self.__name__, name))
+        cls = getattr(importlib.import_module('.' + name, self.__name__), name)
+        self.__dict__[name] = cls
+        return cls
+
+    def __setattr__(self, name: str, value: object) -> None:
+        # Importing a submodule binds it to the package; keep exporting its class instead
+        if name in __all__ and isinstance(value, types.ModuleType):
+            value = getattr(value, name)
+        super(_LazyModule, self).__setattr__(name, value)
+
+    def __dir__(self) -> list:
+        return sorted(set(self.__dict__) | set(__all__))
+
+
+sys.modules[__name__].__class__ = _LazyModule
@@ -0,0 +1,136 @@
+"""
+Writing rows (e.g. report results) to files while they are received
+
+Supported formats are CSV, JSON Lines, and Parquet (requires ``pyarrow``).
+Rows are written as they come, so memory use does not grow with the number of rows.
+"""
+
+import csv
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from idoitapi.APIException import InvalidParams
+
+CSV = 'csv'
+JSON_LINES = 'jsonl'
+PARQUET = 'parquet'
+
+FORMATS_BY_EXTENSION = {
+    '.csv': CSV,
+    '.jsonl': JSON_LINES,
+    '.ndjson': JSON_LINES,
+    '.parquet': PARQUET,
+}
+
+# Rows per Parquet row group
+PARQUET_BATCH_SIZE = 10000
+
+
+def format_for(path: str, file_format: Optional[str] = None) -> str:
+    """
+    Determine the file format
+
+    :param str path: output file
+    :param str file_format: (optional) 'csv', 'jsonl' or 'parquet';
+        default: derived from the file extension
+    :return: the file format
+    :rtype: str
+    :raises: :py:exc:`~idoitapi.APIException.InvalidParams` for unknown formats
+    """
+    if file_format is None:
+        file_format = FORMATS_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+        if file_format is None:
+            raise InvalidParams(message='Unknown file format of "{}"'.format(path))
+    elif file_format not in (CSV, JSON_LINES, PARQUET):
+        raise InvalidParams(message='"{}" is not a valid file format'.format(file_format))
+    return file_format
+
+
+def write_rows(rows: Iterable[Dict[str, Any]], path: str, file_format: Optional[str] = None) -> int:
+    """
+    Write rows to a file
+
+    The file is written under a temporary name and renamed when complete,
+    so it never contains a partial result.
+    CSV and Parquet files get the columns of the first row.
+
+    :param rows: rows as dicts
+    :param str path: output file
+    :param str file_format: (optional) 'csv', 'jsonl' or 'parquet';
+        default: derived from the file extension
+    :return: number of rows written
+    :rtype: int
+    :raises: :py:exc:`~idoitapi.APIException.APIException` on error
+    """
+    file_format = format_for(path, file_format)
+    part_path = path + '.part'
+    try:
+        if file_format == CSV:
+            count = _write_csv(rows, part_path)
+        elif file_format == JSON_LINES:
+            count = _write_json_lines(rows, part_path)
+        else:
+            count = _write_parquet(rows, part_path)
+        os.replace(part_path, path)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    return count
+
+
+def _write_csv(rows: Iterable[Dict[str, Any]], path: str) -> int:
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file_handle:
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(file_handle, fieldnames=list(row), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _write_json_lines(rows: Iterable[Dict[str, Any]], path: str) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8') as file_handle:
+        for row in rows:
+            file_handle.write(json.dumps(row, ensure_ascii=False))
+            file_handle.write('\n')
+            count += 1
+    return count
+
+
+def _write_parquet(rows: Iterable[Dict[str, Any]], path: str) -> int:
+    import pyarrow
+    import pyarrow.parquet
+
+    count = 0
+    writer = None
+    batch: List[Dict[str, Any]] = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= PARQUET_BATCH_SIZE:
+                writer = _write_parquet_batch(pyarrow, writer, batch, path)
+                count += len(batch)
+                batch = []
+        if len(batch) > 0 or writer is None:
+            writer = _write_parquet_batch(pyarrow, writer, batch, path)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def _write_parquet_batch(pyarrow: Any, writer: Any, batch: List[Dict[str, Any]], path: str) -> Any:
+    if writer is None:
+        table = pyarrow.Table.from_pylist(batch)
+        writer = pyarrow.parquet.ParquetWriter(path, table.schema)
+    else:
+        table = pyarrow.Table.from_pylist(batch, schema=writer.schema)
+    writer.write_table(table)
+    return writer
@@ -0,0 +1,214 @@
+"""
+Incremental encoding of JSON-RPC requests and decoding of JSON-RPC responses
+
+Files in request parameters (see :py:class:`~idoitapi.utils.Base64File`) are
+encoded while the request is sent, and the items of a response's result array
+are decoded one at a time, so large uploads and results do not have to be held
+in memory as a whole.
+"""
+
+import codecs
+import json
+import os
+import re
+from typing import Any, Iterable, Iterator, List, Union
+
+from idoitapi.APIException import JSONRPC, exception_for
+from idoitapi.utils import Base64File
+
+CHUNK_SIZE = 64 * 1024
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_chunks(content: bytes, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Split a response body into chunks
+
+    :param bytes content: response body
+    :param int chunk_size: (optional) maximum chunk length
+    :return: chunks
+    """
+    view = memoryview(content)
+    for offset in range(0, len(content), chunk_size):
+        yield bytes(view[offset:offset + chunk_size])
+
+
+class StreamingBody(object):
+    """
+    Encoded request whose file contents are read and encoded while it is sent
+
+    Iterating yields the body in chunks of bytes; ``len()`` is its size in bytes.
+    It can be iterated more than once, e.g. to repeat the request.
+    """
+
+    def __init__(self, parts: List[Union[bytes, Base64File]]) -> None:
+        """
+        :param list parts: encoded JSON text and files, in order
+        """
+        self.parts = parts
+
+    def __len__(self) -> int:
+        return sum(len(part) if isinstance(part, bytes) else part.encoded_size for part in self.parts)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for part in self.parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part
+
+    def read_all(self) -> bytes:
+        """
+        Encode the complete body
+
+        :rtype: bytes
+        """
+        return b''.join(self)
+
+
+def encode_request(request: Any) -> Union[str, StreamingBody]:
+    """
+    Encode a single or batch request
+
+    :param request: request(s) to encode
+    :return: JSON encoded request, or a :py:class:`StreamingBody`
+        if the request contains :py:class:`~idoitapi.utils.Base64File` values
+    :rtype: Union[str, StreamingBody]
+    """
+    files: List[Base64File] = []
+    token = os.urandom(8).hex()
+
+    def placeholder(value: Any) -> str:
+        if isinstance(value, Base64File):
+            files.append(value)
+            return '\x00{}:{}\x00'.format(token, len(files) - 1)
+        raise TypeError('Object of type {} is not JSON serializable'.format(type(value).__name__))
+
+    text = json.dumps(request, default=placeholder)
+    if len(files) == 0:
+        return text
+
+    parts: List[Union[bytes, Base64File]] = []
+    # Placeholders are encoded as "\u0000<token>:<index>\u0000"; split() alternates text and index
+    pieces = re.split(r'"\\u0000' + token + r':(\d+)\\u0000"', text)
+    for number, piece in enumerate(pieces):
+        if number % 2 == 0:
+            parts.append(piece.encode('utf-8'))
+        else:
+            parts.extend((b'"', files[int(piece)], b'"'))
+    return StreamingBody(parts)
+
+
+class _Buffer(object):
+    """
+    Text decoded from a stream of byte chunks, consumed front to back
+    """
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """
+        Append the next chunk, dropping the text already consumed
+
+        :return: ``False`` at the end of the stream
+        """
+        if self.eof:
+            return False
+        try:
+            text = self._decoder.decode(next(self._chunks))
+        except StopIteration:
+            self.eof = True
+            text = self._decoder.decode(b'', final=True)
+        self.text = self.text[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character
+
+        :return: the next character, or '' at the end of the stream
+        """
+        while True:
+            text, pos = self.text, self.pos
+            while pos < len(text) and text[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(text):
+                return text[pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        """
+        Consume the next character, which must be one of ``chars``
+
+        :return: the character
+        :raises: :py:exc:`~idoitapi.APIException.JSONRPC` otherwise
+        """
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise JSONRPC(message='Invalid JSON-RPC response: expected one of "{}"'.format(chars))
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """
+        Decode the next JSON value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A value ending with the buffer (e.g. a number) may continue in the next chunk
+            if end < len(self.text) or self.eof:
+                self.pos = end
+                return value
+            self.fill()
+
+
+def iter_result(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Decode the items of a JSON-RPC response's result array one at a time
+
+    Nothing is yielded if the result is not an array.
+
+    :param chunks: the response body in chunks
+    :return: result items
+    :raises: :py:exc:`~idoitapi.APIException.APIException` if the response is an error
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect('{')
+    if buffer.peek() == '}':
+        return
+    while True:
+        key = buffer.value()
+        buffer.expect(':')
+        if key == 'result' and buffer.peek() == '[':
+            buffer.pos += 1
+            if buffer.peek() == ']':
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.value()
+                    if buffer.expect(',]') == ']':
+                        break
+        elif key == 'error':
+            error = buffer.value()
+            if error is not None:
+                raise exception_for(error)
+        else:
+            buffer.value()
+        if buffer.expect(',}') == '}':
+            return
@@ -0,0 +1,118 @@
+"""
+Optional tracing hooks
+
+High-level request methods open a span per call, and every HTTP request to the
+JSON-RPC API opens a child span. Spans are reported to
+`OpenTelemetry <https://opentelemetry.io/>`_ if the ``opentelemetry-api`` package
+is installed; otherwise all hooks are no-ops.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional, TypeVar
+
+TRACER_NAME = 'idoitapi'
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+_tracer: Any = None
+
+# OpenTelemetry's trace module, imported on first use; None if not installed
+_otel_trace: Any = None
+_otel_imported = False
+
+
+class _NoOpSpan(object):
+    """
+    Stand-in for a span when tracing is disabled
+    """
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+_NO_OP_SPAN = _NoOpSpan()
+
+
+def set_tracer(tracer: Any) -> None:
+    """
+    Use a specific tracer instead of OpenTelemetry's global tracer provider
+
+    :param tracer: an object providing ``start_as_current_span(name, attributes=...)``,
+        e.g. an OpenTelemetry tracer, or ``None`` to fall back to the default
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Any:
+    """
+    Get the tracer in use
+
+    :return: the tracer set by :py:func:`set_tracer`, OpenTelemetry's tracer
+        for this package, or ``None`` if tracing is not available
+    """
+    if _tracer is not None:
+        return _tracer
+    otel_trace = _otel_trace if _otel_imported else _import_opentelemetry()
+    if otel_trace is not None:
+        return otel_trace.get_tracer(TRACER_NAME)
+    return None
+
+
+def _import_opentelemetry() -> Any:
+    """
+    Import OpenTelemetry's trace module on first use
+
+    :return: the module, or ``None`` if ``opentelemetry-api`` is not installed
+    """
+    global _otel_trace, _otel_imported
+    try:
+        from opentelemetry import trace as otel_trace
+    except ImportError:  # pragma: no cover - depends on the environment
+        otel_trace = None
+    _otel_trace = otel_trace
+    _otel_imported = True
+    return otel_trace
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[Any]:
+    """
+    Open a span as a child of the current span
+
+    :param str name: Span name
+    :param dict attributes: (optional) initial span attributes
+    :return: context manager yielding the span (a no-op span if tracing is not available)
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield _NO_OP_SPAN
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current_span:
+        yield current_span
+
+
+def traced(func: F) -> F:
+    """
+    Decorator opening a span named after the decorated method for each call
+
+    :param func: Method to trace
+    :return: wrapped method
+    """
+    name = TRACER_NAME + '.' + func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if get_tracer() is None:
+            return func(*args, **kwargs)
+        with span(name):
+            return func(*args, **kwargs)
+
+    return wrapper  # type: ignore
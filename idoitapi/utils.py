@@ -2,9 +2,14 @@
 Utility functions
 """
 
+import os
 from base64 import b64encode
 from socket import inet_aton, inet_ntoa
 from struct import unpack, pack
+from typing import Iterator
+
+# Bytes read at a time; a multiple of 3, so chunks can be encoded separately
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
 
 
 def ip2long(ip_addr: str) -> int:
@@ -49,3 +54,64 @@ def base64_encode(file_path: str) -> str:
     #   raise RuntimeError('Cannot convert file "{}" to base64 string'.format(file_path))
 
     return file_as_string
+
+
+def base64_encode_chunks(file_path: str, chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Encode a file contents to base64, one chunk at a time
+
+    Concatenated, the chunks equal :py:func:`base64_encode`'s result.
+
+    :param str file_path: Path to file
+    :param int chunk_size: (optional) bytes to read at a time; must be a multiple of 3
+    :return: Base64 encoded chunks
+    :rtype: Iterator[bytes]
+    :raises: :py:exc:`OSError` if file not found or unreadable
+    """
+    if chunk_size <= 0 or chunk_size % 3 != 0:
+        raise ValueError('chunk_size must be a positive multiple of 3')
+
+    with open(file_path, 'rb') as file_handle:
+        while True:
+            chunk = file_handle.read(chunk_size)
+            if not chunk:
+                break
+            yield b64encode(chunk)
+
+
+class Base64File(object):
+    """
+    Placeholder for the base64 encoded contents of a file in request parameters
+
+    The file is read and encoded in chunks while the request is sent,
+    so it is never held in memory as a whole.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        :param str file_path: Path to file
+        :raises: :py:exc:`OSError` if file not found
+        :raises: :py:exc:`RuntimeError` if file is empty
+        """
+        self.file_path = file_path
+        self.size = os.path.getsize(file_path)
+        if self.size == 0:
+            raise RuntimeError('Unable to read from file "{}"'.format(file_path))
+
+    @property
+    def encoded_size(self) -> int:
+        """
+        Length of the base64 encoded contents
+        """
+        return (self.size + 2) // 3 * 4
+
+    def __iter__(self) -> Iterator[bytes]:
+        length = 0
+        for chunk in base64_encode_chunks(self.file_path):
+            length += len(chunk)
+            yield chunk
+        if length != self.encoded_size:
+            raise RuntimeError('File "{}" changed while it was sent'.format(self.file_path))
+
+    def __repr__(self) -> str:
+        return 'Base64File({!r})'.format(self.file_path)
@@ -42,6 +42,10 @@ setup(
     ],
     extras_require={
         'docs': ['Sphinx'],
+        'tracing': ['opentelemetry-api'],
+        'pandas': ['pandas'],
+        'arrow': ['pyarrow'],
+        'images': ['Pillow'],
     },
     test_suite='nose.collector',
     tests_require=[
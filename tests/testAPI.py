@@ -3,9 +3,14 @@ Tests for the low-Level object to access the i-doit JSON-RPC API.
 """
 
 import configparser
+import gc
+import json
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 from idoitapi.API import API
+from idoitapi.Transport import HTTPTransport, MockServer, MockTransport, Response
 import idoitapi.APIException
 
 
@@ -31,6 +36,336 @@ class TestApiObject(unittest.TestCase):
             API(url='http://localhost', key='')
 
 
+class TestApiThreadSafety(unittest.TestCase):
+    def test_generate_id(self):
+        """
+        Test unique request identifiers across threads
+        """
+        api = API(url='http://localhost', key='abc123')
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            ids = list(executor.map(lambda _: api.generate_id(), range(10000)))
+        self.assertEqual(len(set(ids)), 10000)
+        self.assertEqual(api.count_request(), 10000)
+
+    def test_shared_session(self):
+        """
+        Test requests from several threads sharing one logged in API object
+        """
+        seen_ids = []
+        lock = threading.Lock()
+
+        def echo(params):
+            return params
+
+        transport = MockTransport({
+            'idoit.login': lambda params: {'session-id': 'abc'},
+            'idoit.version': echo,
+        })
+        respond = transport.respond
+
+        def recording_respond(request):
+            with lock:
+                seen_ids.append(request['id'])
+            return respond(request)
+        transport.respond = recording_respond
+
+        api = API(url='http://localhost', key='abc123', username='user', password='pass', transport=transport)
+        api.login()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: api.request('idoit.version'), range(200)))
+        self.assertEqual(len(results), 200)
+        self.assertEqual(len(set(seen_ids)), len(seen_ids))
+        self.assertTrue(api.is_logged_in())
+
+    def test_sessions_closed(self):
+        """
+        Test closing the HTTP sessions of worker threads that ended
+        """
+        payload = [{'method': 'idoit.version'} for _ in range(8)]
+        with MockServer(MockTransport({'idoit.version': lambda params: {'version': '1.0'}})) as server:
+            transport = HTTPTransport()
+            api = API(url=server.url, key='abc123', transport=transport)
+            for _ in range(20):
+                api.batch_request(payload, chunk_size=2, max_workers=4)
+            gc.collect()
+            self.assertEqual(transport.session_count, 0)
+
+            api.request('idoit.version')
+            self.assertEqual(transport.session_count, 1)
+            api.close()
+            self.assertEqual(transport.session_count, 0)
+            self.assertEqual(api.request('idoit.version'), {'version': '1.0'})
+            api.close()
+
+
+class TestApiEnvelope(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.transport = MockTransport({'idoit.version': lambda params: params})
+        respond = self.transport.respond
+
+        def recording_respond(request):
+            self.sent.append(request)
+            return respond(request)
+        self.transport.respond = recording_respond
+
+        self.api = API(url='http://localhost', key='abc123', language='de', transport=self.transport)
+
+    def test_request(self):
+        """
+        Test API key and language in a request
+        """
+        self.api.request('idoit.version', {'foo': 'bar'})
+        self.api.request('idoit.version', {'language': 'en'})
+        self.api.request('idoit.version')
+        self.assertEqual(
+            [request['params'] for request in self.sent],
+            [
+                {'apikey': 'abc123', 'language': 'de', 'foo': 'bar'},
+                {'apikey': 'abc123', 'language': 'en'},
+                {'apikey': 'abc123', 'language': 'de'},
+            ]
+        )
+        self.assertEqual(len(set(request['id'] for request in self.sent)), 3)
+
+    def test_batch_request(self):
+        """
+        Test that a batch request leaves the caller's sub-requests untouched
+        """
+        payload = [
+            {'method': 'idoit.version', 'params': {'foo': 'bar'}},
+            {'method': 'idoit.version', 'params': {'language': 'en'}},
+        ]
+        results = self.api.batch_request(payload)
+        self.assertEqual(payload, [
+            {'method': 'idoit.version', 'params': {'foo': 'bar'}},
+            {'method': 'idoit.version', 'params': {'language': 'en'}},
+        ])
+        self.assertEqual(results, [{'foo': 'bar', 'language': 'de'}, {'language': 'en'}])
+
+
+class TestApiCoalescing(unittest.TestCase):
+    def test_coalesce_reads(self):
+        """
+        Test sharing one request between identical concurrent reads
+        """
+        transport = MockTransport({'cmdb.object.read': lambda params: {'id': params['id']}}, latency=0.2)
+        api = API(url='http://localhost', key='abc123', transport=transport, coalesce_reads=True)
+        barrier = threading.Barrier(8)
+
+        def read(_):
+            barrier.wait()
+            return api.request('cmdb.object.read', {'id': 1})
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(read, range(8)))
+
+        self.assertEqual(transport.calls['cmdb.object.read'], 1)
+        self.assertEqual(results, [{'id': 1}] * 8)
+        self.assertEqual(len(set(id(result) for result in results)), 8)
+
+    def test_writes(self):
+        """
+        Test that write requests are never shared
+        """
+        transport = MockTransport({'cmdb.object.create': lambda params: {'id': 1}}, latency=0.1)
+        api = API(url='http://localhost', key='abc123', transport=transport, coalesce_reads=True)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: api.request('cmdb.object.create', {'title': 'x'}), range(4)))
+        self.assertEqual(transport.calls['cmdb.object.create'], 4)
+
+
+class UnreachableNodeTransport(MockTransport):
+    """
+    Mock transport counting requests per URL, with one unreachable URL
+    """
+
+    def __init__(self, unreachable=None):
+        super(UnreachableNodeTransport, self).__init__({'idoit.version': lambda params: params})
+        self.unreachable = unreachable
+        self.urls = []
+
+    def post(self, url, data, headers):
+        self.urls.append(url)
+        if url == self.unreachable:
+            raise ConnectionError('unreachable')
+        return super(UnreachableNodeTransport, self).post(url, data, headers)
+
+    def is_retryable(self, exc):
+        return isinstance(exc, ConnectionError)
+
+
+class TestApiEndpoints(unittest.TestCase):
+    urls = ['http://node1', 'http://node2']
+
+    def test_round_robin(self):
+        """
+        Test spreading requests across nodes
+        """
+        transport = UnreachableNodeTransport()
+        api = API(url=self.urls, key='abc123', transport=transport)
+        for _ in range(4):
+            api.request('idoit.version')
+        self.assertEqual(transport.urls.count('http://node1/src/jsonrpc.php'), 2)
+        self.assertEqual(transport.urls.count('http://node2/src/jsonrpc.php'), 2)
+
+    def test_failover(self):
+        """
+        Test skipping an unreachable node
+        """
+        transport = UnreachableNodeTransport('http://node1/src/jsonrpc.php')
+        api = API(url=self.urls, key='abc123', transport=transport, balancing='least_outstanding')
+        for number in range(4):
+            self.assertEqual(api.request('idoit.version', {'number': number}), {'number': number})
+        self.assertEqual(transport.urls.count('http://node1/src/jsonrpc.php'), 1)
+
+    def test_chunked_batch_request(self):
+        """
+        Test sending a batch request in chunks
+        """
+        transport = UnreachableNodeTransport()
+        api = API(url=self.urls, key='abc123', transport=transport)
+        payload = [{'method': 'idoit.version', 'params': {'number': number}} for number in range(10)]
+        results = api.batch_request(payload, chunk_size=3)
+        self.assertEqual([result['number'] for result in results], list(range(10)))
+        self.assertEqual(transport.posts, 4)
+        self.assertEqual(len(set(transport.urls)), 2)
+
+    def test_streamed_request(self):
+        """
+        Test that an endpoint is busy until a streamed response has been read
+        """
+        transport = MockTransport({'cmdb.objects.read': lambda params: [{'id': 1}, {'id': 2}]})
+        api = API(url=self.urls, key='abc123', transport=transport, balancing='least_outstanding')
+        items = api.iter_request('cmdb.objects.read')
+        self.assertEqual(next(items), {'id': 1})
+        self.assertEqual([endpoint.outstanding for endpoint in api.endpoints.endpoints], [1, 0])
+        self.assertEqual(list(api.iter_request('cmdb.objects.read')), [{'id': 1}, {'id': 2}])
+        self.assertEqual([endpoint.outstanding for endpoint in api.endpoints.endpoints], [1, 0])
+        self.assertEqual(list(items), [{'id': 2}])
+        self.assertEqual([endpoint.outstanding for endpoint in api.endpoints.endpoints], [0, 0])
+
+
+class ExpiringSessionTransport(MockTransport):
+    """
+    Mock transport rejecting requests with an outdated session identifier
+    """
+
+    def __init__(self):
+        super(ExpiringSessionTransport, self).__init__({
+            'idoit.version': lambda params: {'version': '1.0'},
+            'idoit.login': self.login,
+        })
+        self.logins = 0
+        self.valid_session = None
+
+    def login(self, params):
+        with self._lock:
+            self.logins += 1
+            self.valid_session = 'session{}'.format(self.logins)
+        return {'session-id': self.valid_session}
+
+    def expire(self):
+        self.valid_session = 'expired'
+
+    def post(self, url, data, headers):
+        session_id = headers.get('X-RPC-Auth-Session')
+        if session_id is None or session_id == self.valid_session:
+            return super(ExpiringSessionTransport, self).post(url, data, headers)
+        error = {'code': -32604, 'message': 'Authentication error', 'data': 'Session expired'}
+        payload = json.loads(data)
+        if isinstance(payload, list):
+            body = [{'jsonrpc': '2.0', 'error': error, 'id': rq['id']} for rq in payload]
+        else:
+            body = {'jsonrpc': '2.0', 'error': error, 'id': payload['id']}
+        return Response(200, json.dumps(body).encode('utf-8'))
+
+
+class TestApiRelogin(unittest.TestCase):
+    def setUp(self):
+        self.transport = ExpiringSessionTransport()
+        self.api = API(url='http://localhost', key='abc123', username='user', password='pass',
+                       transport=self.transport)
+        self.api.login()
+
+    def test_request(self):
+        """
+        Test repeating a request after the session expired
+        """
+        self.transport.expire()
+        self.assertEqual(self.api.request('idoit.version'), {'version': '1.0'})
+        self.assertEqual(self.transport.logins, 2)
+
+    def test_batch_request(self):
+        """
+        Test repeating a batch request after the session expired
+        """
+        self.transport.expire()
+        results = self.api.batch_request([{'method': 'idoit.version'}, {'method': 'idoit.version'}])
+        self.assertEqual(results, [{'version': '1.0'}, {'version': '1.0'}])
+        self.assertEqual(self.transport.logins, 2)
+
+    def test_iter_request(self):
+        """
+        Test repeating an incrementally decoded request after the session expired
+        """
+        self.transport.add_handler('cmdb.objects.read', lambda params: [{'id': 1}, {'id': 2}])
+        self.transport.expire()
+        self.assertEqual(list(self.api.iter_request('cmdb.objects.read')), [{'id': 1}, {'id': 2}])
+        self.assertEqual(self.transport.logins, 2)
+
+    def test_threads(self):
+        """
+        Test a single re-login for concurrent requests
+        """
+        self.transport.expire()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: self.api.request('idoit.version'), range(50)))
+        self.assertEqual(len(results), 50)
+        self.assertEqual(self.transport.logins, 2)
+
+    def test_other_errors(self):
+        """
+        Failure test: errors merely mentioning sessions are not repeated
+        """
+        self.assertTrue(idoitapi.APIException.is_session_error(
+            {'code': -32604, 'message': 'Authentication error', 'data': {'error': 'Session expired'}}
+        ))
+        for error in (
+                {'code': -32603, 'message': 'Internal error', 'data': 'Session expired'},
+                {'code': -32602, 'message': 'Invalid parameters', 'data': 'Login name of session user not found'},
+                {'code': -32604, 'message': 'Authentication error', 'data': 'Wrong username or password'},
+        ):
+            self.assertFalse(idoitapi.APIException.is_session_error(error))
+
+        def fail(params):
+            raise idoitapi.APIException.InternalError(data='Invalid session data in object 1')
+        self.transport.add_handler('cmdb.object.create', fail)
+        with self.assertRaises(idoitapi.APIException.InternalError):
+            self.api.request('cmdb.object.create', {'type': 5, 'title': 'Server'})
+        self.assertEqual(self.transport.calls['cmdb.object.create'], 1)
+        self.assertEqual(self.transport.logins, 1)
+
+    def test_disabled(self):
+        """
+        Failure test with automatic re-login disabled
+        """
+        self.api.auto_relogin = False
+        self.transport.expire()
+        with self.assertRaises(idoitapi.APIException.AuthenticationError):
+            self.api.request('idoit.version')
+
+    def test_unknown_error(self):
+        """
+        Test that authentication errors are still caught as UnknownError
+        """
+        self.api.auto_relogin = False
+        self.transport.expire()
+        with self.assertRaises(idoitapi.APIException.UnknownError) as context:
+            self.api.request('idoit.version')
+        self.assertEqual(context.exception.raw_code, -32604)
+
+
 class TestApiConnection(unittest.TestCase):
 
     def setUp(self):
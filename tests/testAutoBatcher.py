@@ -0,0 +1,107 @@
+"""
+Tests for collecting single requests into batch requests
+"""
+
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from idoitapi.API import API
+from idoitapi.CMDBObject import CMDBObject
+from idoitapi.Transport import MockTransport
+import idoitapi.APIException
+
+
+def read_object(params):
+    if params['id'] < 0:
+        raise idoitapi.APIException.InvalidParams(message='Invalid object id')
+    return {'id': params['id'], 'title': 'Object {}'.format(params['id'])}
+
+
+class TestAutoBatcher(unittest.TestCase):
+    def setUp(self):
+        self.transport = MockTransport({'cmdb.object.read': read_object}, latency=0.05)
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+
+    def test_submit(self):
+        """
+        Test collecting submitted requests into one batch request
+        """
+        with self.api.auto_batch(window=0.05) as batcher:
+            futures = [batcher.submit('cmdb.object.read', {'id': number}) for number in range(10)]
+        self.assertEqual([future.result()['id'] for future in futures], list(range(10)))
+        self.assertEqual(self.transport.posts, 1)
+
+    def test_max_size(self):
+        """
+        Test splitting large batches
+        """
+        with self.api.auto_batch(window=0.05, max_size=4) as batcher:
+            futures = [batcher.submit('cmdb.object.read', {'id': number}) for number in range(10)]
+        self.assertEqual([future.result()['id'] for future in futures], list(range(10)))
+        self.assertEqual(self.transport.posts, 3)
+
+    def test_errors(self):
+        """
+        Test typed exceptions per request
+        """
+        with self.api.auto_batch() as batcher:
+            good = batcher.submit('cmdb.object.read', {'id': 1})
+            bad = batcher.submit('cmdb.object.read', {'id': -1})
+        self.assertEqual(good.result()['id'], 1)
+        self.assertIsInstance(bad.exception(), idoitapi.APIException.InvalidParams)
+
+    def test_threads(self):
+        """
+        Test batching unchanged per-object calls from a thread pool
+        """
+        cmdb_object = CMDBObject(self.api)
+        self.api.enable_auto_batching(window=0.05)
+        try:
+            with ThreadPoolExecutor(max_workers=20) as executor:
+                objects = list(executor.map(cmdb_object.read, range(20)))
+        finally:
+            self.api.disable_auto_batching()
+        self.assertEqual([obj['id'] for obj in objects], list(range(20)))
+        self.assertLess(self.transport.posts, 5)
+
+        self.api.request('cmdb.object.read', {'id': 1})
+        self.assertEqual(self.transport.calls['cmdb.object.read'], 21)
+
+    def test_sequential(self):
+        """
+        Test that a loop in a single thread is not slowed down
+        """
+        self.transport.latency = 0
+        start = time.monotonic()
+        with self.api.auto_batch(window=0.05):
+            for number in range(10):
+                self.assertEqual(self.api.request('cmdb.object.read', {'id': number})['id'], number)
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertEqual(self.transport.posts, 10)
+
+    def test_thread_scope(self):
+        """
+        Test collecting only the calling thread's requests unless asked for all threads
+        """
+        for all_threads, posts in ((False, 2), (True, 1)):
+            self.transport.posts = 0
+            with self.api.auto_batch(window=0.2, all_threads=all_threads) as batcher:
+                future = batcher.submit('cmdb.object.read', {'id': 1})
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    executor.submit(self.api.request, 'cmdb.object.read', {'id': 2}).result()
+            self.assertEqual(future.result()['id'], 1)
+            self.assertEqual(self.transport.posts, posts)
+
+    def test_closed(self):
+        """
+        Test submitting after leaving the context
+        """
+        with self.api.auto_batch() as batcher:
+            pass
+        with self.assertRaises(idoitapi.APIException.JSONRPC):
+            batcher.submit('cmdb.object.read', {'id': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for deferring method calls of request objects into batch requests
+"""
+
+import json
+import unittest
+
+from idoitapi.API import API
+from idoitapi.CMDBCategory import CMDBCategory
+from idoitapi.CMDBLogbook import CMDBLogbook
+from idoitapi.CMDBObject import CMDBObject
+from idoitapi.Transport import MockTransport
+import idoitapi.APIException
+
+
+def save_category(params):
+    if params['object'] < 0:
+        raise idoitapi.APIException.InvalidParams(message='Invalid object id')
+    return {'success': True, 'entry': params['object'] * 10}
+
+
+class TestBatchBuilder(unittest.TestCase):
+    def setUp(self):
+        self.transport = MockTransport({
+            'cmdb.object.update': lambda params: {'success': True},
+            'cmdb.category.save': save_category,
+            'cmdb.logbook.create': lambda params: {'success': True},
+        })
+        self.methods = []
+        post = self.transport.post
+
+        def record(url, data, headers):
+            requests = json.loads(data)
+            self.methods.append([rq['method'] for rq in requests] if isinstance(requests, list)
+                                else requests['method'])
+            return post(url, data, headers)
+        self.transport.post = record
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+
+    def test_one_batch(self):
+        """
+        Test combining calls of several request classes into one batch request
+        """
+        with self.api.batch() as batch:
+            updated = batch.defer(CMDBObject).update(1, {'title': 'Server'})
+            category = batch.defer(CMDBCategory)
+            saved = [category.save(number, 'C__CATG__MODEL', {'serial': str(number)}) for number in (1, 2, 3)]
+            logged = batch.defer(CMDBLogbook(self.api)).create(1, 'Updated')
+
+        self.assertEqual(self.transport.posts, 1)
+        self.assertEqual(self.methods, [[
+            'cmdb.object.update',
+            'cmdb.category.save', 'cmdb.category.save', 'cmdb.category.save',
+            'cmdb.logbook.create',
+        ]])
+        self.assertIsNone(updated.result())
+        self.assertEqual([future.result() for future in saved], [10, 20, 30])
+        self.assertIsNone(logged.result())
+        self.assertEqual(batch.rounds, 1)
+
+    def test_chunks(self):
+        """
+        Test splitting many calls into chunks
+        """
+        with self.api.batch(chunk_size=4) as batch:
+            category = batch.defer(CMDBCategory)
+            saved = [category.save(number, 'C__CATG__MODEL', {}) for number in range(10)]
+        self.assertEqual([future.result() for future in saved], [number * 10 for number in range(10)])
+        self.assertEqual(self.transport.posts, 3)
+
+    def test_errors(self):
+        """
+        Test typed exceptions per call
+        """
+        with self.api.batch() as batch:
+            category = batch.defer(CMDBCategory)
+            good = category.save(1, 'C__CATG__MODEL', {})
+            bad = category.save(-1, 'C__CATG__MODEL', {})
+        self.assertEqual(good.result(), 10)
+        self.assertIsInstance(bad.exception(), idoitapi.APIException.InvalidParams)
+
+    def test_lazy(self):
+        """
+        Test sending the batch when a result is asked for
+        """
+        batch = self.api.batch()
+        future = batch.request('cmdb.category.save', {'object': 4, 'category': 'C__CATG__MODEL', 'data': {}})
+        self.assertEqual(self.transport.posts, 0)
+        self.assertEqual(future.result()['entry'], 40)
+        self.assertEqual(self.transport.posts, 1)
+
+    def test_cancel(self):
+        """
+        Test that nothing is sent when the block raises
+        """
+        with self.assertRaises(RuntimeError):
+            with self.api.batch() as batch:
+                future = batch.defer(CMDBLogbook).create(1, 'Never sent')
+                raise RuntimeError()
+        self.assertTrue(future.cancelled())
+        self.assertEqual(self.transport.posts, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,461 @@
+"""
+Tests for creating and changing many objects and category entries
+"""
+
+import collections
+import itertools
+import json
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from idoitapi.API import API
+from idoitapi.CMDBCategory import CMDBCategory
+from idoitapi.CMDBObject import CMDBObject
+from idoitapi.CMDBObjects import CMDBObjects
+from idoitapi.DialogResolver import DialogResolver
+from idoitapi.TitleIndex import TitleIndex
+from idoitapi.Transport import MockTransport
+import idoitapi.APIException
+
+
+class ObjectsTransport(MockTransport):
+    """
+    Mock transport creating objects, optionally failing for one title
+    """
+
+    def __init__(self, fail_title=None):
+        super(ObjectsTransport, self).__init__({
+            'cmdb.object.create': self.create_object,
+            'cmdb.objects.read': self.read_objects,
+            'cmdb.logbook.read': lambda params: self.logbook,
+            'cmdb.object.purge': self.purge_object,
+        })
+        self.logbook = []
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+        self.created = []
+        self.objects = []
+        self.fail_title = fail_title
+
+    def create_object(self, params):
+        if params['title'] == self.fail_title:
+            raise idoitapi.APIException.InvalidParams(message='Invalid title')
+        with self.lock:
+            self.created.append(params['title'])
+            object_id = next(self.counter)
+            self.objects.append({'id': str(object_id), 'title': params['title'], 'type': params['type']})
+            return {'id': object_id, 'success': True}
+
+    def purge_object(self, params):
+        with self.lock:
+            found = [obj for obj in self.objects if obj['id'] == str(params['object'])]
+            if len(found) == 0:
+                raise idoitapi.APIException.InvalidParams(message='Object not found')
+            self.objects.remove(found[0])
+        return {'success': True, 'message': 'Object purged'}
+
+    def read_objects(self, params):
+        found = [
+            obj for obj in self.objects
+            if all(obj[key] == value for key, value in params.get('filter', {}).items())
+        ]
+        offset, limit = [int(value) for value in str(params.get('limit', '0,1000000')).split(',')]
+        return found[offset:offset + limit]
+
+
+class TestObjectsUpsert(unittest.TestCase):
+    def setUp(self):
+        self.transport = ObjectsTransport()
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+        CMDBObjects(self.api).create([
+            {'type': 'C__OBJTYPE__SERVER', 'title': 'Server {}'.format(number)} for number in range(5)
+        ] + [{'type': 'C__OBJTYPE__CLIENT', 'title': 'Server 5'}])
+
+    def test_upsert_many(self):
+        """
+        Test creating only missing objects
+        """
+        object_ids = CMDBObject(self.api).upsert_many(
+            'C__OBJTYPE__SERVER',
+            ['Server 3', 'Server 4', {'title': 'Server 5', 'description': 'New'}, 'Server 6', 'Server 3'],
+            chunk_size=1
+        )
+        self.assertEqual(object_ids, {'Server 3': 4, 'Server 4': 5, 'Server 5': 7, 'Server 6': 8})
+        # Setup, one read, and one batch request per created object
+        self.assertEqual(self.transport.posts, 1 + 1 + 2)
+        self.assertEqual(CMDBObjects(self.api).index_by_title('C__OBJTYPE__SERVER', page_size=2)['Server 6'], [8])
+
+    def test_ambiguous(self):
+        """
+        Failure test: several objects with the same title
+        """
+        CMDBObjects(self.api).create([{'type': 'C__OBJTYPE__SERVER', 'title': 'Server 1'}])
+        with self.assertRaises(idoitapi.APIException.JSONRPC):
+            CMDBObject(self.api).upsert_many('C__OBJTYPE__SERVER', ['Server 1'])
+
+
+class TestObjectsStatus(unittest.TestCase):
+    def test_purge(self):
+        """
+        Test purging objects in chunks with per-object outcomes
+        """
+        transport = ObjectsTransport()
+        objects = CMDBObjects(API(url='http://localhost', key='abc123', transport=transport))
+        object_ids = objects.create([{'type': 'C__OBJTYPE__SERVER', 'title': str(number)} for number in range(10)])
+        progress = []
+        outcomes = objects.purge(object_ids[:5] + [42] + object_ids[5:], chunk_size=3, max_workers=2,
+                                 progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual([outcome.object_id for outcome in outcomes if not outcome.ok], [42])
+        self.assertIsInstance(outcomes[5].error, idoitapi.APIException.InvalidParams)
+        self.assertEqual(transport.objects, [])
+        self.assertEqual(transport.posts, 1 + 4)
+        self.assertEqual(max(progress), (11, 11))
+        self.assertEqual(objects.purge([]), [])
+
+
+class TestObjectsGetIds(unittest.TestCase):
+    def setUp(self):
+        self.transport = ObjectsTransport()
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+        CMDBObjects(self.api).create([
+            {'type': 'C__OBJTYPE__SERVER', 'title': 'Server {}'.format(number)} for number in range(10)
+        ] + [{'type': 'C__OBJTYPE__CLIENT', 'title': 'Server 1'}])
+
+    def test_get_ids(self):
+        """
+        Test resolving titles by batch requests and from the index
+        """
+        objects = CMDBObjects(self.api)
+        titles = ['Server {}'.format(number) for number in (2, 3, 2, 42, 9)]
+        self.assertEqual(objects.get_ids(titles, chunk_size=2), {'Server 2': 3, 'Server 3': 4, 'Server 9': 10})
+        self.assertEqual(self.transport.posts, 1 + 2)
+        self.assertEqual(objects.get_ids(titles[:3]), {'Server 2': 3, 'Server 3': 4})
+        self.assertEqual(self.transport.posts, 3)
+        self.assertEqual(objects.get_ids(['Server 1'], 'C__OBJTYPE__CLIENT'), {'Server 1': 11})
+        with self.assertRaises(idoitapi.APIException.JSONRPC):
+            objects.get_ids(['Server 1'])
+
+    def test_index(self):
+        """
+        Test bounding and refreshing the title index
+        """
+        index = TitleIndex(self.api, max_size=3)
+        CMDBObjects(self.api).get_ids(['Server {}'.format(number) for number in (0, 2, 3, 4)], index=index)
+        self.assertEqual(len(index), 3)
+        self.assertIsNone(index.get('Server 0'))
+        self.assertEqual(index.get('Server 4'), 5)
+
+        self.transport.logbook = [{'object_id': '5', 'event': 'C__LOGBOOK_EVENT__OBJECT_CHANGED'}, {'object_id': '1'}]
+        self.assertEqual(index.refresh(), 1)
+        self.assertIsNone(index.get('Server 4'))
+        self.assertEqual(len(index), 2)
+
+
+class CategoryTransport(MockTransport):
+    """
+    Mock transport keeping category entries by object and category
+    """
+
+    def __init__(self, entries):
+        super(CategoryTransport, self).__init__({
+            'cmdb.category.read': self.read_entries,
+            'cmdb.category.save': self.save_entry,
+            'cmdb.category.archive': self.archive_entry,
+            'cmdb.category.quickpurge': self.archive_entry,
+        })
+        self.entries = entries
+        self.archived = []
+        self.counter = itertools.count(100)
+        self.saved = []
+
+    def read_entries(self, params):
+        return self.entries.get((params['objID'], params['category']), [])
+
+    def save_entry(self, params):
+        self.saved.append(params)
+        entries = self.entries.setdefault((params['object'], params['category']), [])
+        if 'entry' in params:
+            entry = next(entry for entry in entries if int(entry['id']) == params['entry'])
+        else:
+            entry = {'id': str(next(self.counter))}
+            entries.append(entry)
+        entry.update(params['data'])
+        return {'entry': int(entry['id']), 'success': True}
+
+    def archive_entry(self, params):
+        object_id = params.get('object', params.get('objID'))
+        entry_id = params.get('entry', params.get('cateID'))
+        entries = self.entries.get((object_id, params['category']), [])
+        if not any(int(entry['id']) == entry_id for entry in entries):
+            return {'success': False, 'message': 'Entry not found'}
+        self.archived.append(entry_id)
+        return {'success': True}
+
+
+class TestObjectsCreate(unittest.TestCase):
+    def setUp(self):
+        self.objects = [{'type': 'C__OBJTYPE__SERVER', 'title': 'Server {}'.format(number)} for number in range(25)]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmpdir.name, 'import.jsonl')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_chunks(self):
+        """
+        Test creating objects in chunks, with progress
+        """
+        transport = ObjectsTransport()
+        objects = CMDBObjects(API(url='http://localhost', key='abc123', transport=transport))
+        progress = []
+        object_ids = objects.create(self.objects, chunk_size=10, max_workers=3,
+                                    progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(transport.posts, 3)
+        self.assertEqual(sorted(object_ids), list(range(1, 26)))
+        self.assertEqual(sorted(progress)[-1], (25, 25))
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(objects.create(self.objects[:3]), [26, 27, 28])
+        self.assertEqual(transport.posts, 4)
+
+    def test_checkpoint(self):
+        """
+        Test continuing an import that failed
+        """
+        transport = ObjectsTransport(fail_title='Server 13')
+        objects = CMDBObjects(API(url='http://localhost', key='abc123', transport=transport))
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            objects.create(self.objects, chunk_size=5, checkpoint=self.checkpoint)
+        # Chunks after the failed one are not sent
+        self.assertEqual(len(transport.created), 14)
+
+        transport.fail_title = None
+        object_ids = objects.create(self.objects, chunk_size=5, checkpoint=self.checkpoint)
+        self.assertEqual(sorted(transport.created), sorted(obj['title'] for obj in self.objects))
+        self.assertEqual(object_ids[12:16], [13, 15, 14, 16])
+        with open(self.checkpoint, encoding='utf-8') as file_handle:
+            self.assertEqual(len([json.loads(line) for line in file_handle]), 25)
+
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            objects.create(list(reversed(self.objects)), checkpoint=self.checkpoint)
+
+    def test_checkpoint_interrupted(self):
+        """
+        Test continuing twice after an import was killed while writing the checkpoint
+        """
+        transport = ObjectsTransport(fail_title='Server 13')
+        objects = CMDBObjects(API(url='http://localhost', key='abc123', transport=transport))
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            objects.create(self.objects, chunk_size=5, checkpoint=self.checkpoint)
+        with open(self.checkpoint, 'rb+') as file_handle:
+            file_handle.truncate(os.path.getsize(self.checkpoint) - 10)
+
+        transport.fail_title = 'Server 20'
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            objects.create(self.objects, chunk_size=5, checkpoint=self.checkpoint)
+        transport.fail_title = None
+        self.assertEqual(len(objects.create(self.objects, chunk_size=5, checkpoint=self.checkpoint)), 25)
+
+        # Only the object whose line was cut off is created again
+        counts = collections.Counter(transport.created)
+        self.assertEqual(counts.pop('Server 14'), 2)
+        self.assertEqual(set(counts.values()), {1})
+        self.assertEqual(len(counts), 24)
+
+    def test_concurrent_failure(self):
+        """
+        Test stopping concurrent batch requests after one failed
+        """
+        many = [{'type': 'C__OBJTYPE__SERVER', 'title': 'Server {}'.format(number)} for number in range(40)]
+        transport = ObjectsTransport(fail_title='Server 5')
+        transport.latency = 0.01
+        objects = CMDBObjects(API(url='http://localhost', key='abc123', transport=transport))
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            objects.create(many, chunk_size=2, max_workers=2, checkpoint=self.checkpoint)
+        self.assertLess(len(transport.created), 39)
+        with open(self.checkpoint, encoding='utf-8') as file_handle:
+            self.assertEqual(len(file_handle.readlines()), len(transport.created))
+
+        transport.fail_title = None
+        self.assertEqual(len(objects.create(many, chunk_size=2, max_workers=2, checkpoint=self.checkpoint)), 40)
+        self.assertEqual(sorted(transport.created), sorted(obj['title'] for obj in many))
+
+
+class TestCategorySync(unittest.TestCase):
+    def setUp(self):
+        self.transport = CategoryTransport({
+            (1, 'C__CATG__MODEL'): [{
+                'id': '7',
+                'manufacturer': {'id': '3', 'title': 'Dell', 'const': None},
+                'serial': 'ABC123',
+                'productid': '',
+            }],
+            (1, 'C__CATG__IP'): [{'id': '8', 'hostname': 'srv1'}, {'id': '9', 'hostname': 'srv1-mgmt'}],
+            (2, 'C__CATG__MODEL'): [{'id': '10', 'manufacturer': None, 'serial': 'DEF456'}],
+        })
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+
+    def test_unchanged(self):
+        """
+        Test that equal values are not saved
+        """
+        changes = CMDBCategory(self.api).sync({
+            1: {'C__CATG__MODEL': {'manufacturer': 'Dell', 'serial': 'ABC123', 'productid': None}},
+            2: {'C__CATG__MODEL': {'serial': 'DEF456'}},
+        })
+        self.assertEqual(changes, [])
+        self.assertEqual(self.transport.posts, 1)
+
+    def test_changes(self):
+        """
+        Test saving only changed attributes of changed entries
+        """
+        desired = {
+            1: {
+                'C__CATG__MODEL': {'manufacturer': 3, 'serial': 'XYZ789'},
+                'C__CATG__IP': [{'id': 9, 'hostname': 'srv1-mgmt'}, {'hostname': 'srv1-backup'}],
+            },
+            2: {'C__CATG__MODEL': {'serial': 'DEF456', 'productid': 'R640'}},
+        }
+        changes = CMDBCategory(self.api).sync(desired, dry_run=True)
+        self.assertEqual(self.transport.calls.get('cmdb.category.save', 0), 0)
+        self.assertEqual([(change.object_id, change.category, change.entry_id) for change in changes], [
+            (1, 'C__CATG__MODEL', 7), (1, 'C__CATG__IP', None), (2, 'C__CATG__MODEL', 10)
+        ])
+        self.assertEqual(changes[0].changes, {'serial': ('ABC123', 'XYZ789')})
+
+        changes = CMDBCategory(self.api).sync(desired)
+        self.assertEqual(changes[1].entry_id, 100)
+        self.assertTrue(changes[1].created)
+        self.assertEqual([saved['data'] for saved in self.transport.saved], [
+            {'serial': 'XYZ789'}, {'hostname': 'srv1-backup'}, {'productid': 'R640'}
+        ])
+        self.assertEqual(CMDBObject(self.api).sync(1, desired[1]), [])
+
+    def test_batch_read_indexed(self):
+        """
+        Test reading entries in concurrent chunks, indexed by object and category
+        """
+        category = CMDBCategory(self.api)
+        result = category.batch_read_indexed([1, 2], ['C__CATG__MODEL', 'C__CATG__IP'], chunk_size=1, max_workers=3)
+        self.assertEqual(list(result), [1, 2])
+        self.assertEqual(list(result[1]), ['C__CATG__MODEL', 'C__CATG__IP'])
+        self.assertEqual(result[1]['C__CATG__IP'], self.transport.entries[(1, 'C__CATG__IP')])
+        self.assertEqual(result[2]['C__CATG__IP'], [])
+        self.assertEqual(self.transport.posts, 4)
+
+        streamed = category.iter_batch_read([1, 2], ['C__CATG__MODEL'])
+        self.assertEqual(
+            sorted((object_id, entries[0]['id']) for object_id, _, entries in streamed), [(1, '7'), (2, '10')]
+        )
+        with self.assertRaises(idoitapi.APIException.JSONRPC):
+            list(category.iter_batch_read([1, 0], ['C__CATG__MODEL']))
+
+    def test_batch_save(self):
+        """
+        Test saving entries of many objects with per-entry outcomes
+        """
+        progress = []
+        outcomes = CMDBCategory(self.api).batch_save([
+            (1, 'C__CATG__MODEL', 7, {'serial': 'XYZ789'}),
+            (2, 'C__CATG__IP', None, {'hostname': 'srv2'}),
+            (1, 'C__CATG__IP', 42, {'hostname': 'srv1'}),
+        ], chunk_size=2, progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(
+            [(outcome.entry_id, outcome.ok) for outcome in outcomes], [(7, True), (100, True), (42, False)]
+        )
+        self.assertEqual(len(progress), 2)
+        self.assertEqual(progress[-1], (3, 3))
+        self.assertEqual(self.transport.posts, 2)
+
+    def test_batch_archive(self):
+        """
+        Test archiving entries of many objects
+        """
+        outcomes = CMDBCategory(self.api).batch_quick_purge([(1, 'C__CATG__IP', 9), (1, 'C__CATG__IP', 99)])
+        self.assertEqual([outcome.ok for outcome in outcomes], [True, False])
+        self.assertIsInstance(outcomes[1].error, idoitapi.APIException.JSONRPC)
+
+        outcomes = CMDBCategory(self.api).batch_clear([1, 2], ['C__CATG__MODEL', 'C__CATG__IP'], chunk_size=2)
+        self.assertEqual(sorted(outcome.entry_id for outcome in outcomes if outcome.ok), [7, 8, 9, 10])
+
+    def test_unknown_entry(self):
+        """
+        Failure test: desired entry not found
+        """
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            CMDBCategory(self.api).sync({1: {'C__CATG__IP': [{'id': 42, 'hostname': 'srv1'}]}})
+
+
+class DialogTransport(MockTransport):
+    """
+    Mock transport keeping drop-down menus
+    """
+
+    def __init__(self):
+        super(DialogTransport, self).__init__({
+            'cmdb.dialog.read': self.read_dialog,
+            'cmdb.dialog.create': self.create_value,
+        })
+        self.counter = itertools.count(10)
+        self.dialogs = {
+            ('C__CATG__MODEL', 'manufacturer'): [{'id': '1', 'const': '', 'title': 'Dell'}],
+            ('C__CATG__CPU', 'manufacturer'): [{'id': '2', 'const': '', 'title': 'Intel'}],
+        }
+
+    def read_dialog(self, params):
+        return list(self.dialogs.get((params['category'], params['property']), []))
+
+    def create_value(self, params):
+        entry_id = next(self.counter)
+        self.dialogs.setdefault((params['category'], params['property']), []).append(
+            {'id': str(entry_id), 'const': '', 'title': params['value']}
+        )
+        return {'success': True, 'entry_id': entry_id}
+
+
+class TestDialogResolver(unittest.TestCase):
+    def setUp(self):
+        self.transport = DialogTransport()
+        self.resolver = DialogResolver(API(url='http://localhost', key='abc123', transport=self.transport))
+
+    def test_resolve_many(self):
+        """
+        Test reading menus and creating missing values in one batch request each
+        """
+        model = ('C__CATG__MODEL', 'manufacturer')
+        cpu = ('C__CATG__CPU', 'manufacturer')
+        result = self.resolver.resolve_many({model: ['Dell', 'HP', 'Lenovo', 'HP'], cpu: ['Intel', 'AMD']})
+        self.assertEqual(result, {model: {'Dell': 1, 'HP': 10, 'Lenovo': 11}, cpu: {'Intel': 2, 'AMD': 12}})
+        self.assertEqual(self.transport.posts, 2)
+
+        self.assertEqual(self.resolver.resolve('C__CATG__MODEL', 'manufacturer', 'HP'), 10)
+        self.assertIsNone(self.resolver.resolve('C__CATG__MODEL', 'manufacturer', 'Acer', create=False))
+        self.assertEqual(self.transport.posts, 2)
+
+        self.resolver.clear()
+        self.assertEqual(self.resolver.resolve_many({model: ['Lenovo']}, create=False), {model: {'Lenovo': 11}})
+        self.assertEqual(self.transport.posts, 3)
+
+    def test_concurrent(self):
+        """
+        Test that a value requested by several threads at the same time is created once
+        """
+        self.transport.latency = 0.01
+        model = ('C__CATG__MODEL', 'manufacturer')
+
+        def resolve(number):
+            if number % 4 == 0:
+                self.resolver.clear()
+            return self.resolver.resolve_many({model: ['Dell', 'HP']})[model]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(resolve, range(16)))
+        self.assertEqual([value['title'] for value in self.transport.dialogs[model]], ['Dell', 'HP'])
+        self.assertEqual(results, [{'Dell': 1, 'HP': 10}] * 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Tests for decoding results incrementally and storing them column by column
+"""
+
+import json
+import unittest
+
+from idoitapi.API import API
+from idoitapi.CMDBObjects import CMDBObjects
+from idoitapi.CMDBReports import CMDBReports
+from idoitapi.Columnar import ColumnarResult
+from idoitapi.jsonstream import iter_chunks, iter_result
+from idoitapi.Transport import MockTransport
+import idoitapi.APIException
+
+OBJECTS = [
+    {'id': number, 'title': 'Server {}'.format(number), 'type_title': 'Server', 'cmdb_status': 6}
+    for number in range(1, 51)
+]
+
+
+def read_report(params):
+    if params['id'] != 1:
+        raise idoitapi.APIException.InvalidParams(message='Unknown report')
+    return [{'Title': 'Server 1', 'Serial': '123'}, {'Title': 'Server 2', 'Location': 'Rack 1'}]
+
+
+class TestIterResult(unittest.TestCase):
+    def test_small_chunks(self):
+        """
+        Test decoding values split across chunks
+        """
+        body = json.dumps({'jsonrpc': '2.0', 'result': [12345, 'abäc', {'x': [1.5, None]}, True], 'id': 1})
+        for chunk_size in (1, 2, 3, 7, 1000):
+            self.assertEqual(
+                list(iter_result(iter_chunks(body.encode('utf-8'), chunk_size))),
+                [12345, 'abäc', {'x': [1.5, None]}, True]
+            )
+
+    def test_key_order(self):
+        """
+        Test results after other keys, empty and non-list results
+        """
+        self.assertEqual(list(iter_result([b'{"id": 1, "result": [1, 2], "jsonrpc": "2.0"}'])), [1, 2])
+        self.assertEqual(list(iter_result([b'{"id": 1, "result": []}'])), [])
+        self.assertEqual(list(iter_result([b'{"id": 1, "result": {"success": true}}'])), [])
+
+    def test_error(self):
+        """
+        Test raising the typed exception of an error response
+        """
+        with self.assertRaises(idoitapi.APIException.MethodNotFound):
+            list(iter_result([b'{"id": 1, "error": {"code": -32601, "message": "Method not found"}}']))
+
+
+class TestColumnarResult(unittest.TestCase):
+    def test_append(self):
+        """
+        Test filling missing values and converting back to rows
+        """
+        result = ColumnarResult.from_rows([{'a': 1, 'b': 'x'}, {'b': 'y'}, {'a': 3, 'c': 'z'}])
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result.columns, {'a': [1, None, 3], 'b': ['x', 'y', None], 'c': [None, None, 'z']})
+        self.assertEqual(list(result.rows())[1], {'a': None, 'b': 'y', 'c': None})
+
+    def test_shared_values(self):
+        """
+        Test sharing repeated strings
+        """
+        result = ColumnarResult.from_rows([{'type': ''.join(['Ser', 'ver'])} for _ in range(3)])
+        self.assertIs(result['type'][0], result['type'][2])
+
+
+class TestColumnarReads(unittest.TestCase):
+    def setUp(self):
+        self.transport = MockTransport({
+            'cmdb.objects.read': lambda params: OBJECTS,
+            'cmdb.reports': read_report,
+        })
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+
+    def test_objects(self):
+        """
+        Test reading objects column by column
+        """
+        result = CMDBObjects(self.api).read(columnar=True)
+        self.assertEqual(result.column_names(), ['id', 'title', 'type_title', 'cmdb_status'])
+        self.assertEqual(result['id'], list(range(1, 51)))
+        self.assertEqual(list(result.rows()), OBJECTS)
+
+    def test_report(self):
+        """
+        Test reading a report column by column
+        """
+        result = CMDBReports(self.api).read(1, columnar=True)
+        self.assertEqual(result['Serial'], ['123', None])
+        self.assertEqual(result['Location'], [None, 'Rack 1'])
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            CMDBReports(self.api).read(2, columnar=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for exporting report results to files
+"""
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from idoitapi.API import API
+from idoitapi.CMDBReports import CMDBReports
+from idoitapi.Transport import MockTransport, MockServer
+import idoitapi.APIException
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+ROWS = [
+    {'Title': 'Server {}'.format(number), 'Serial': 'S{:05d}'.format(number), 'Location': 'Räck 1'}
+    for number in range(2500)
+]
+
+
+def read_report(params):
+    if params['id'] == 1:
+        return ROWS
+    if params['id'] == 2:
+        return ROWS[:10]
+    raise idoitapi.APIException.InvalidParams(message='Unknown report')
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.transport = MockTransport({'cmdb.reports': read_report})
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+        self.reports = CMDBReports(self.api)
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_csv(self):
+        """
+        Test exporting a report to CSV
+        """
+        self.assertEqual(self.reports.export(1, self.path('report.csv')), len(ROWS))
+        with open(self.path('report.csv'), newline='', encoding='utf-8') as file_handle:
+            self.assertEqual(list(csv.DictReader(file_handle)), ROWS)
+
+    def test_json_lines(self):
+        """
+        Test exporting a report to JSON Lines
+        """
+        self.assertEqual(self.reports.export(2, self.path('report.out'), file_format='jsonl'), 10)
+        with open(self.path('report.out'), encoding='utf-8') as file_handle:
+            self.assertEqual([json.loads(line) for line in file_handle], ROWS[:10])
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_parquet(self):
+        """
+        Test exporting a report to Parquet
+        """
+        self.assertEqual(self.reports.export(1, self.path('report.parquet')), len(ROWS))
+        self.assertEqual(pyarrow.parquet.read_table(self.path('report.parquet')).to_pylist(), ROWS)
+
+    def test_batch_export(self):
+        """
+        Test exporting several reports at the same time
+        """
+        counts = self.reports.batch_export({1: self.path('one.csv'), 2: self.path('two.jsonl')})
+        self.assertEqual(counts, {1: len(ROWS), 2: 10})
+        self.assertEqual(self.transport.calls['cmdb.reports'], 2)
+
+    def test_failure(self):
+        """
+        Failure test: no file is left behind
+        """
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            self.reports.export(3, self.path('report.csv'))
+        self.assertEqual(os.listdir(self.tmpdir.name), [])
+        with self.assertRaises(idoitapi.APIException.InvalidParams):
+            self.reports.export(1, self.path('report.xlsx'))
+
+    def test_http(self):
+        """
+        Test exporting while the response is received over HTTP
+        """
+        with MockServer(self.transport) as server:
+            reports = CMDBReports(API(url=server.url, key='abc123'))
+            self.assertEqual(reports.export(1, self.path('report.jsonl')), len(ROWS))
+        with open(self.path('report.jsonl'), encoding='utf-8') as file_handle:
+            self.assertEqual(sum(1 for _ in file_handle), len(ROWS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Tests for reading several reports at the same time
+"""
+
+import time
+import unittest
+
+from idoitapi.API import API
+from idoitapi.CMDBReports import CMDBReports
+from idoitapi.Transport import MockTransport
+import idoitapi.APIException
+
+
+def read_report(params):
+    if params['id'] == 3:
+        raise idoitapi.APIException.InvalidParams(message='Unknown report')
+    if params['id'] == 4:
+        time.sleep(0.5)
+    return [{'Report': params['id']}]
+
+
+class TestReportsBatchRead(unittest.TestCase):
+    def setUp(self):
+        self.transport = MockTransport({'cmdb.reports': read_report})
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+        self.reports = CMDBReports(self.api)
+
+    def test_batch_read(self):
+        """
+        Test reading reports in order, with empty results for failures
+        """
+        self.assertEqual(self.reports.batch_read([1, 2, 3]), [[{'Report': 1}], [{'Report': 2}], []])
+        self.assertEqual(self.transport.calls['cmdb.reports'], 3)
+
+    def test_iter_batch_read(self):
+        """
+        Test status and timing per report, in order of completion
+        """
+        results = list(self.reports.iter_batch_read([4, 1, 3]))
+        self.assertEqual([result.report_id for result in results][-1], 4)
+        by_id = {result.report_id: result for result in results}
+        self.assertTrue(by_id[1].ok)
+        self.assertEqual(by_id[1].rows, [{'Report': 1}])
+        self.assertIsInstance(by_id[3].error, idoitapi.APIException.InvalidParams)
+        self.assertGreaterEqual(by_id[4].seconds, 0.5)
+
+    def test_timeout(self):
+        """
+        Test giving up on a slow report without delaying the others
+        """
+        start = time.monotonic()
+        results = {result.report_id: result for result in self.reports.iter_batch_read([4, 1], timeout=0.1)}
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertTrue(results[1].ok)
+        self.assertFalse(results[4].ok)
+        self.assertIsInstance(results[4].error, idoitapi.APIException.JSONRPC)
+
+    def test_timeout_queued(self):
+        """
+        Test giving up on reports queued behind slow ones
+        """
+        start = time.monotonic()
+        results = list(self.reports.iter_batch_read([4, 4, 1], max_workers=2, timeout=0.1))
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(len(results), 3)
+        self.assertFalse(any(result.ok for result in results))
+        self.assertEqual(self.transport.calls['cmdb.reports'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Tests for tracing spans of composite operations and HTTP requests
+"""
+
+import unittest
+import unittest.mock
+from contextlib import contextmanager
+
+from idoitapi.API import API
+from idoitapi.Select import Select
+from idoitapi.Transport import MockTransport
+import idoitapi.tracing
+
+
+class RecordingTracer(object):
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        self.spans.append((name, attributes))
+        yield unittest.mock.Mock()
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        transport = MockTransport({'cmdb.objects.read': lambda params: []})
+        self.api = API(url='http://localhost', key='abc123', transport=transport)
+
+    def tearDown(self):
+        idoitapi.tracing.set_tracer(None)
+
+    def test_spans(self):
+        """
+        Test spans for a traced method and its HTTP requests
+        """
+        tracer = RecordingTracer()
+        idoitapi.tracing.set_tracer(tracer)
+
+        self.assertEqual(Select(self.api).find('C__CATG__GLOBAL', 'title', 'server01'), [])
+
+        self.assertEqual(
+            [name for name, _ in tracer.spans],
+            ['idoitapi.Select.find', 'idoitapi.http cmdb.objects.read']
+        )
+        self.assertEqual(tracer.spans[1][1]['idoitapi.batch_length'], 1)
+
+    def test_without_opentelemetry(self):
+        """
+        Test that tracing is a no-op if OpenTelemetry is not installed
+        """
+        with unittest.mock.patch.object(idoitapi.tracing, '_otel_imported', True), \
+                unittest.mock.patch.object(idoitapi.tracing, '_otel_trace', None):
+            self.assertIsNone(idoitapi.tracing.get_tracer())
+            with idoitapi.tracing.span('idoitapi.test') as current_span:
+                current_span.set_attribute('key', 'value')
+            self.assertEqual(Select(self.api).find('C__CATG__GLOBAL', 'title', 'server01'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
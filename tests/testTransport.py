@@ -0,0 +1,85 @@
+"""
+Tests for transports, recording and replaying requests offline
+"""
+
+import os
+import tempfile
+import unittest
+
+from idoitapi.API import API
+from idoitapi.CMDBObject import CMDBObject
+from idoitapi.CMDBObjects import CMDBObjects
+from idoitapi.Transport import MockTransport, RecordingTransport, ReplayTransport, MockServer
+import idoitapi.APIException
+
+
+def read_object(params):
+    return {'id': params['id'], 'title': 'Object {}'.format(params['id'])}
+
+
+class TestMockTransport(unittest.TestCase):
+    def setUp(self):
+        self.transport = MockTransport({'cmdb.object.read': read_object})
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+
+    def test_request(self):
+        """
+        Test a request answered by a handler
+        """
+        result = CMDBObject(self.api).read(42)
+        self.assertEqual(result, {'id': 42, 'title': 'Object 42'})
+        self.assertEqual(self.transport.calls['cmdb.object.read'], 1)
+
+    def test_batch_request(self):
+        """
+        Test a batch request answered by handlers
+        """
+        results = self.api.batch_request([
+            {'method': 'cmdb.object.read', 'params': {'id': 1}},
+            {'method': 'cmdb.object.read', 'params': {'id': 2}},
+        ])
+        self.assertEqual([result['id'] for result in results], [1, 2])
+        self.assertEqual(self.transport.posts, 1)
+
+    def test_unknown_method(self):
+        """
+        Failure test for a method without handler
+        """
+        with self.assertRaises(idoitapi.APIException.MethodNotFound):
+            CMDBObjects(self.api).read()
+
+
+class TestRecordReplay(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_replay(self):
+        """
+        Test replaying recorded requests
+        """
+        recorder = RecordingTransport(self.path, MockTransport({'cmdb.object.read': read_object}))
+        api = API(url='http://localhost', key='abc123', transport=recorder)
+        recorded = CMDBObject(api).read(7)
+
+        api = API(url='http://localhost', key='other', transport=ReplayTransport(self.path))
+        self.assertEqual(CMDBObject(api).read(7), recorded)
+        with self.assertRaises(idoitapi.APIException.MethodNotFound):
+            CMDBObject(api).read(8)
+
+
+class TestMockServer(unittest.TestCase):
+    def test_http(self):
+        """
+        Test requests over HTTP to a local mock server
+        """
+        with MockServer(MockTransport({'cmdb.object.read': read_object})) as server:
+            api = API(url=server.url, key='abc123')
+            self.assertEqual(CMDBObject(api).read(3)['title'], 'Object 3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+"""
+Tests for uploading files and images with base64 encoding while sending
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from idoitapi.API import API
+from idoitapi.File import File, FileIndex, md5_file
+from idoitapi.Image import Image
+from idoitapi.jsonstream import StreamingBody
+from idoitapi.Transport import MockTransport, MockServer, Response, Transport
+from idoitapi.utils import Base64File, base64_encode, base64_encode_chunks
+
+try:
+    import PIL.Image
+except ImportError:
+    PIL = None
+
+
+class UploadTransport(MockTransport):
+    """
+    Mock transport keeping the uploaded file contents
+    """
+
+    def __init__(self):
+        counter = itertools.count(100)
+        super(UploadTransport, self).__init__({
+            'cmdb.object.create': lambda params: {'id': next(counter), 'success': True},
+            'cmdb.objects.read': self.read_objects,
+            'cmdb.category.create': self.create_entry,
+            'cmdb.category.read': self.read_entries,
+        })
+        self.entries = []
+
+    def create_entry(self, params):
+        params = dict(params, catgID=params.get('catgID', params.get('category')))
+        self.entries.append(params)
+        return {'id': len(self.entries), 'success': True}
+
+    def read_objects(self, params):
+        return [
+            {'id': str(entry['objID']), 'type': 'C__OBJTYPE__FILE'}
+            for entry in self.entries if entry['catgID'] == 'C__CATS__FILE_VERSIONS'
+        ]
+
+    def read_entries(self, params):
+        result = []
+        for entry in self.entries:
+            if entry['objID'] != params['objID'] or entry['catgID'] != params['category']:
+                continue
+            data = dict(entry['data'])
+            if 'file_content' in data:
+                content = data.pop('file_content')
+                data['md5_hash'] = hashlib.md5(base64.b64decode(content)).hexdigest()
+            elif 'file' in data:
+                data['file'] = {'id': str(data['file']), 'title': 'File'}
+            result.append(data)
+        return result
+
+
+class GalleryTransport(MockTransport):
+    """
+    Mock transport keeping an image gallery
+    """
+
+    def __init__(self):
+        super(GalleryTransport, self).__init__({
+            'cmdb.category.read': lambda params: [dict(entry, id=str(entry_id)) for entry_id, entry in self.images.items()],
+            'cmdb.category.save': self.save_entry,
+            'cmdb.category.purge': self.purge_entry,
+        })
+        self.images = {}
+        self.counter = itertools.count(1)
+
+    def save_entry(self, params):
+        entry_id = params.get('entry', next(self.counter))
+        self.images.setdefault(entry_id, {}).update(params['data'])
+        return {'entry': entry_id, 'success': True}
+
+    def purge_entry(self, params):
+        del self.images[params['entry']]
+        return {'success': True}
+
+
+class DiscardingTransport(Transport):
+    """
+    Transport reading request bodies chunk by chunk, like a socket would
+    """
+
+    def __init__(self):
+        self.sent = 0
+
+    def post(self, url, data, headers):
+        for chunk in (data if isinstance(data, StreamingBody) else [data.encode('utf-8')]):
+            self.sent += len(chunk)
+        return Response(200, json.dumps({'jsonrpc': '2.0', 'result': {'id': 1, 'success': True}, 'id': 1}).encode())
+
+
+class TestUpload(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.transport = UploadTransport()
+        self.api = API(url='http://localhost', key='abc123', transport=self.transport)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_file(self, name, size):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as file_handle:
+            file_handle.write(os.urandom(size))
+        return path
+
+    def test_chunks(self):
+        """
+        Test encoding in chunks
+        """
+        path = self.make_file('scan.pdf', 100001)
+        self.assertEqual(b''.join(base64_encode_chunks(path, 3 * 1024)).decode('ascii'), base64_encode(path))
+        self.assertEqual(Base64File(path).encoded_size, len(base64_encode(path)))
+        with self.assertRaises(RuntimeError):
+            Base64File(self.make_file('empty.pdf', 0))
+
+    def test_file_add(self):
+        """
+        Test uploading a file
+        """
+        path = self.make_file('scan.pdf', 5000)
+        File(self.api).add(1, path, 'Scan')
+        self.assertEqual(self.transport.entries[0]['data']['file_content'], base64_encode(path))
+        self.assertEqual(self.transport.entries[1]['data'], {'file': 100})
+
+    def test_batch_size(self):
+        """
+        Test splitting uploads into size-bounded batch requests
+        """
+        files = {self.make_file('scan{}.pdf'.format(number), 3000): 'Scan {}'.format(number) for number in range(5)}
+        File(self.api).batch_add(1, files, max_batch_size=8000)
+        # One batch to create the file objects, then two files (8000 encoded bytes) per batch
+        self.assertEqual(self.transport.posts, 1 + 3)
+        contents = [entry['data']['file_content'] for entry in self.transport.entries if 'file_content' in entry['data']]
+        self.assertEqual(contents, [base64_encode(path) for path in files])
+
+        Image(self.api).batch_add(1, {path: 'Image' for path in files}, max_batch_size=4000)
+        self.assertEqual(self.transport.posts, 4 + 5)
+
+    def test_upload(self):
+        """
+        Test uploading each content only once
+        """
+        first = self.make_file('scan.pdf', 3000)
+        copy = os.path.join(self.tmpdir.name, 'copy.pdf')
+        with open(first, 'rb') as source, open(copy, 'wb') as target:
+            target.write(source.read())
+        second = self.make_file('photo.jpg', 2000)
+
+        file_object_ids = File(self.api).upload(1, {first: 'Scan', copy: 'Copy', second: 'Photo'})
+        self.assertEqual(file_object_ids, {first: 100, copy: 100, second: 101})
+        versions = [entry for entry in self.transport.entries if entry['catgID'] == 'C__CATS__FILE_VERSIONS']
+        links = [entry for entry in self.transport.entries if entry['catgID'] == 'C__CATG__FILE']
+        self.assertEqual(len(versions), 2)
+        self.assertEqual([(entry['objID'], entry['data']) for entry in links], [(1, {'file': 100}), (1, {'file': 101})])
+
+        # Known contents are only assigned, and only where they are missing
+        index = FileIndex(self.api)
+        self.assertEqual(File(self.api, index=index).upload(2, {copy: 'Copy'}), {copy: 100})
+        self.assertEqual(len(index), 2)
+        File(self.api, index=index).upload(2, {first: 'Scan', second: 'Photo'})
+        self.assertEqual(len(self.transport.entries), 2 + 2 + 2)
+        self.assertEqual(self.transport.calls['cmdb.object.create'], 2)
+
+    def test_sync(self):
+        """
+        Test uploading only new and changed images to a gallery
+        """
+        transport = GalleryTransport()
+        image = Image(API(url='http://localhost', key='abc123', transport=transport))
+        for number in range(4):
+            self.make_file('photo{}.png'.format(number), 1000)
+        self.make_file('notes.txt', 100)
+
+        result = image.sync(1, self.tmpdir.name, max_batch_size=3000)
+        self.assertEqual(result.created, ['photo0.png', 'photo1.png', 'photo2.png', 'photo3.png'])
+        self.assertEqual(transport.calls['cmdb.category.save'], 4)
+        self.assertEqual(transport.posts, 1 + 2)
+
+        self.make_file('photo1.png', 1000)
+        os.remove(os.path.join(self.tmpdir.name, 'photo3.png'))
+        result = image.sync(1, self.tmpdir.name, remove=True)
+        self.assertEqual(result.updated, ['photo1.png'])
+        self.assertEqual(result.unchanged, ['photo0.png', 'photo2.png'])
+        self.assertEqual(result.removed, ['photo3.png'])
+        self.assertEqual(transport.calls['cmdb.category.save'], 5)
+        self.assertEqual(
+            transport.images[2]['content'], base64_encode(os.path.join(self.tmpdir.name, 'photo1.png'))
+        )
+        self.assertEqual(sorted(entry['name'] for entry in transport.images.values()), sorted(result.updated + result.unchanged))
+
+    def test_sync_manifest(self):
+        """
+        Test leaving unchanged images alone and comparing uploaded ones by their hash
+        """
+        transport = GalleryTransport()
+        image = Image(API(url='http://localhost', key='abc123', transport=transport))
+        path = self.make_file('photo0.png', 1000)
+        transport.images[1] = {'name': 'photo0.png', 'description': 'Front view', 'content': base64_encode(path)}
+
+        self.assertEqual(image.sync(1, self.tmpdir.name).unchanged, ['photo0.png'])
+        self.assertNotIn('cmdb.category.save', transport.calls)
+        self.assertEqual(transport.images[1]['description'], 'Front view')
+
+        self.make_file('photo0.png', 1000)
+        self.assertEqual(image.sync(1, self.tmpdir.name).updated, ['photo0.png'])
+        self.assertEqual(transport.images[1]['content'], base64_encode(path))
+        self.assertEqual(
+            transport.images[1]['description'],
+            'Front view\n[idoitapi md5:{} max_size:None]'.format(md5_file(path))
+        )
+
+        # Compared by the hash in the description, not by the contents
+        transport.images[1]['content'] = ''
+        self.assertEqual(image.sync(1, self.tmpdir.name).unchanged, ['photo0.png'])
+        self.assertEqual(transport.calls['cmdb.category.save'], 1)
+
+    @unittest.skipIf(PIL is None, 'Pillow is not installed')
+    def test_sync_downsize(self):
+        """
+        Test scaling images down before uploading them
+        """
+        transport = GalleryTransport()
+        image = Image(API(url='http://localhost', key='abc123', transport=transport))
+        PIL.Image.new('RGB', (800, 400)).save(os.path.join(self.tmpdir.name, 'large.png'))
+        PIL.Image.new('RGB', (100, 100)).save(os.path.join(self.tmpdir.name, 'small.png'))
+        self.assertEqual(image.sync(1, self.tmpdir.name, max_size=200).created, ['large.png', 'small.png'])
+        self.assertEqual(image.sync(1, self.tmpdir.name, max_size=200).unchanged, ['large.png', 'small.png'])
+
+    def test_memory(self):
+        """
+        Test that uploading does not hold the file in memory
+        """
+        path = self.make_file('large.pdf', 8 * 1024 * 1024)
+        transport = DiscardingTransport()
+        api = API(url='http://localhost', key='abc123', transport=transport)
+        tracemalloc.start()
+        Image(api).add(1, path, 'Large')
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertGreater(transport.sent, 8 * 1024 * 1024 * 4 // 3)
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+    def test_http(self):
+        """
+        Test sending a streamed upload over HTTP
+        """
+        path = self.make_file('scan.pdf', 1024 * 1024 + 1)
+        with MockServer(self.transport) as server:
+            Image(API(url=server.url, key='abc123')).add(1, path, 'Scan')
+        self.assertEqual(self.transport.entries[0]['data']['content'], base64_encode(path))
+
+
+if __name__ == '__main__':
+    unittest.main()